@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Admin accounts stored in tbl_admin_users with bcrypt password hashes.
+
+    python admin_users.py create <username>
+    python admin_users.py set-password <username>
+
+bcrypt runs on a small dedicated thread pool, so a burst of admin logins
+cannot occupy more than ``BCRYPT_WORKERS`` cores. ``BCRYPT_ROUNDS`` sets
+the cost of new hashes; older hashes are upgraded on the next successful
+login.
+"""
+import argparse
+import getpass
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from config import Config
+from db import db_connection
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=Config.BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+
+_dummy_hash = None
+
+
+def _unknown_user_hash():
+    """Hash checked when the username is unknown, so the response time does not reveal it.
+
+    It has the same cost as real hashes; built on first use to keep imports fast.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password('not-a-real-password')
+    return _dummy_hash
+
+
+def hash_password(password, rounds=None):
+    salt = bcrypt.gensalt(rounds or Config.BCRYPT_ROUNDS)
+    return _bcrypt_executor.submit(bcrypt.hashpw, password.encode('utf-8'), salt).result().decode('ascii')
+
+
+def check_password(password, password_hash):
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('ascii')
+    return _bcrypt_executor.submit(bcrypt.checkpw, password.encode('utf-8'), password_hash).result()
+
+
+def _hash_rounds(password_hash):
+    # $2b$12$... -> 12
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def authenticate(username, password):
+    """Return the admin's username if the credentials are valid, else None."""
+    with db_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, username, password_hash FROM tbl_admin_users WHERE username = %s AND is_active = TRUE",
+            (username,),
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        check_password(password, _unknown_user_hash())
+        return None
+
+    admin_id, username, password_hash = row
+    if not check_password(password, password_hash):
+        return None
+
+    if _hash_rounds(password_hash) != Config.BCRYPT_ROUNDS:
+        set_password(username, password)
+    with db_connection() as connection, connection.cursor() as cursor:
+        cursor.execute("UPDATE tbl_admin_users SET last_login_at = NOW() WHERE id = %s", (admin_id,))
+        connection.commit()
+    return username
+
+
+def create_admin(username, password):
+    with db_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO tbl_admin_users (username, password_hash) VALUES (%s, %s)",
+            (username, hash_password(password)),
+        )
+        connection.commit()
+        return cursor.lastrowid
+
+
+def set_password(username, password):
+    with db_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE tbl_admin_users SET password_hash = %s WHERE username = %s",
+            (hash_password(password), username),
+        )
+        connection.commit()
+        return cursor.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage admin accounts')
+    parser.add_argument('command', choices=('create', 'set-password'))
+    parser.add_argument('username')
+    args = parser.parse_args()
+
+    password = getpass.getpass('Password: ')
+    if not password or password != getpass.getpass('Repeat password: '):
+        print("Passwords are empty or do not match")
+        sys.exit(1)
+
+    if args.command == 'create':
+        create_admin(args.username, password)
+        print(f"Created admin {args.username}")
+    elif set_password(args.username, password):
+        print(f"Updated password for {args.username}")
+    else:
+        print(f"No admin named {args.username}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,45 @@
+import logging
+
 from flask import Flask, request, make_response
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
+import cache_sync
+import compression
+import metrics
+import profiler
+import replication
 from config import Config
-from db import get_db_connection
+from logging_setup import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+from cache import cache_stats
+from changes import bus as change_bus
+from db import db_connection, pool_stats
+from jwt_cache import CachingJWTManager
 
 app = Flask(__name__)
 
+# Behind a reverse proxy, take the client address and scheme from the
+# X-Forwarded-* headers the trusted hops append (rate limits key on it)
+if Config.TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS, x_proto=Config.TRUSTED_PROXY_HOPS)
+
+CORS_ORIGINS = [
+    "http://localhost:5173", "http://127.0.0.1:5173",
+    "http://localhost:8080", "http://localhost:8081",
+    "http://localhost:8082", "http://localhost:8083",
+    "https://uttrakhand-tennis-association-git-main-parth-chandnas-projects.vercel.app",
+    "https://uttrakhand-tennis-association-hg76fqlnk-parth-chandnas-projects.vercel.app",
+    "https://uttrakhand-tennis-association-5l5m.vercel.app",  # ✅ fixed comma here
+    "https://uttrakhand-tennis-association.vercel.app"        # ✅ fixed
+]
+
 # CORS must be defined before routes and blueprints
 CORS(
     app,
-    origins=[
-        "http://localhost:5173", "http://127.0.0.1:5173",
-        "http://localhost:8080", "http://localhost:8081",
-        "http://localhost:8082", "http://localhost:8083",
-        "https://uttrakhand-tennis-association-git-main-parth-chandnas-projects.vercel.app",
-        "https://uttrakhand-tennis-association-hg76fqlnk-parth-chandnas-projects.vercel.app",
-        "https://uttrakhand-tennis-association-5l5m.vercel.app",  # ✅ fixed comma here
-        "https://uttrakhand-tennis-association.vercel.app"        # ✅ fixed
-    ],
+    origins=CORS_ORIGINS,
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
     supports_credentials=True,
@@ -34,7 +56,24 @@ def handle_options():
 # JWT Setup
 app.config['JWT_SECRET_KEY'] = Config.JWT_SECRET_KEY
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = Config.JWT_ACCESS_TOKEN_EXPIRES
-jwt = JWTManager(app)
+# Verified token claims are cached per token until they expire
+jwt = CachingJWTManager(app)
+
+# Request latency / DB instrumentation, exposed at /api/metrics
+metrics.init_app(app)
+
+# gzip/brotli for large JSON bodies
+compression.init_app(app)
+
+# Read-your-writes pinning when DB_REPLICA_HOSTS is set
+replication.init_app(app)
+
+# Writes made by other workers clear this worker's caches within CACHE_SYNC_SECONDS
+cache_sync.init_app(app)
+
+# Opt-in per-statement profiling, reported at /api/admin/query-profile
+if Config.DB_PROFILE:
+    profiler.enable()
 
 # Register blueprints
 try:
@@ -43,32 +82,45 @@ try:
     from routes.players import players_bp
     from routes.partners import partners_bp
     from routes.admin import admin_bp
+    from routes.registrations import registrations_bp
+    from routes.draws import draws_bp
+    from routes.schedule import schedule_bp
+    from routes.changes import changes_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(events_bp, url_prefix='/api/events')
     app.register_blueprint(players_bp, url_prefix='/api/players')
     app.register_blueprint(partners_bp, url_prefix='/api/partners')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(registrations_bp, url_prefix='/api/registrations')
+    app.register_blueprint(draws_bp, url_prefix='/api/draws')
+    app.register_blueprint(schedule_bp, url_prefix='/api/schedule')
+    app.register_blueprint(changes_bp, url_prefix='/api/changes')
 
-    print("All blueprints registered successfully")
+    logger.info("All blueprints registered successfully")
 except ImportError as e:
-    print(f"Error importing blueprints: {e}")
+    logger.error("Error importing blueprints: %s", e)
 
 #Health check
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return {'status': 'healthy', 'message': 'Server is running'}
+    return {
+        'status': 'healthy',
+        'message': 'Server is running',
+        'db_pool': pool_stats(),
+        'caches': cache_stats(),
+        'cache_sync': cache_sync.sync.stats(),
+        'jwt_cache': jwt.token_cache.stats(),
+        'change_stream': change_bus.stats(),
+    }
 
 #DB test
 @app.route('/api/debug-db', methods=['GET'])
 def debug_db():
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT DATABASE();")
-        db = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT DATABASE();")
+            db = cur.fetchone()
         return {'connected_to': db[0]}
     except Exception as e:
         return {'error': str(e)}
@@ -78,9 +130,9 @@ def debug_db():
 def root():
     return {'message': 'Welcome to the Uttrakhand Tennis Association API'}
 
-#Local dev
+#Local dev only; production runs under serve.py (gunicorn)
 if __name__ == '__main__':
-    print("Starting Flask server...")
+    logger.info("Starting Flask server...")
     for rule in app.url_map.iter_rules():
-        print(f"  {rule.endpoint}: {rule.rule} [{', '.join(rule.methods)}]")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+        logger.info("  %s: %s [%s]", rule.endpoint, rule.rule, ', '.join(rule.methods))
+    app.run(debug=Config.FLASK_DEBUG, host='0.0.0.0', port=5000)
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point: async hot read paths in front of the Flask app.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+    python asgi.py --workers 4
+
+GET /api/events, /api/partners/available/<event>/<id>,
+/api/players/dashboard/<id> and /api/admin/statistics are served on the
+event loop from an aiomysql pool, so thousands of concurrent polls cost
+coroutines rather than threads. They share the Flask handlers' caches,
+queries, table-version ETags, JSON encoding and compression rules, so
+responses are byte-identical, and writes made through Flask in the same
+process invalidate them as before.
+GET /api/changes/stream (Server-Sent Events) is served here too, waiting
+on the event loop, so open streams do not hold threads.
+Statistics reads go to a read replica when DB_REPLICA_HOSTS is set,
+honouring the same read-your-writes cookie as the Flask app.
+Everything else (and any request these handlers decline, such as one
+without a valid token) is passed to the Flask app through WsgiToAsgi.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import re
+import time
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import parse_qsl
+
+import aiomysql
+import pymysql
+from asgiref.wsgi import WsgiToAsgi
+from flask_jwt_extended import decode_token
+from werkzeug.http import parse_accept_header
+
+import db
+import metrics
+from app import CORS_ORIGINS, app as flask_app
+from cache_sync import sync as cache_sync
+from changes import TooManySubscribers, bus
+from compression import choose_encoding, encode_body
+from config import Config
+from dashboard import DASHBOARD_QUERY, compose_dashboard, dashboard_cache
+from event_stats import SUMMARY_QUERY
+from queries import ETAG_ENCODING_SUFFIXES, row_plan
+from replication import pinned_until
+from routes.admin import STATISTICS_TABLES
+from routes.changes import format_change
+from routes.events import EVENTS_QUERY, event_cache
+from routes.partners import (
+    ENTRANTS_QUERY, available_partners_cache, parse_partner_filters, select_partners, sort_entrants,
+)
+from versions import table_versions_query, versions_etag
+
+logger = logging.getLogger(__name__)
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+_pools = {}
+_pool_lock = None
+_inflight = {}
+_query_tally = contextvars.ContextVar('query_tally', default=None)
+_reads_from_primary = contextvars.ContextVar('reads_from_primary', default=False)
+
+
+class Decline(Exception):
+    """Raised by a handler to hand the request to the Flask app instead."""
+
+
+class NotFound(Exception):
+    """Raised by a loader when there is nothing to cache."""
+
+
+async def get_pool(name=db.PRIMARY):
+    global _pool_lock
+    if name not in _pools:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if name not in _pools:
+                config = db.connection_config(name)
+                _pools[name] = await aiomysql.create_pool(
+                    host=config['host'],
+                    port=config.get('port', 3306),
+                    user=config['user'],
+                    password=config['password'],
+                    db=config['database'],
+                    charset='utf8mb4',
+                    autocommit=True,
+                    init_command=config.get('init_command'),
+                    minsize=Config.DB_POOL_MIN_SIZE,
+                    maxsize=Config.ASYNC_DB_POOL_MAX_SIZE,
+                    pool_recycle=Config.DB_POOL_IDLE_TIMEOUT,
+                )
+    return _pools[name]
+
+
+async def close_pool():
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        pool.close()
+        await pool.wait_closed()
+
+
+async def using_connection(work, readonly=False):
+    """Await ``work(connection)`` on a pooled connection and return its result.
+
+    ``readonly=True`` may use a read replica, as ``db.db_connection`` does
+    (health is shared with db.ReplicaRouter). If the replica cannot be
+    reached or drops the connection, it is marked down and ``work`` runs
+    again on the next replica or the primary.
+    """
+    if readonly and Config.DB_REPLICAS and not _reads_from_primary.get():
+        router = db.get_router()
+        for name in router.candidates():
+            connection = None
+            try:
+                pool = await get_pool(name)
+                async with pool.acquire() as connection:
+                    result = await work(connection)
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError, OSError) as e:
+                # SQL errors arrive as OperationalError too; only a lost link means the replica is down.
+                if connection is not None and not connection.closed:
+                    raise
+                router.mark_down(name, e)
+                continue
+            router.mark_up(name)
+            return result
+
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        return await work(connection)
+
+
+async def fetch(sql, params=None, readonly=False):
+    """Run ``sql`` on a pooled connection; returns ``(rows, plan)``."""
+    return await using_connection(lambda connection: run(connection, sql, params), readonly)
+
+
+async def run(connection, sql, params=None):
+    """Execute ``sql`` on ``connection``; returns ``(rows, plan)``."""
+    async with connection.cursor() as cursor:
+        started = time.perf_counter()
+        error = None
+        try:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            db.report_query(sql, elapsed, error)
+            tally = _query_tally.get()
+            if tally is not None:
+                tally[0] += 1
+                tally[1] += elapsed
+        return rows, row_plan(cursor, sql)
+
+
+async def cached(cache, key, loader):
+    """``TTLCache.get_or_load`` for coroutines; concurrent misses share one load."""
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+    flight = (cache.name, key)
+    future = _inflight.get(flight)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = _inflight[flight] = asyncio.get_running_loop().create_future()
+    try:
+        generation = cache.generation
+        entry = cache.set(key, await loader(), generation=generation)
+        future.set_result(entry)
+        return entry
+    except BaseException as e:
+        future.set_exception(e)
+        # Waiters re-raise it; mark it retrieved so an unawaited future stays quiet.
+        future.exception()
+        raise
+    finally:
+        del _inflight[flight]
+
+
+class Request:
+    def __init__(self, scope):
+        self.scope = scope
+        self.headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+
+
+def matching_etag(request, etag):
+    """The variant of ``etag`` (plain, -gzip or -br) that If-None-Match names, or None."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return None
+    if header.strip() == '*':
+        return etag
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in header.split(',')}
+    for variant in (etag, *(etag + suffix for suffix in ETAG_ENCODING_SUFFIXES.values())):
+        if variant in tags:
+            return variant
+    return None
+
+
+def json_payload(request, body, status=200, etag=None):
+    """Mirror queries.json_response: ``(status, headers, body)``.
+
+    A 304 echoes the ETag variant the client holds, as compression.py does.
+    """
+    headers = []
+    if etag is not None:
+        matched = matching_etag(request, etag)
+        headers.append((b'etag', f'"{matched or etag}"'.encode()))
+        headers.append((b'cache-control', b'no-cache'))
+        if matched:
+            return 304, headers, b''
+    headers.append((b'content-type', b'application/json'))
+    return status, headers, (body + '\n').encode('utf-8')
+
+
+def compress_payload(request, status, headers, body):
+    """Mirror compression.compress_response for a ``json_payload`` result."""
+    if status != 200 or len(body) < Config.COMPRESS_MIN_BYTES:
+        return headers, body
+    headers.append((b'vary', b'Accept-Encoding'))
+    encoding = choose_encoding(parse_accept_header(request.headers.get('accept-encoding')))
+    if encoding is None:
+        return headers, body
+    suffix = ETAG_ENCODING_SUFFIXES[encoding].encode()
+    headers = [
+        (name, value[:-1] + suffix + b'"' if name == b'etag' else value)
+        for name, value in headers
+    ]
+    headers.append((b'content-encoding', encoding.encode()))
+    return headers, encode_body(body, encoding)
+
+
+async def get_events(request):
+    async def load():
+        rows, plan = await fetch(EVENTS_QUERY)
+        return plan.dumps(rows)
+
+    entry = await cached(event_cache, None, load)
+    return json_payload(request, entry.value, etag=entry.etag)
+
+
+async def get_available_partners(request, event_name, current_user_id):
+    try:
+        filters = parse_partner_filters(request.args)
+    except ValueError:
+        return json_payload(request, '{"error":"limit must be a number"}', status=400)
+
+    async def load():
+        rows, _ = await fetch(ENTRANTS_QUERY, (event_name,))
+        return sort_entrants(rows)
+
+    names, entrants = (await cached(available_partners_cache, event_name, load)).value
+    return json_payload(request, select_partners(names, entrants, int(current_user_id), *filters))
+
+
+async def get_player_dashboard(request, player_id):
+    player_id = int(player_id)
+
+    async def load():
+        rows, _ = await fetch(DASHBOARD_QUERY, (player_id,))
+        if not rows:
+            raise NotFound()
+        return compose_dashboard(rows)
+
+    try:
+        entry = await cached(dashboard_cache, player_id, load)
+    except NotFound:
+        return json_payload(request, '{"error":"Player not found"}', status=404)
+    return json_payload(request, entry.value, etag=entry.etag)
+
+
+async def get_event_statistics(request):
+    authorization = request.headers.get('authorization', '')
+    if not authorization.startswith('Bearer '):
+        raise Decline()
+    try:
+        with flask_app.app_context():
+            claims = decode_token(authorization[len('Bearer '):])
+    except Exception:
+        # Let flask_jwt_extended produce its usual 401/422 response.
+        raise Decline()
+    if claims.get('type') != 'access':
+        raise Decline()
+
+    # Same ETag as the Flask view; versions and rows come from one connection.
+    async def load(connection):
+        versions, _ = await run(connection, *table_versions_query(STATISTICS_TABLES))
+        etag = versions_etag(dict(versions), STATISTICS_TABLES, request.scope['path'])
+        if matching_etag(request, etag):
+            return etag, None
+        rows, plan = await run(connection, SUMMARY_QUERY)
+        return etag, plan.dumps(rows)
+
+    etag, body = await using_connection(load, readonly=True)
+    return json_payload(request, body, etag=etag)
+
+
+# (pattern, handler, endpoint name used by the Flask view, for metrics)
+ROUTES = (
+    (re.compile(r'^/api/events$'), get_events, 'events.get_events'),
+    (re.compile(r'^/api/partners/available/([^/]+)/(\d+)$'), get_available_partners,
+     'partners.get_available_partners'),
+    (re.compile(r'^/api/players/dashboard/(\d+)$'), get_player_dashboard, 'players.get_player_dashboard'),
+    (re.compile(r'^/api/admin/statistics$'), get_event_statistics, 'admin.get_event_statistics'),
+)
+
+
+def _cors_headers(request):
+    origin = request.headers.get('origin')
+    if origin not in CORS_ORIGINS:
+        return []
+    return [
+        (b'access-control-allow-origin', origin.encode('latin-1')),
+        (b'access-control-allow-credentials', b'true'),
+        (b'vary', b'Origin'),
+    ]
+
+
+def _pinned(request):
+    """True while the client's read-your-writes cookie (set by replication.py) is valid."""
+    cookies = SimpleCookie()
+    try:
+        cookies.load(request.headers.get('cookie', ''))
+    except CookieError:
+        return False
+    morsel = cookies.get(Config.READ_YOUR_WRITES_COOKIE)
+    return morsel is not None and pinned_until(morsel.value) > time.time()
+
+
+async def _send_payload(send, request, status, headers, body):
+    headers, body = compress_payload(request, status, headers, body)
+    headers.extend(_cors_headers(request))
+    headers.append((b'content-length', str(len(body)).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _wake(loop, event):
+    def notify():
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            # The loop is gone; the stream is ending anyway.
+            pass
+    return notify
+
+
+async def stream_changes(scope, receive, send):
+    """routes.changes.stream_changes, waiting on the event loop instead of a thread."""
+    request = Request(scope)
+    params = parse_qsl(scope.get('query_string', b'').decode('latin-1'))
+    events = [value for name, value in params if name == 'event' and value]
+    try:
+        players = [int(value) for name, value in params if name == 'player' and value]
+    except ValueError:
+        return await _send_payload(
+            send, request, *json_payload(request, '{"error":"player must be a player id"}', status=400),
+        )
+    last_event_id = request.headers.get('last-event-id') or request.args.get('last_event_id')
+    try:
+        subscription, backlog = bus.subscribe(events, players, last_event_id)
+    except TooManySubscribers:
+        status, headers, body = json_payload(request, '{"error":"Too many open change streams"}', status=503)
+        headers.append((b'retry-after', b'30'))
+        return await _send_payload(send, request, status, headers, body)
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscription.notify = _wake(loop, ready)
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        ready.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            *_cors_headers(request),
+        ]})
+        chunks = ['retry: 3000\n\n', *map(format_change, backlog)]
+        deadline = loop.time() + Config.CHANGES_STREAM_MAX_SECONDS
+        while not watcher.done():
+            if chunks:
+                await send({'type': 'http.response.body', 'body': ''.join(chunks).encode(), 'more_body': True})
+                chunks = []
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            # Cleared before polling, so a change put in between still wakes the wait.
+            ready.clear()
+            change = subscription.get()
+            if change is not None:
+                chunks.append(format_change(change))
+                continue
+            try:
+                await asyncio.wait_for(ready.wait(), min(Config.CHANGES_HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                chunks.append(': keepalive\n\n')
+        if not watcher.done():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        subscription.close()
+        watcher.cancel()
+        metrics.registry.observe_request('changes.stream_changes', 'GET', 200, time.perf_counter() - started, 0, 0.0)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            cache_sync.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+        return await wsgi_app(scope, receive, send)
+    if scope['path'] == '/api/changes/stream':
+        return await stream_changes(scope, receive, send)
+
+    for pattern, handler, endpoint in ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            break
+    else:
+        return await wsgi_app(scope, receive, send)
+
+    request = Request(scope)
+    started = time.perf_counter()
+    tally = [0, 0.0]
+    token = _query_tally.set(tally)
+    routing = _reads_from_primary.set(_pinned(request))
+    try:
+        status, headers, body = await handler(request, *match.groups())
+    except Decline:
+        return await wsgi_app(scope, receive, send)
+    except Exception as e:
+        logger.exception("Error in async %s", endpoint)
+        status, headers, body = json_payload(request, '{"error":%s}' % json.dumps(str(e)), status=500)
+    finally:
+        _reads_from_primary.reset(routing)
+        _query_tally.reset(token)
+
+    await _send_payload(send, request, status, headers, body)
+    metrics.registry.observe_request(endpoint, 'GET', status, time.perf_counter() - started, tally[0], tally[1])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Serve the API with uvicorn (async read paths)')
+    host, _, port = Config.SERVE_BIND.rpartition(':')
+    parser.add_argument('--host', default=host or '0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(port or 5000))
+    parser.add_argument('--workers', type=int, default=Config.SERVE_WORKERS or 1)
+    parser.add_argument('--timeout-keep-alive', type=int, default=Config.SERVE_KEEPALIVE)
+    args = parser.parse_args()
+    uvicorn.run('asgi:application', host=args.host, port=args.port, workers=args.workers,
+                timeout_keep_alive=args.timeout_keep_alive, lifespan='on')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the registration API.
+
+Seeds the configured database with synthetic players and registrations,
+then drives the real Flask app in-process (one test client per thread)
+through a weighted mix of user login, dashboard, partner lookup,
+registration and admin listing requests, and reports throughput and
+p50/p95/p99 latency per scenario. With ``--url`` the same mix is sent
+over HTTP to a running server instead (``app.py``, ``serve.py`` or
+``asgi.py``), one keep-alive connection per thread.
+
+    docker compose -f docker-compose.benchmark.yml up -d
+    export DB_HOST=127.0.0.1 DB_PASSWORD=benchmark
+    python benchmark.py --seed 5000 --duration 30 --threads 8 --write-baseline
+    python benchmark.py --duration 30 --threads 8        # compare with the baseline
+    python benchmark.py --url http://127.0.0.1:5000 --threads 8 --duration 30
+
+Never point this at a database holding real registrations: seeding
+deletes and re-creates the synthetic players (emails @bench.invalid).
+"""
+import argparse
+import http.client
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date, timedelta
+from urllib.parse import quote, urlsplit
+
+from config import Config
+from db import get_db_connection
+
+SEED_EMAIL_DOMAIN = 'bench.invalid'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+INSERT_CHUNK_SIZE = 1000
+
+SINGLES_EVENTS = ("Men's Singles", "Women's Singles")
+DOUBLES_EVENTS = ("Men's Doubles", "Women's Doubles", "Mixed Doubles")
+CITIES = ('Dehradun', 'Haridwar', 'Rishikesh', 'Haldwani', 'Nainital', 'Roorkee', 'Almora')
+
+# Relative request weights; roughly what registration week looks like.
+DEFAULT_MIX = {
+    'user_login': 20,
+    'dashboard': 30,
+    'partner_lookup': 25,
+    'registration': 10,
+    'admin_listing': 10,
+    'admin_statistics': 5,
+}
+
+# Not in the default mix; request them with --mix.
+DB_FREE_SCENARIOS = ('health',)
+
+PLAYER_INSERT = (
+    "INSERT INTO tbl_players (name, whatsapp_number, date_of_birth, email, city, gender) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+PARTNER_INSERT = "INSERT INTO tbl_partners (event_name, user_id, partner_id, ranking) VALUES (%s, %s, %s, %s)"
+
+
+class HttpResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+
+class HttpClient:
+    """Just enough of the Flask test client's interface to run the scenarios over HTTP."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.connection = None
+
+    def open(self, method, path, json_body=None, headers=None):
+        body = None
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        url = quote(self.prefix + path, safe='/?=&')
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, url, body=body, headers=headers)
+                response = self.connection.getresponse()
+                response.read()
+                return HttpResponse(response.status)
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection; reconnect once.
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+
+    def get(self, path, headers=None):
+        return self.open('GET', path, headers=headers)
+
+    def post(self, path, json=None, headers=None):
+        return self.open('POST', path, json_body=json, headers=headers)
+
+    def delete(self, path, headers=None):
+        return self.open('DELETE', path, headers=headers)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile.
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _synthetic_player(index, rng):
+    gender = 'male' if index % 2 == 0 else 'female'
+    born = date(1970, 1, 1) + timedelta(days=rng.randrange(365 * 40))
+    return (
+        f'Bench Player {index:06d}',
+        f'6{index:09d}',
+        born,
+        f'player{index}@{SEED_EMAIL_DOMAIN}',
+        rng.choice(CITIES),
+        gender,
+    )
+
+
+def seed(connection, players, registered_fraction=0.5, rng_seed=42):
+    """Replace the synthetic data set with ``players`` players.
+
+    About ``registered_fraction`` of them are entered into a singles and a
+    doubles event (half of the doubles entries paired); the rest are left
+    free for the registration scenario. Returns the number of entries.
+    """
+    rng = random.Random(rng_seed)
+    with connection.cursor() as cursor:
+        connection.begin()
+        try:
+            # Delete the entries first: cascaded deletes would skip the
+            # tbl_event_stats triggers and leave the counters too high.
+            cursor.execute(
+                "DELETE pt FROM tbl_partners pt JOIN tbl_players p ON p.id = pt.user_id WHERE p.email LIKE %s",
+                ('%@' + SEED_EMAIL_DOMAIN,),
+            )
+            cursor.execute("DELETE FROM tbl_players WHERE email LIKE %s", ('%@' + SEED_EMAIL_DOMAIN,))
+            rows = [_synthetic_player(index, rng) for index in range(players)]
+            for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                cursor.executemany(PLAYER_INSERT, rows[start:start + INSERT_CHUNK_SIZE])
+
+            cursor.execute(
+                "SELECT id, gender FROM tbl_players WHERE email LIKE %s ORDER BY id",
+                ('%@' + SEED_EMAIL_DOMAIN,),
+            )
+            seeded = cursor.fetchall()
+            registered = seeded[:int(len(seeded) * registered_fraction)]
+
+            entries = []
+            for position, (player_id, gender) in enumerate(registered):
+                singles = SINGLES_EVENTS[0] if gender == 'male' else SINGLES_EVENTS[1]
+                entries.append((singles, player_id, None, rng.randint(1, 64) if position % 3 == 0 else None))
+            by_gender = {'male': [], 'female': []}
+            for player_id, gender in registered:
+                by_gender[gender].append(player_id)
+            for gender, event_name in (('male', DOUBLES_EVENTS[0]), ('female', DOUBLES_EVENTS[1])):
+                ids = by_gender[gender]
+                for position in range(0, len(ids) - 1, 2):
+                    paired = position % 4 == 0
+                    first, second = ids[position], ids[position + 1]
+                    entries.append((event_name, first, second if paired else None, None))
+                    entries.append((event_name, second, first if paired else None, None))
+            for start in range(0, len(entries), INSERT_CHUNK_SIZE):
+                cursor.executemany(PARTNER_INSERT, entries[start:start + INSERT_CHUNK_SIZE])
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return len(entries)
+
+
+def load_fixture(connection):
+    """Ids, credentials and free players of the seeded data set."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT p.id, p.whatsapp_number, p.date_of_birth, p.gender,
+                   EXISTS(SELECT 1 FROM tbl_partners pt WHERE pt.user_id = p.id)
+            FROM tbl_players p
+            WHERE p.email LIKE %s
+            ORDER BY p.id
+            """,
+            ('%@' + SEED_EMAIL_DOMAIN,),
+        )
+        rows = cursor.fetchall()
+    if not rows:
+        raise SystemExit('No synthetic players found; run with --seed N first')
+    return {
+        'players': [(row[0], row[1], row[2].isoformat(), row[3]) for row in rows],
+        'free': deque(row[0] for row in rows if not row[4]),
+        'registered': [row[0] for row in rows if row[4]],
+    }
+
+
+class Scenarios:
+    """One method per request type; each issues exactly one timed request.
+
+    An optional ``prepare_<name>`` method runs untimed first and its
+    result is passed to the scenario.
+    """
+
+    def __init__(self, fixture, admin_token, rng):
+        self.fixture = fixture
+        self.admin_headers = {'Authorization': f'Bearer {admin_token}'}
+        self.rng = rng
+        self._free_lock = threading.Lock()
+
+    def _player(self):
+        return self.rng.choice(self.fixture['players'])
+
+    def user_login(self, client):
+        _, whatsapp, date_of_birth, _ = self._player()
+        return client.post('/api/auth/user-login', json={'whatsapp': whatsapp, 'date_of_birth': date_of_birth})
+
+    def dashboard(self, client):
+        return client.get(f'/api/players/dashboard/{self._player()[0]}')
+
+    def partner_lookup(self, client):
+        player_id, _, _, gender = self._player()
+        event_name = DOUBLES_EVENTS[0] if gender == 'male' else DOUBLES_EVENTS[1]
+        return client.get(f'/api/partners/available/{event_name}/{player_id}')
+
+    def prepare_registration(self, client):
+        with self._free_lock:
+            player_id = self.fixture['free'].popleft() if self.fixture['free'] else None
+        if player_id is None:
+            # Everyone is registered; recycle a player so they can register again.
+            player_id = self.rng.choice(self.fixture['registered'])
+            client.delete(f'/api/partners/delete-all/{player_id}').close()
+        else:
+            self.fixture['registered'].append(player_id)
+        return player_id
+
+    def registration(self, client, player_id):
+        return client.post('/api/partners/register-events', json={
+            'player_id': player_id,
+            'event1_name': DOUBLES_EVENTS[2],
+            'partner1_id': None,
+            'event2_name': None,
+            'partner2_id': None,
+        })
+
+    def admin_listing(self, client):
+        return client.get('/api/admin/registrations?limit=50', headers=self.admin_headers)
+
+    def admin_statistics(self, client):
+        return client.get('/api/admin/statistics', headers=self.admin_headers)
+
+    def health(self, client):
+        # Touches no database: measures the server and framework overhead alone.
+        return client.get('/api/health')
+
+
+def run(make_client, scenarios, mix, threads, duration, warmup):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    start_gate = threading.Barrier(threads + 1)
+    state = {'recording': False, 'stop': False}
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = make_client()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        start_gate.wait()
+        while not state['stop']:
+            name = rng.choices(names, weights)[0]
+            prepare = getattr(scenarios, 'prepare_' + name, None)
+            args = (prepare(client),) if prepare else ()
+            started = time.perf_counter()
+            response = getattr(scenarios, name)(client, *args)
+            elapsed = time.perf_counter() - started
+            response.close()
+            if state['recording']:
+                local[name].append(elapsed)
+                if response.status_code >= 400:
+                    local_errors[name] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    pool = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(threads)]
+    for thread in pool:
+        thread.start()
+    start_gate.wait()
+    time.sleep(warmup)
+    state['recording'] = True
+    measured_from = time.perf_counter()
+    time.sleep(duration)
+    state['recording'] = False
+    measured = time.perf_counter() - measured_from
+    state['stop'] = True
+    for thread in pool:
+        thread.join()
+
+    results = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        results[name] = {
+            'requests': len(latencies),
+            'errors': errors[name],
+            'throughput_rps': round(len(latencies) / measured, 2),
+            'p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(_percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        }
+    total = sum(result['requests'] for result in results.values())
+    results['_total'] = {'requests': total, 'throughput_rps': round(total / measured, 2)}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if not actual or name.startswith('_'):
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if expected.get(metric) and actual[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f'{name} {metric}: {actual[metric]} > {expected[metric]} (+{tolerance:.0%})')
+        if expected.get('throughput_rps') and actual['throughput_rps'] < expected['throughput_rps'] * (1 - tolerance):
+            regressions.append(
+                f"{name} throughput_rps: {actual['throughput_rps']} < {expected['throughput_rps']} (-{tolerance:.0%})"
+            )
+        if actual['errors'] > expected.get('errors', 0):
+            regressions.append(f"{name} errors: {actual['errors']} > {expected.get('errors', 0)}")
+    return regressions
+
+
+def _print_report(results):
+    print(f"{'scenario':<18}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        if name.startswith('_'):
+            continue
+        print(f"{name:<18}{result['requests']:>10}{result['errors']:>8}{result['throughput_rps']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+    print(f"total: {results['_total']['requests']} requests, {results['_total']['throughput_rps']} req/s")
+
+
+def _parse_mix(spec):
+    mix = dict(DEFAULT_MIX)
+    if spec:
+        mix = {}
+        for item in spec.split(','):
+            name, _, weight = item.partition('=')
+            if name not in DEFAULT_MIX and name not in DB_FREE_SCENARIOS:
+                raise SystemExit(f'Unknown scenario: {name}')
+            mix[name] = int(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the registration API against a seeded database')
+    parser.add_argument('--seed', type=int, metavar='N', help='(re)create N synthetic players before the run')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before recording')
+    parser.add_argument('--mix', help='e.g. "dashboard=3,partner_lookup=1" (default: %s)' %
+                        ','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--write-baseline', action='store_true', help='save this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression, as a fraction')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--url', help='benchmark a running server (e.g. http://127.0.0.1:5000) over HTTP')
+    args = parser.parse_args()
+    mix = _parse_mix(args.mix)
+
+    fixture = None
+    if args.seed or set(mix) - set(DB_FREE_SCENARIOS):
+        connection = get_db_connection()
+        if not connection:
+            print("Database connection failed")
+            sys.exit(1)
+        try:
+            if args.seed:
+                entries = seed(connection, args.seed)
+                print(f"Seeded {args.seed} players and {entries} registrations into {Config.DB_CONFIG['database']}")
+            fixture = load_fixture(connection)
+        finally:
+            connection.close()
+
+    # Imported late so seeding does not pay for (or log) app start-up.
+    from flask_jwt_extended import create_access_token
+    from app import app
+
+    with app.app_context():
+        admin_token = create_access_token(identity='admin')
+    scenarios = Scenarios(fixture, admin_token, random.Random(7))
+    if args.url:
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        make_client = app.test_client
+    results = run(make_client, scenarios, mix, args.threads, args.duration, args.warmup)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_report(results)
+
+    if args.write_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --write-baseline to create one")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# cache.py
+"""Small in-process caches for hot, rarely-changing read paths."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'etag', 'expires_at'])
+
+_caches = {}
+
+
+def make_etag(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.blake2b(value, digest_size=12).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    Every invalidation bumps a generation counter; values loaded under an
+    older generation are returned to their caller but never stored, so a
+    slow load that raced with a write cannot re-populate stale data.
+
+    ``tables`` names the tables the cached values are read from;
+    cache_sync.py clears the cache when another worker changes one.
+    """
+
+    def __init__(self, name, ttl, max_entries=1024, tables=()):
+        self.name = name
+        self.ttl = ttl
+        self.tables = frozenset(tables)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        _caches[name] = self
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def set(self, key, value, generation=None):
+        etag = make_etag(value) if isinstance(value, (str, bytes)) else None
+        entry = CacheEntry(value, etag, time.monotonic() + self.ttl)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_or_load(self, key, loader):
+        """Return the cached entry for ``key``, calling ``loader()`` on a miss."""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        generation = self._generation
+        return self.set(key, loader(), generation=generation)
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when called without keys."""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+                'generation': self._generation,
+            }
+
+
+def registered_caches():
+    return list(_caches.values())
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in _caches.items()}
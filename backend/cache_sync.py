@@ -0,0 +1,89 @@
+# cache_sync.py
+"""Cross-worker invalidation of the in-process caches.
+
+A write clears the caches of the worker that handled it right away, but
+every server worker keeps its own copies. Each worker therefore runs a
+poller thread that reads tbl_table_versions every CACHE_SYNC_SECONDS and
+clears every cache whose ``tables`` include one that changed since the
+last poll, so a write made anywhere is seen by all workers within that
+interval instead of after the cache TTL. Changes made outside the app
+(no version bump) still wait for the TTL.
+"""
+import logging
+import threading
+import time
+
+from cache import registered_caches
+from config import Config
+from db import db_connection
+from versions import get_table_versions
+
+logger = logging.getLogger(__name__)
+
+
+class CacheSync:
+    def __init__(self, poll_seconds):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._versions = None
+        self._polls = 0
+        self._invalidations = 0
+
+    def start(self):
+        """Start the poller unless it is running (or disabled); cheap to call per request."""
+        if self.poll_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='cache-sync', daemon=True)
+                self._thread.start()
+
+    def reset(self):
+        """Forget the parent's state in a freshly forked worker."""
+        with self._lock:
+            self._thread = None
+            self._versions = None
+
+    def sync(self):
+        """Poll once; clears caches fed by changed tables and returns those tables."""
+        caches = [cache for cache in registered_caches() if cache.tables]
+        tables = sorted(set().union(*(cache.tables for cache in caches)))
+        if not tables:
+            return set()
+        with db_connection() as connection, connection.cursor() as cursor:
+            current = get_table_versions(cursor, tables)
+        previous, self._versions = self._versions, current
+        self._polls += 1
+        if previous is None:
+            # Entries loaded before the first poll have no baseline to compare with.
+            changed = set(tables)
+        else:
+            changed = {table for table in tables if current.get(table, 0) != previous.get(table, 0)}
+        for cache in caches:
+            if cache.tables & changed:
+                cache.invalidate()
+                self._invalidations += 1
+        return changed
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Cache sync failed to read table versions")
+            time.sleep(self.poll_seconds)
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'polls': self._polls,
+            'invalidations': self._invalidations,
+        }
+
+
+sync = CacheSync(Config.CACHE_SYNC_SECONDS)
+
+
+def init_app(app):
+    app.before_request(sync.start)
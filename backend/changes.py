@@ -0,0 +1,236 @@
+# changes.py
+"""In-process change bus behind the ``/api/changes/stream`` SSE endpoint.
+
+Write paths call ``publish`` after committing, with the events and
+players a change concerns. Each stream subscribes with optional event
+and player filters and gets the matching changes as small deltas.
+
+Every subscriber has a bounded queue. A client that falls behind loses
+its queued changes and gets a single ``resync`` change instead, telling
+it to re-fetch once rather than letting the queue grow without bound.
+Recent changes are kept for ``Last-Event-ID`` resumption; a client that
+reconnects past that window, or to another worker, is told to resync.
+
+Streams served by asgi.py wait on the event loop (see
+``Subscription.notify``). The threaded Flask route holds a request thread
+per stream, so it is capped at CHANGES_THREAD_STREAMS per process.
+
+Server workers do not share the bus. While anyone is subscribed, a poller
+thread watches tbl_table_versions and publishes ``resync`` when a table
+changed more often than this worker published changes for it, so writes
+served by other workers still reach every stream.
+"""
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+from config import Config
+from db import db_connection
+from versions import get_table_versions
+
+logger = logging.getLogger(__name__)
+
+Change = namedtuple('Change', ['seq', 'kind', 'events', 'players', 'data', 'at'])
+
+RESYNC = 'resync'
+
+# Table whose version a change of each kind (by prefix) bumps; write paths
+# that bump several tables pass ``tables`` to publish() instead.
+KIND_TABLES = {
+    'player': 'tbl_players',
+    'registration': 'tbl_partners',
+    'partner': 'tbl_partners',
+    'ranking': 'tbl_partners',
+    'draw': 'tbl_draws',
+}
+WATCHED_TABLES = tuple(sorted(set(KIND_TABLES.values())))
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, bus, events, players, maxsize):
+        self.bus = bus
+        self.events = frozenset(events or ())
+        self.players = frozenset(players or ())
+        self.maxsize = maxsize
+        self.overflows = 0
+        self._queue = deque()
+        self._ready = threading.Condition(threading.Lock())
+        self.closed = False
+        # Called (from the publishing thread) after every put; asgi.py uses
+        # it to wake a coroutine instead of blocking a thread in get().
+        self.notify = None
+
+    def matches(self, change):
+        if self.events and change.events and not self.events & change.events:
+            return False
+        if self.players and change.players and not self.players & change.players:
+            return False
+        return True
+
+    def put(self, change):
+        with self._ready:
+            if len(self._queue) >= self.maxsize:
+                # Too slow: drop the backlog and ask the client to re-fetch.
+                self._queue.clear()
+                self._queue.append(self.bus.resync_change('overflow'))
+                self.overflows += 1
+            else:
+                self._queue.append(change)
+            self._ready.notify()
+        if self.notify is not None:
+            self.notify()
+
+    def get(self, timeout=0):
+        """Next change, or None after ``timeout`` seconds without one."""
+        with self._ready:
+            if not self._queue and timeout > 0:
+                self._ready.wait(timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.bus.unsubscribe(self)
+
+
+class ChangeBus:
+    def __init__(self, queue_size=256, replay_size=1024, max_subscribers=200, poll_seconds=2.0):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)
+        self._seq = itertools.count(1)
+        self._published = 0
+        self._local_bumps = {}
+        self._poller = None
+        # Event ids are only meaningful to the process that issued them.
+        self.bus_id = uuid.uuid4().hex[:8]
+
+    def event_id(self, change):
+        return f'{self.bus_id}-{change.seq}'
+
+    def resync_change(self, reason, **data):
+        return Change(next(self._seq), RESYNC, frozenset(), frozenset(), dict(data, reason=reason), time.time())
+
+    def publish(self, kind, events=(), players=(), tables=None, **data):
+        change = Change(
+            next(self._seq), kind,
+            frozenset(event for event in events if event),
+            frozenset(player for player in players if player),
+            data, time.time(),
+        )
+        if tables is None:
+            table = KIND_TABLES.get(kind.split('.', 1)[0])
+            tables = [table] if table else []
+        with self._lock:
+            self._published += 1
+            self._replay.append(change)
+            for table in tables:
+                self._local_bumps[table] = self._local_bumps.get(table, 0) + 1
+            subscribers = [subscriber for subscriber in self._subscribers if subscriber.matches(change)]
+        for subscriber in subscribers:
+            subscriber.put(change)
+        return change
+
+    def _broadcast(self, change):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(change)
+
+    def subscribe(self, events=None, players=None, last_event_id=None):
+        """Register a subscriber; returns ``(subscription, backlog)``.
+
+        ``backlog`` holds the changes missed since ``last_event_id`` (or a
+        single resync when they are no longer available).
+        """
+        subscription = Subscription(self, events, players, self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscribers.add(subscription)
+            backlog = self._backlog(subscription, last_event_id)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='change-poller', daemon=True)
+                self._poller.start()
+        return subscription, backlog
+
+    def _backlog(self, subscription, last_event_id):
+        if not last_event_id:
+            return []
+        bus_id, _, seq = last_event_id.partition('-')
+        oldest = self._replay[0].seq if self._replay else None
+        if bus_id != self.bus_id or not seq.isdigit() or (oldest is not None and int(seq) < oldest - 1):
+            return [self.resync_change('missed')]
+        seq = int(seq)
+        return [change for change in self._replay if change.seq > seq and subscription.matches(change)]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def reset(self):
+        """Start over with a new id; used in forked server workers."""
+        with self._lock:
+            self._subscribers.clear()
+            self._replay.clear()
+            self._local_bumps.clear()
+            self._poller = None
+            self.bus_id = uuid.uuid4().hex[:8]
+
+    def _poll(self):
+        versions = None
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            try:
+                with db_connection() as connection, connection.cursor() as cursor:
+                    current = get_table_versions(cursor, WATCHED_TABLES)
+                with self._lock:
+                    local = self._local_bumps
+                    self._local_bumps = {}
+                if versions is not None:
+                    changed = [table for table in WATCHED_TABLES
+                               if current.get(table, 0) - versions.get(table, 0) > local.get(table, 0)]
+                    if changed:
+                        self._broadcast(self.resync_change('external', tables=changed))
+                versions = current
+            except Exception:
+                logger.exception("Change poller failed to read table versions")
+            time.sleep(self.poll_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self._published,
+                'overflows': sum(subscriber.overflows for subscriber in self._subscribers),
+            }
+
+
+bus = ChangeBus(
+    queue_size=Config.CHANGES_QUEUE_SIZE,
+    replay_size=Config.CHANGES_REPLAY_SIZE,
+    max_subscribers=Config.CHANGES_MAX_SUBSCRIBERS,
+    poll_seconds=Config.CHANGES_POLL_SECONDS,
+)
+
+
+def publish(kind, events=(), players=(), tables=None, **data):
+    """Announce a committed change; never raises into the write path."""
+    try:
+        return bus.publish(kind, events, players, tables, **data)
+    except Exception:
+        logger.exception("Failed to publish %s change", kind)
+        return None
@@ -0,0 +1,81 @@
+# compression.py
+"""gzip/brotli compression of large JSON responses.
+
+Only buffered JSON bodies of at least ``COMPRESS_MIN_BYTES`` are encoded;
+streamed exports are left alone. A strong ETag names one representation,
+so encoded bodies get ``-gzip``/``-br`` appended to theirs, and
+queries.etag_matches accepts any of the variants on revalidation.
+asgi.py applies the same rules to the responses it serves itself.
+"""
+import gzip
+
+from flask import request
+
+from config import Config
+from queries import ETAG_ENCODING_SUFFIXES
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset({'application/json', 'application/x-ndjson', 'text/csv'})
+
+
+def choose_encoding(accepted):
+    """Preferred encoding allowed by a parsed Accept-Encoding, or None."""
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=Config.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=Config.COMPRESS_GZIP_LEVEL)
+
+
+def _echo_matched_etag(response):
+    # A 304 carries the ETag of the representation the client holds.
+    etag, weak = response.get_etag()
+    if etag is None:
+        return
+    for suffix in ETAG_ENCODING_SUFFIXES.values():
+        if request.if_none_match.contains(etag + suffix):
+            response.set_etag(etag + suffix, weak)
+            return
+
+
+def compress_response(response):
+    if response.status_code == 304:
+        _echo_matched_etag(response)
+        return response
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(encode_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None:
+        response.set_etag(etag + ETAG_ENCODING_SUFFIXES[encoding], weak)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
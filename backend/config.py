@@ -5,6 +5,27 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _replica_configs():
+    """DB_REPLICA_HOSTS="replica1,replica2:3307" -> one connection config per replica."""
+    configs = []
+    for entry in os.getenv('DB_REPLICA_HOSTS', '').split(','):
+        host, _, port = entry.strip().partition(':')
+        if not host:
+            continue
+        configs.append({
+            'host': host,
+            'port': int(port or 3306),
+            'user': os.getenv('DB_REPLICA_USER') or os.getenv('DB_USER', 'root'),
+            'password': os.getenv('DB_REPLICA_PASSWORD') or os.getenv('DB_PASSWORD', ''),
+            'database': os.getenv('DB_NAME', 'tennis_association'),
+            'autocommit': True,
+            # A write routed here by mistake fails instead of diverging the replica.
+            'init_command': 'SET SESSION TRANSACTION READ ONLY',
+        })
+    return configs
+
+
 class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET', 'your-secret-key-change-this')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
@@ -15,4 +36,91 @@ class Config:
         'password': os.getenv('DB_PASSWORD', ''),
         'database': os.getenv('DB_NAME', 'tennis_association'),
         'autocommit': True
-    }
\ No newline at end of file
+    }
+
+    # Connection pool (see db.ConnectionPool)
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+    DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', '30'))
+    DB_POOL_WAIT_TIMEOUT = float(os.getenv('DB_POOL_WAIT_TIMEOUT', '10'))
+    # aiomysql pool behind asgi.py; connections are cheap to hold for coroutines
+    ASYNC_DB_POOL_MAX_SIZE = int(os.getenv('ASYNC_DB_POOL_MAX_SIZE', '50'))
+
+    # Read replicas for read-only handlers (see db.ReplicaRouter); a replica
+    # that fails is skipped for DB_REPLICA_RETRY_SECONDS. After a write, the
+    # client's reads stay on the primary for READ_YOUR_WRITES_SECONDS.
+    DB_REPLICAS = _replica_configs()
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv('DB_REPLICA_RETRY_SECONDS', '30'))
+    READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+    READ_YOUR_WRITES_COOKIE = os.getenv('READ_YOUR_WRITES_COOKIE', 'uta_primary_until')
+
+    # In-process read caches (see cache.TTLCache)
+    EVENT_CACHE_TTL = float(os.getenv('EVENT_CACHE_TTL', '300'))
+    PARTNER_CACHE_TTL = float(os.getenv('PARTNER_CACHE_TTL', '30'))
+    DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+    # How often each worker checks tbl_table_versions for writes made by
+    # other workers (see cache_sync.py); 0 leaves cross-worker staleness to the TTLs
+    CACHE_SYNC_SECONDS = float(os.getenv('CACHE_SYNC_SECONDS', '2'))
+
+    # Login throttling (see ratelimit.py): attempts per window, per client
+    # address (admin and player logins counted separately) and per WhatsApp
+    # number, and how long a failed pair is remembered
+    LOGIN_RATE_WINDOW = float(os.getenv('LOGIN_RATE_WINDOW', '60'))
+    LOGIN_RATE_LIMIT_IP = int(os.getenv('LOGIN_RATE_LIMIT_IP', '30'))
+    LOGIN_RATE_LIMIT_WHATSAPP = int(os.getenv('LOGIN_RATE_LIMIT_WHATSAPP', '10'))
+    LOGIN_FAILURE_CACHE_TTL = float(os.getenv('LOGIN_FAILURE_CACHE_TTL', '60'))
+
+    # Admin accounts (see admin_users.py) and verified-token cache
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', '2'))
+    JWT_CACHE_MAX_ENTRIES = int(os.getenv('JWT_CACHE_MAX_ENTRIES', '1024'))
+
+    # How long POST /api/registrations remembers an Idempotency-Key
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+    # Logging (see logging_setup.py); LOG_LEVELS holds per-module overrides
+    # such as "routes.players=DEBUG,db=WARNING"
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+
+    # Statement profiler (see profiler.py); off unless DB_PROFILE=1
+    DB_PROFILE = os.getenv('DB_PROFILE', '').lower() in ('1', 'true', 'yes')
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+    DB_PROFILE_EXPLAIN = os.getenv('DB_PROFILE_EXPLAIN', '1').lower() in ('1', 'true', 'yes')
+
+    # Production server (see serve.py); SERVE_WORKERS=0 means 2 * cores + 1
+    SERVE_BIND = os.getenv('SERVE_BIND', '0.0.0.0:5000')
+    SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', '0'))
+    SERVE_THREADS = int(os.getenv('SERVE_THREADS', '4'))
+    SERVE_TIMEOUT = int(os.getenv('SERVE_TIMEOUT', '30'))
+    SERVE_GRACEFUL_TIMEOUT = int(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30'))
+    SERVE_KEEPALIVE = int(os.getenv('SERVE_KEEPALIVE', '5'))
+    SERVE_MAX_REQUESTS = int(os.getenv('SERVE_MAX_REQUESTS', '10000'))
+    SERVE_PRELOAD = os.getenv('SERVE_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are
+    # trusted (werkzeug ProxyFix); 0 uses the socket peer address as is
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+    FLASK_DEBUG = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+    # Response compression (see compression.py); brotli is used when installed
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '5'))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+
+    # Order-of-play defaults (see scheduler.py)
+    SCHEDULE_MATCH_MINUTES = int(os.getenv('SCHEDULE_MATCH_MINUTES', '90'))
+    SCHEDULE_REST_MINUTES = int(os.getenv('SCHEDULE_REST_MINUTES', '60'))
+
+    # Server-Sent Events change stream (see changes.py)
+    CHANGES_QUEUE_SIZE = int(os.getenv('CHANGES_QUEUE_SIZE', '256'))
+    CHANGES_REPLAY_SIZE = int(os.getenv('CHANGES_REPLAY_SIZE', '1024'))
+    CHANGES_MAX_SUBSCRIBERS = int(os.getenv('CHANGES_MAX_SUBSCRIBERS', '200'))
+    # Streams served by the threaded Flask app (gunicorn, dev server) hold a
+    # request thread each, so only a quarter of SERVE_THREADS may stream;
+    # asgi.py serves streams on its event loop up to CHANGES_MAX_SUBSCRIBERS
+    CHANGES_THREAD_STREAMS = int(os.getenv('CHANGES_THREAD_STREAMS', '0')) or max(1, SERVE_THREADS // 4)
+    CHANGES_HEARTBEAT_SECONDS = float(os.getenv('CHANGES_HEARTBEAT_SECONDS', '15'))
+    CHANGES_STREAM_MAX_SECONDS = float(os.getenv('CHANGES_STREAM_MAX_SECONDS', '300'))
+    CHANGES_POLL_SECONDS = float(os.getenv('CHANGES_POLL_SECONDS', '2'))
@@ -0,0 +1,90 @@
+# dashboard.py
+"""Player dashboard loader shared by login and the dashboard endpoint.
+
+The player row and their event registrations come back from one LEFT JOIN
+round trip, and the composed JSON payload is cached per player id until a
+player or partner write invalidates it.
+"""
+from cache import TTLCache
+from config import Config
+from db import db_connection
+from queries import RowPlan
+
+# Everything the dashboard and its edit form read; nothing else.
+PLAYER_FIELDS = (
+    'id', 'name', 'whatsapp_number', 'date_of_birth', 'email', 'city', 'gender',
+    'shirt_size', 'short_size', 'food_pref', 'stay_y_or_n', 'fee_paid',
+    'address', 'emergency_contact', 'playing_experience', 'medical_conditions',
+    'created_at',
+)
+EVENT_FIELDS = ('event_name', 'partner_id', 'partner_name', 'ranking')
+
+DASHBOARD_QUERY = """
+    SELECT
+        {player_columns},
+        pt.event_name,
+        pt.partner_id,
+        IFNULL(partner.name, 'No partner assigned') AS partner_name,
+        pt.ranking
+    FROM tbl_players p
+    LEFT JOIN tbl_partners pt ON pt.user_id = p.id
+    LEFT JOIN tbl_players partner ON partner.id = pt.partner_id
+    WHERE p.id = %s
+    ORDER BY pt.event_name
+""".format(player_columns=', '.join('p.' + field for field in PLAYER_FIELDS))
+
+_PLAYER_PLAN = RowPlan(PLAYER_FIELDS)
+_EVENT_PLAN = RowPlan(EVENT_FIELDS)
+_SPLIT = len(PLAYER_FIELDS)
+
+dashboard_cache = TTLCache(
+    'dashboards', ttl=Config.DASHBOARD_CACHE_TTL, max_entries=2048, tables=('tbl_players', 'tbl_partners'),
+)
+
+
+def compose_dashboard(rows):
+    """Build ``{"events": [...], "player": {...}}`` JSON text from joined rows."""
+    player = _PLAYER_PLAN.to_json(rows[0][:_SPLIT])
+    events = _EVENT_PLAN.dumps([row[_SPLIT:] for row in rows if row[_SPLIT] is not None])
+    return '{"events":%s,"player":%s}' % (events, player)
+
+
+def _query_dashboard(connection, player_id):
+    with connection.cursor() as cursor:
+        cursor.execute(DASHBOARD_QUERY, (player_id,))
+        rows = cursor.fetchall()
+    return compose_dashboard(rows) if rows else None
+
+
+def load_dashboard(player_id, connection=None):
+    """Return the cache entry for ``player_id``'s dashboard, or None if no such player.
+
+    Pass ``connection`` to reuse one already borrowed by the caller on a miss.
+    """
+    entry = dashboard_cache.get(player_id)
+    if entry is not None:
+        return entry
+
+    generation = dashboard_cache.generation
+    if connection is not None:
+        payload = _query_dashboard(connection, player_id)
+    else:
+        with db_connection() as connection:
+            payload = _query_dashboard(connection, player_id)
+    if payload is None:
+        return None
+    return dashboard_cache.set(player_id, payload, generation=generation)
+
+
+def invalidate_dashboards(*player_ids):
+    """Forget cached dashboards for ``player_ids`` (every player if none given)."""
+    ids = []
+    for player_id in player_ids:
+        # Ids arrive from JSON bodies as ints or numeric strings.
+        try:
+            ids.append(int(player_id))
+        except (TypeError, ValueError):
+            continue
+    if player_ids and not ids:
+        return
+    dashboard_cache.invalidate(*ids)
@@ -23,6 +23,10 @@ CREATE TABLE tbl_players (
     food_pref VARCHAR(255),
     stay_y_or_n BOOLEAN DEFAULT FALSE,
     fee_paid BOOLEAN DEFAULT FALSE,
+    address TEXT,
+    emergency_contact VARCHAR(255),
+    playing_experience VARCHAR(255),
+    medical_conditions TEXT,
     gender VARCHAR(10) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -41,10 +45,118 @@ CREATE TABLE tbl_partners (
 );
 
 
+-- Admin accounts; passwords are bcrypt hashes (manage with admin_users.py)
+CREATE TABLE tbl_admin_users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(64) NOT NULL UNIQUE,
+    password_hash CHAR(60) NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    last_login_at TIMESTAMP NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Carries over the previous built-in admin login; change it with
+-- `python admin_users.py set-password admin`
+INSERT INTO tbl_admin_users (username, password_hash) VALUES
+('admin', '$2b$12$bc62XGoEtxR3UXsBxak50.jcnXTCwrOE50Q43FKpDxk74FJGePc0.');
+
+-- Change counters behind the list endpoints' ETags (see versions.py);
+-- application write paths bump them after every change
+CREATE TABLE tbl_table_versions (
+    table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO tbl_table_versions (table_name, version) VALUES
+('tbl_players', 0),
+('tbl_partners', 0),
+('tbl_eventname', 0),
+('tbl_draws', 0),
+('tbl_schedule', 0);
+
+-- Responses of POST /api/registrations by client Idempotency-Key, so a
+-- retried submission replays the first result instead of registering twice
+CREATE TABLE tbl_idempotency_keys (
+    idempotency_key VARCHAR(64) NOT NULL PRIMARY KEY,
+    request_hash CHAR(64) NOT NULL,
+    status_code SMALLINT NULL,
+    response_body TEXT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_idempotency_keys_created (created_at)
+);
+
+-- Knockout draws generated by draws.py / POST /api/draws/<event>; one stored
+-- draw per event, regenerating replaces it. random_seed reproduces the draw.
+CREATE TABLE tbl_draws (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_name VARCHAR(255) NOT NULL UNIQUE,
+    draw_size SMALLINT UNSIGNED NOT NULL,
+    seeds SMALLINT UNSIGNED NOT NULL,
+    entries SMALLINT UNSIGNED NOT NULL,
+    random_seed BIGINT NOT NULL,
+    created_by VARCHAR(64) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (event_name) REFERENCES tbl_eventname(event_name) ON DELETE CASCADE
+);
+
+-- One row per draw position (0-based); user_id NULL is a bye
+CREATE TABLE tbl_draw_slots (
+    draw_id INT NOT NULL,
+    position SMALLINT UNSIGNED NOT NULL,
+    user_id INT NULL,
+    partner_id INT NULL,
+    seed SMALLINT UNSIGNED NULL,
+    PRIMARY KEY (draw_id, position),
+    FOREIGN KEY (draw_id) REFERENCES tbl_draws(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES tbl_players(id) ON DELETE SET NULL,
+    FOREIGN KEY (partner_id) REFERENCES tbl_players(id) ON DELETE SET NULL
+);
+
+-- Order of play built by scheduler.py / POST /api/schedule; one row per
+-- scheduled match, keyed by its position in the event's draw
+CREATE TABLE tbl_schedule (
+    event_name VARCHAR(255) NOT NULL,
+    round TINYINT UNSIGNED NOT NULL,
+    match_number SMALLINT UNSIGNED NOT NULL,
+    court VARCHAR(64) NOT NULL,
+    start_at DATETIME NOT NULL,
+    end_at DATETIME NOT NULL,
+    PRIMARY KEY (event_name, round, match_number),
+    UNIQUE KEY uq_schedule_court_start (court, start_at),
+    INDEX idx_schedule_start (start_at),
+    FOREIGN KEY (event_name) REFERENCES tbl_eventname(event_name) ON DELETE CASCADE
+);
+
+-- Courts, time windows and match/rest lengths the schedule was built with
+CREATE TABLE tbl_schedule_settings (
+    id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    courts TEXT NOT NULL,
+    windows TEXT NOT NULL,
+    match_minutes SMALLINT UNSIGNED NOT NULL,
+    rest_minutes SMALLINT UNSIGNED NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_partners_event_user ON tbl_partners(event_name, user_id);
 CREATE INDEX idx_partners_event_partner ON tbl_partners(event_name, partner_id);
 
+-- Indexes backing the keyset-paginated admin registration listing
+-- (ORDER BY p.name, pt.event_name, p.id and its filters)
+CREATE INDEX idx_players_name_id ON tbl_players(name, id);
+CREATE INDEX idx_players_city ON tbl_players(city);
+CREATE INDEX idx_partners_user_event ON tbl_partners(user_id, event_name);
+CREATE INDEX idx_partners_event_ranking ON tbl_partners(event_name, ranking);
+
+-- Partner picker: covering index for the per-event entrant scan, and
+-- gender/name lookups on players
+CREATE INDEX idx_partners_event_user_partner ON tbl_partners(event_name, user_id, partner_id);
+CREATE INDEX idx_players_gender_name ON tbl_players(gender, name);
+
+-- User login: covering index for the (whatsapp_number, date_of_birth) -> id lookup
+CREATE INDEX idx_players_login ON tbl_players(whatsapp_number, date_of_birth, id);
+
 -- Insert some sample events
 INSERT INTO tbl_eventname (event_name) VALUES 
 ('Men\'s Singles'),
@@ -238,6 +350,86 @@ LEFT JOIN tbl_partners pt ON e.event_name = pt.event_name
 GROUP BY e.event_name
 ORDER BY e.event_name;
 
+-- Per-event registration counters, kept current by the triggers below so the
+-- admin statistics read is O(events). Run `python event_stats.py rebuild` to
+-- backfill an existing database or repair drift (e.g. after cascaded deletes,
+-- which do not fire triggers).
+CREATE TABLE tbl_event_stats (
+    event_name VARCHAR(255) NOT NULL PRIMARY KEY,
+    total_players INT NOT NULL DEFAULT 0,
+    paired_players INT NOT NULL DEFAULT 0,
+    unpaired_players INT NOT NULL DEFAULT 0,
+    ranked_players INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (event_name) REFERENCES tbl_eventname(event_name) ON DELETE CASCADE
+);
+
+INSERT INTO tbl_event_stats (event_name, total_players, paired_players, unpaired_players, ranked_players)
+SELECT
+    e.event_name,
+    COUNT(pt.id),
+    COUNT(pt.partner_id),
+    COUNT(pt.id) - COUNT(pt.partner_id),
+    COUNT(pt.ranking)
+FROM tbl_eventname e
+LEFT JOIN tbl_partners pt ON e.event_name = pt.event_name
+GROUP BY e.event_name;
+
+DELIMITER //
+CREATE TRIGGER event_stats_after_insert
+AFTER INSERT ON tbl_partners
+FOR EACH ROW
+BEGIN
+    INSERT INTO tbl_event_stats (event_name, total_players, paired_players, unpaired_players, ranked_players)
+    VALUES (NEW.event_name, 1, NEW.partner_id IS NOT NULL, NEW.partner_id IS NULL, NEW.ranking IS NOT NULL)
+    ON DUPLICATE KEY UPDATE
+        total_players = total_players + 1,
+        paired_players = paired_players + (NEW.partner_id IS NOT NULL),
+        unpaired_players = unpaired_players + (NEW.partner_id IS NULL),
+        ranked_players = ranked_players + (NEW.ranking IS NOT NULL);
+END //
+
+CREATE TRIGGER event_stats_after_update
+AFTER UPDATE ON tbl_partners
+FOR EACH ROW
+BEGIN
+    IF OLD.event_name = NEW.event_name THEN
+        UPDATE tbl_event_stats SET
+            paired_players = paired_players + (NEW.partner_id IS NOT NULL) - (OLD.partner_id IS NOT NULL),
+            unpaired_players = unpaired_players + (NEW.partner_id IS NULL) - (OLD.partner_id IS NULL),
+            ranked_players = ranked_players + (NEW.ranking IS NOT NULL) - (OLD.ranking IS NOT NULL)
+        WHERE event_name = NEW.event_name;
+    ELSE
+        UPDATE tbl_event_stats SET
+            total_players = total_players - 1,
+            paired_players = paired_players - (OLD.partner_id IS NOT NULL),
+            unpaired_players = unpaired_players - (OLD.partner_id IS NULL),
+            ranked_players = ranked_players - (OLD.ranking IS NOT NULL)
+        WHERE event_name = OLD.event_name;
+
+        INSERT INTO tbl_event_stats (event_name, total_players, paired_players, unpaired_players, ranked_players)
+        VALUES (NEW.event_name, 1, NEW.partner_id IS NOT NULL, NEW.partner_id IS NULL, NEW.ranking IS NOT NULL)
+        ON DUPLICATE KEY UPDATE
+            total_players = total_players + 1,
+            paired_players = paired_players + (NEW.partner_id IS NOT NULL),
+            unpaired_players = unpaired_players + (NEW.partner_id IS NULL),
+            ranked_players = ranked_players + (NEW.ranking IS NOT NULL);
+    END IF;
+END //
+
+CREATE TRIGGER event_stats_after_delete
+AFTER DELETE ON tbl_partners
+FOR EACH ROW
+BEGIN
+    UPDATE tbl_event_stats SET
+        total_players = total_players - 1,
+        paired_players = paired_players - (OLD.partner_id IS NOT NULL),
+        unpaired_players = unpaired_players - (OLD.partner_id IS NULL),
+        ranked_players = ranked_players - (OLD.ranking IS NOT NULL)
+    WHERE event_name = OLD.event_name;
+END //
+DELIMITER ;
+
 -- Trigger to prevent duplicate registrations
 DELIMITER //
 CREATE TRIGGER prevent_duplicate_registration
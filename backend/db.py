@@ -1,24 +1,460 @@
 # db.py
+import contextvars
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import pymysql
+import pymysql.connections
+from pymysql.constants import SERVER_STATUS
 from config import Config
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    """Register ``listener(sql, seconds, error)``, called after every statement."""
+    _query_listeners.append(listener)
+
+
+def report_query(sql, seconds, error=None):
+    """Pass one timed statement to the listeners (also used by the async driver)."""
+    for listener in _query_listeners:
+        try:
+            listener(sql, seconds, error)
+        except Exception:
+            logger.exception("Query listener failed")
+
+
+class InstrumentedConnection(pymysql.connections.Connection):
+    """pymysql connection that reports each statement's wall time to listeners.
+
+    Every cursor type (including callproc) funnels through ``query()``, so
+    this is the single place statements are timed.
+    """
+
+    def query(self, sql, unbuffered=False):
+        if not _query_listeners:
+            return super().query(sql, unbuffered)
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().query(sql, unbuffered)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            report_query(sql, time.perf_counter() - started, error)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pymysql connections.
+
+    Up to ``max_size`` connections may be open at once. Idle connections are
+    kept LIFO so the hottest ones are reused, pinged on borrow only when they
+    have been idle longer than ``ping_interval`` and closed once idle longer
+    than ``idle_timeout`` (never below ``min_size``). Borrowers wait up to
+    ``wait_timeout`` seconds when the pool is exhausted.
+    """
+
+    def __init__(self, db_config, min_size=1, max_size=10, idle_timeout=300,
+                 ping_interval=30, wait_timeout=10):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Invalid pool size: min=%s max=%s' % (min_size, max_size))
+        self.db_config = dict(db_config)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()  # (connection, returned_at)
+        self._size = 0
+        self._borrowed = 0
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'borrows': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'pings': 0,
+        }
+
+    def _connect(self):
+        return InstrumentedConnection(**self.db_config)
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _reap_idle(self, now):
+        """Pop idle connections past ``idle_timeout``; caller holds the lock."""
+        expired = []
+        # Oldest connections sit at the left end of the deque.
+        while self._idle and self._size > self.min_size:
+            connection, returned_at = self._idle[0]
+            if now - returned_at < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._stats['closed'] += 1
+            expired.append(connection)
+        return expired
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool has room."""
+        started = time.monotonic()
+        deadline = started + self.wait_timeout
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    create = False
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, returned_at = None, None
+                    create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        'Timed out after %.1fs waiting for a database connection' % self.wait_timeout
+                    )
+                waited = True
+                self._available.wait(remaining)
+
+            self._borrowed += 1
+            self._stats['borrows'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += time.monotonic() - started
+
+        try:
+            if create:
+                connection = self._connect()
+                with self._lock:
+                    self._stats['created'] += 1
+            elif time.monotonic() - returned_at >= self.ping_interval:
+                connection.ping(reconnect=True)
+                with self._lock:
+                    self._stats['pings'] += 1
+        except Exception:
+            if connection is not None:
+                self._close(connection)
+            with self._lock:
+                self._size -= 1
+                self._borrowed -= 1
+                self._available.notify()
+            raise
+
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a borrowed connection; broken connections are discarded."""
+        if not discard:
+            try:
+                if not connection.open:
+                    discard = True
+                elif connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    # Never hand a half-finished transaction to the next borrower.
+                    connection.rollback()
+            except Exception:
+                discard = True
+
+        with self._lock:
+            self._borrowed -= 1
+            now = time.monotonic()
+            if discard:
+                self._size -= 1
+                self._stats['closed'] += 1
+                expired = []
+            else:
+                self._idle.append((connection, now))
+                expired = self._reap_idle(now)
+            self._available.notify()
+
+        if discard:
+            self._close(connection)
+        for stale in expired:
+            self._close(stale)
+
+    @contextmanager
+    def connection(self):
+        with self.lease(self.acquire()) as connection:
+            yield connection
+
+    @contextmanager
+    def lease(self, connection):
+        """Hold an acquired connection for a ``with`` block, then release it."""
+        discard = False
+        try:
+            yield connection
+        except (pymysql.OperationalError, pymysql.InterfaceError):
+            discard = True
+            raise
+        except BaseException:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def warm(self):
+        """Open connections up front until ``min_size`` are idle."""
+        borrowed = []
+        try:
+            while len(borrowed) < self.min_size and self._size < self.min_size:
+                borrowed.append(self.acquire())
+        finally:
+            for connection in borrowed:
+                self.release(connection)
+
+    def close_all(self):
+        with self._lock:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._stats['closed'] += len(idle)
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'borrowed': self._borrowed,
+                'idle': len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        stats['wait_time'] = round(stats['wait_time'], 4)
+        return stats
+
+
+class ReplicaRouter:
+    """Round-robin over read replicas, skipping ones that recently failed.
+
+    A replica that cannot be reached is marked down for ``retry_after``
+    seconds; after that the next read tries it again and either brings it
+    back or marks it down for another period.
+    """
+
+    def __init__(self, names, retry_after=30):
+        self.names = list(names)
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._down_until = {}
+        self._reads = {name: 0 for name in self.names}
+        self._failures = {name: 0 for name in self.names}
+
+    def candidates(self):
+        """Healthy replicas, starting with the next one in turn."""
+        if not self.names:
+            return []
+        start = next(self._turn) % len(self.names)
+        now = time.monotonic()
+        with self._lock:
+            return [
+                name for name in self.names[start:] + self.names[:start]
+                if self._down_until.get(name, 0) <= now
+            ]
+
+    def mark_up(self, name):
+        with self._lock:
+            self._reads[name] += 1
+            if self._down_until.pop(name, None) is not None:
+                logger.info("Replica %s is reachable again", name)
+
+    def mark_down(self, name, error):
+        with self._lock:
+            self._failures[name] += 1
+            self._down_until[name] = time.monotonic() + self.retry_after
+        logger.warning("Replica %s marked down for %.0fs: %s", name, self.retry_after, error)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    'healthy': self._down_until.get(name, 0) <= now,
+                    'reads': self._reads[name],
+                    'failures': self._failures[name],
+                }
+                for name in self.names
+            }
+
+
+PRIMARY = 'primary'
+
+_pools = {}
+_pool_lock = threading.Lock()
+_router = None
+
+# Set per request by replication.py: read-only borrows go to the primary
+# while this is true (a write request, or a client pinned after a write).
+_reads_from_primary = contextvars.ContextVar('reads_from_primary', default=False)
+
+
+def replica_name(config):
+    return '%s:%s' % (config['host'], config.get('port', 3306))
+
+
+def connection_config(name):
+    if name == PRIMARY:
+        return Config.DB_CONFIG
+    for config in Config.DB_REPLICAS:
+        if replica_name(config) == name:
+            return config
+    raise KeyError(name)
+
+
+def get_pool(name=PRIMARY):
+    """Return the process-wide pool for ``name`` (the primary or a replica), creating it on first use."""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ConnectionPool(
+                    connection_config(name),
+                    min_size=Config.DB_POOL_MIN_SIZE,
+                    max_size=Config.DB_POOL_MAX_SIZE,
+                    idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+                    ping_interval=Config.DB_POOL_PING_INTERVAL,
+                    wait_timeout=Config.DB_POOL_WAIT_TIMEOUT,
+                )
+    return pool
+
+
+def get_router():
+    global _router
+    if _router is None:
+        with _pool_lock:
+            if _router is None:
+                _router = ReplicaRouter(
+                    [replica_name(config) for config in Config.DB_REPLICAS],
+                    retry_after=Config.DB_REPLICA_RETRY_SECONDS,
+                )
+    return _router
+
+
+def read_from_primary(enabled=True):
+    """Route this context's read-only borrows to the primary; returns a token for ``reset_read_routing``."""
+    return _reads_from_primary.set(enabled)
+
+
+def reset_read_routing(token):
+    _reads_from_primary.reset(token)
+
+
+def _acquire_replica():
+    """``(name, pool, connection)`` from the next healthy replica, or None."""
+    router = get_router()
+    for name in router.candidates():
+        pool = get_pool(name)
+        try:
+            connection = pool.acquire()
+        except PoolTimeout:
+            # Busy, not broken: let the next replica (or the primary) take it.
+            continue
+        except (pymysql.OperationalError, pymysql.InterfaceError) as e:
+            router.mark_down(name, e)
+            continue
+        router.mark_up(name)
+        return name, pool, connection
+    return None
+
+
+@contextmanager
+def db_connection(readonly=False):
+    """Borrow a pooled connection for the duration of a ``with`` block.
+
+    ``readonly=True`` marks a handler that only reads: it is served by a
+    replica when any are configured and healthy, unless this request has
+    to read from the primary (see ``read_from_primary``).
+    """
+    if readonly and Config.DB_REPLICAS and not _reads_from_primary.get():
+        replica = _acquire_replica()
+        if replica is not None:
+            name, pool, connection = replica
+            try:
+                with pool.lease(connection) as connection:
+                    yield connection
+            except (pymysql.OperationalError, pymysql.InterfaceError) as e:
+                # SQL errors arrive as OperationalError too; only a lost link means the replica is down.
+                if not connection.open:
+                    get_router().mark_down(name, e)
+                raise
+            return
+
+    with get_pool().connection() as connection:
+        yield connection
+
+
+def warm_pool():
+    get_pool().warm()
+    for config in Config.DB_REPLICAS:
+        try:
+            get_pool(replica_name(config)).warm()
+        except Exception as e:
+            get_router().mark_down(replica_name(config), e)
+
+
+def reset_pool():
+    """Forget the current pools so the next borrow builds fresh ones.
+
+    Used in forked server workers: sockets inherited from the parent are
+    abandoned rather than closed, since closing them would also tear down
+    the parent's sessions.
+    """
+    global _router
+    with _pool_lock:
+        _pools.clear()
+        _router = None
+
+
+def pool_stats():
+    pool = _pools.get(PRIMARY)
+    stats = pool.stats() if pool is not None else {'size': 0, 'borrowed': 0, 'idle': 0}
+    if Config.DB_REPLICAS:
+        health = get_router().stats()
+        stats['replicas'] = {
+            name: dict(health[name], **(_pools[name].stats() if name in _pools else {}))
+            for name in health
+        }
+    return stats
+
+
 def get_db_connection():
+    """Open a standalone connection for scripts; request handlers use db_connection()."""
     try:
         connection = pymysql.connect(**Config.DB_CONFIG)
-        
-        # Test the connection
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-        
         logger.info("Database connection established successfully")
         return connection
-        
+
     except pymysql.Error as e:
         logger.error(f"Database connection failed: {e}")
         return None
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Knockout draw generation from tbl_partners rankings.
+
+    python draws.py generate "Men's Singles" --random-seed 2025
+    python draws.py benchmark --entries 256 --runs 2000
+
+An event's entries (players, or pairs resolved through partner_id for
+doubles) come from one query. Ranked entries are seeded (ranking 1 is
+the top seed) onto the standard seeding positions, seeds 3-4, 5-8, ...
+are drawn by lot within their band, byes go to the top seeds' first-round
+opponents, and unseeded entries fill the remaining slots in a shuffled
+order. Every random choice comes from ``random.Random(random_seed)``, so
+a stored seed reproduces the same draw.
+"""
+import argparse
+import random
+import sys
+import time
+from collections import namedtuple
+
+from db import get_db_connection
+from versions import bump_table_versions
+
+Entry = namedtuple('Entry', ['user_id', 'name', 'partner_id', 'partner_name', 'ranking'])
+Slot = namedtuple('Slot', ['position', 'entry', 'seed'])
+
+MIN_DRAW_SIZE = 2
+MAX_DRAW_SIZE = 512
+
+ENTRIES_QUERY = """
+    SELECT pt.user_id, p.name, pt.partner_id, partner.name, pt.ranking
+    FROM tbl_partners pt
+    JOIN tbl_players p ON p.id = pt.user_id
+    LEFT JOIN tbl_players partner ON partner.id = pt.partner_id
+    WHERE pt.event_name = %s
+    ORDER BY pt.user_id
+"""
+
+
+class DrawError(Exception):
+    """Raised when an event cannot produce a valid draw."""
+
+
+def is_doubles(event_name):
+    return 'doubles' in event_name.lower()
+
+
+def collapse_entries(rows, doubles):
+    """Turn tbl_partners rows into draw entries.
+
+    For doubles each pair is stored twice (A->B and B->A); it becomes one
+    entry ranked by the better of the two rankings. Entries without a
+    partner cannot play doubles and are returned separately, as are
+    entries whose partner does not point back at them (left behind when
+    a partner was re-assigned); those keep their ``partner_id`` so the
+    conflict can be reported.
+    """
+    if not doubles:
+        return [Entry(*row) for row in rows], []
+
+    partner_of = {row[0]: row[2] for row in rows}
+    pairs = {}
+    unpaired = []
+    for user_id, name, partner_id, partner_name, ranking in rows:
+        if partner_id is None or partner_of.get(partner_id) != user_id:
+            unpaired.append(Entry(user_id, name, partner_id, partner_name, ranking))
+            continue
+        key = (min(user_id, partner_id), max(user_id, partner_id))
+        existing = pairs.get(key)
+        if existing is None:
+            pairs[key] = Entry(user_id, name, partner_id, partner_name or 'Unknown', ranking)
+        elif ranking is not None and (existing.ranking is None or ranking < existing.ranking):
+            pairs[key] = existing._replace(ranking=ranking)
+    return sorted(pairs.values(), key=lambda entry: entry.user_id), unpaired
+
+
+def draw_size_for(count):
+    size = MIN_DRAW_SIZE
+    while size < count:
+        size *= 2
+    return size
+
+
+def seeding_order(size):
+    """Seed number for each slot, e.g. 8 -> [1, 8, 4, 5, 2, 7, 3, 6].
+
+    Numbers above the seed count double as bye priorities: slot of
+    ``size + 1 - k`` is seed k's first-round opponent.
+    """
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [value for seed in order for value in (seed, total - seed)]
+    return order
+
+
+def default_seed_count(size, ranked):
+    """A quarter of the draw (at least two for a draw of four or more), capped by ranked entries."""
+    return min(ranked, size // 4 if size >= 8 else (2 if size >= 4 else 1))
+
+
+def generate_draw(entries, seeds=None, random_seed=None, draw_size=None, shuffle_bands=True):
+    """Place ``entries`` into a draw; returns ``(slots, random_seed)``.
+
+    ``slots`` has one Slot per position; byes are slots whose entry is None.
+    """
+    count = len(entries)
+    if count < 2:
+        raise DrawError('A draw needs at least two entries')
+    if seeds is not None and seeds < 0:
+        raise DrawError('seeds must not be negative')
+    size = draw_size_for(count)
+    if size > MAX_DRAW_SIZE:
+        raise DrawError(f'A draw holds at most {MAX_DRAW_SIZE} entries')
+    # The only power of two in [count, 2 * count): any larger draw would
+    # have first-round matches of bye against bye.
+    if draw_size is not None and draw_size != size:
+        raise DrawError(f'{count} entries need a draw size of {size}')
+    if random_seed is None:
+        random_seed = random.SystemRandom().randrange(2 ** 31)
+    rng = random.Random(random_seed)
+
+    ranked = sorted((entry for entry in entries if entry.ranking is not None),
+                    key=lambda entry: (entry.ranking, entry.user_id))
+    seed_count = default_seed_count(size, len(ranked)) if seeds is None else min(seeds, len(ranked), size)
+    seeded = ranked[:seed_count]
+    seeded_ids = {entry.user_id for entry in seeded}
+    unseeded = [entry for entry in entries if entry.user_id not in seeded_ids]
+    rng.shuffle(unseeded)
+
+    order = seeding_order(size)
+    slot_of = [0] * (size + 1)
+    for position, number in enumerate(order):
+        slot_of[number] = position
+
+    # Seed bands (1, 2, 3-4, 5-8, ...) share positions drawn by lot.
+    seed_positions = [slot_of[number] for number in range(1, seed_count + 1)]
+    if shuffle_bands:
+        band_start = 2
+        while band_start < seed_count:
+            band_end = min(band_start * 2, seed_count)
+            band = seed_positions[band_start:band_end]
+            rng.shuffle(band)
+            seed_positions[band_start:band_end] = band
+            band_start *= 2
+
+    placed = [None] * size
+    seed_numbers = [None] * size
+    for number, (entry, position) in enumerate(zip(seeded, seed_positions), start=1):
+        placed[position] = entry
+        seed_numbers[position] = number
+
+    # Byes go to the top seeds' opponents first (wherever the lot put
+    # them), then to the opponents of the next nominal seed positions.
+    byes = size - count
+    bye_positions = {
+        seed_positions[k - 1] ^ 1 if k <= seed_count else slot_of[size + 1 - k]
+        for k in range(1, byes + 1)
+    }
+
+    remaining = iter(unseeded)
+    for position in range(size):
+        if placed[position] is None and position not in bye_positions:
+            placed[position] = next(remaining)
+
+    slots = [Slot(position, placed[position], seed_numbers[position]) for position in range(size)]
+    return slots, random_seed
+
+
+def load_entries(cursor, event_name):
+    cursor.execute(ENTRIES_QUERY, (event_name,))
+    return collapse_entries(cursor.fetchall(), is_doubles(event_name))
+
+
+def save_draw(cursor, event_name, slots, seeds, random_seed, created_by=None):
+    """Replace the event's stored draw (and its now stale schedule); the caller commits."""
+    cursor.execute("DELETE FROM tbl_schedule WHERE event_name = %s", (event_name,))
+    cursor.execute("DELETE FROM tbl_draws WHERE event_name = %s", (event_name,))
+    cursor.execute(
+        "INSERT INTO tbl_draws (event_name, draw_size, seeds, random_seed, entries, created_by) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        (event_name, len(slots), seeds, random_seed,
+         sum(1 for slot in slots if slot.entry is not None), created_by),
+    )
+    draw_id = cursor.lastrowid
+    cursor.executemany(
+        "INSERT INTO tbl_draw_slots (draw_id, position, user_id, partner_id, seed) VALUES (%s, %s, %s, %s, %s)",
+        [
+            (draw_id, slot.position,
+             slot.entry.user_id if slot.entry else None,
+             slot.entry.partner_id if slot.entry else None,
+             slot.seed)
+            for slot in slots
+        ],
+    )
+    return draw_id
+
+
+def slot_to_dict(slot):
+    entry = slot.entry
+    return {
+        'position': slot.position + 1,
+        'seed': slot.seed,
+        'bye': entry is None,
+        'user_id': entry.user_id if entry else None,
+        'name': entry.name if entry else None,
+        'partner_id': entry.partner_id if entry else None,
+        'partner_name': entry.partner_name if entry else None,
+        'ranking': entry.ranking if entry else None,
+    }
+
+
+def _synthetic_entries(count, rng):
+    return [
+        Entry(index, f'Player {index}', None, None, rng.randint(1, count * 2) if rng.random() < 0.5 else None)
+        for index in range(1, count + 1)
+    ]
+
+
+def benchmark(count, runs):
+    """Time ``generate_draw`` on synthetic entries; returns per-run ms statistics."""
+    entries = _synthetic_entries(count, random.Random(1))
+    timings = []
+    for run in range(runs):
+        started = time.perf_counter()
+        generate_draw(entries, random_seed=run)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'entries': count,
+        'runs': runs,
+        'mean_ms': sum(timings) / runs,
+        'p50_ms': timings[runs // 2],
+        'p99_ms': timings[min(runs - 1, int(runs * 0.99))],
+        'max_ms': timings[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate knockout draws')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help='generate and store the draw for an event')
+    generate.add_argument('event_name')
+    generate.add_argument('--seeds', type=int)
+    generate.add_argument('--random-seed', type=int)
+    generate.add_argument('--draw-size', type=int)
+    generate.add_argument('--dry-run', action='store_true', help='print the draw without storing it')
+    bench = commands.add_parser('benchmark', help='time draw generation on synthetic entries')
+    bench.add_argument('--entries', type=int, default=256)
+    bench.add_argument('--runs', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        for count in sorted({16, 64, args.entries}):
+            result = benchmark(count, args.runs)
+            print(f"{count:>5} entries: mean {result['mean_ms']:.3f} ms, p50 {result['p50_ms']:.3f} ms, "
+                  f"p99 {result['p99_ms']:.3f} ms, max {result['max_ms']:.3f} ms")
+        return
+
+    connection = get_db_connection()
+    if not connection:
+        print("Database connection failed")
+        sys.exit(1)
+    try:
+        with connection.cursor() as cursor:
+            entries, unpaired = load_entries(cursor, args.event_name)
+            try:
+                slots, random_seed = generate_draw(entries, args.seeds, args.random_seed, args.draw_size)
+            except DrawError as e:
+                print(f"Cannot generate draw: {e}")
+                sys.exit(1)
+            seeds = sum(1 for slot in slots if slot.seed)
+            if not args.dry_run:
+                connection.begin()
+                save_draw(cursor, args.event_name, slots, seeds, random_seed, created_by='cli')
+                bump_table_versions(cursor, 'tbl_draws', 'tbl_schedule')
+                connection.commit()
+    finally:
+        connection.close()
+
+    print(f"{args.event_name}: {len(entries)} entries, draw of {len(slots)}, {seeds} seeds, random seed {random_seed}")
+    for entry in unpaired:
+        if entry.partner_id is None:
+            print(f"  skipped (no partner): {entry.name}")
+        else:
+            print(f"  skipped (partner {entry.partner_id} is paired with someone else): {entry.name}")
+    for slot in slots:
+        if slot.entry is None:
+            label = 'BYE'
+        else:
+            label = slot.entry.name + (f' / {slot.entry.partner_name}' if slot.entry.partner_id else '')
+        print(f"  {slot.position + 1:>3}{f' [{slot.seed}]' if slot.seed else '':>6} {label}")
+
+
+if __name__ == '__main__':
+    main()
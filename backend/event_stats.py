@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Maintenance for tbl_event_stats, the trigger-maintained per-event counters.
+
+    python event_stats.py verify    # compare counters with tbl_partners
+    python event_stats.py rebuild   # recompute counters from tbl_partners
+"""
+import argparse
+import sys
+
+from db import get_db_connection
+
+STAT_COLUMNS = ('total_players', 'paired_players', 'unpaired_players', 'ranked_players')
+
+# Ground truth, computed the slow way from tbl_partners.
+AGGREGATE_QUERY = """
+    SELECT
+        e.event_name,
+        COUNT(pt.id) AS total_players,
+        COUNT(pt.partner_id) AS paired_players,
+        COUNT(pt.id) - COUNT(pt.partner_id) AS unpaired_players,
+        COUNT(pt.ranking) AS ranked_players
+    FROM tbl_eventname e
+    LEFT JOIN tbl_partners pt ON e.event_name = pt.event_name
+    GROUP BY e.event_name
+"""
+
+SUMMARY_QUERY = """
+    SELECT
+        e.event_name,
+        IFNULL(s.total_players, 0) AS total_players,
+        IFNULL(s.paired_players, 0) AS paired_players,
+        IFNULL(s.unpaired_players, 0) AS unpaired_players,
+        IFNULL(s.ranked_players, 0) AS ranked_players
+    FROM tbl_eventname e
+    LEFT JOIN tbl_event_stats s ON s.event_name = e.event_name
+    ORDER BY e.event_name
+"""
+
+
+def rebuild_event_stats(connection):
+    """Recompute every counter in one transaction; returns the number of events."""
+    with connection.cursor() as cursor:
+        connection.begin()
+        try:
+            cursor.execute("DELETE FROM tbl_event_stats")
+            # INSERT ... SELECT share-locks the partner rows it reads, so
+            # concurrent registrations wait instead of being double counted.
+            cursor.execute(
+                "INSERT INTO tbl_event_stats (event_name, total_players, paired_players, "
+                "unpaired_players, ranked_players) " + AGGREGATE_QUERY
+            )
+            rebuilt = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return rebuilt
+
+
+def verify_event_stats(connection):
+    """Return ``{event_name: {column: (stored, actual)}}`` for every mismatch."""
+    with connection.cursor() as cursor:
+        cursor.execute(AGGREGATE_QUERY)
+        actual = {row[0]: row[1:] for row in cursor.fetchall()}
+        cursor.execute(SUMMARY_QUERY)
+        stored = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    mismatches = {}
+    for event_name, expected in actual.items():
+        current = stored.get(event_name, (0,) * len(STAT_COLUMNS))
+        diff = {
+            column: (int(have), int(want))
+            for column, have, want in zip(STAT_COLUMNS, current, expected)
+            if int(have) != int(want)
+        }
+        if diff:
+            mismatches[event_name] = diff
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    args = parser.parse_args()
+
+    connection = get_db_connection()
+    if not connection:
+        print("Database connection failed")
+        sys.exit(1)
+
+    try:
+        if args.command == 'rebuild':
+            count = rebuild_event_stats(connection)
+            print(f"Rebuilt statistics for {count} events")
+            return
+
+        mismatches = verify_event_stats(connection)
+        if not mismatches:
+            print("Event statistics are consistent")
+            return
+        for event_name, diff in sorted(mismatches.items()):
+            details = ', '.join(f"{column}: stored {have}, actual {want}" for column, (have, want) in diff.items())
+            print(f"{event_name}: {details}")
+        sys.exit(2)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
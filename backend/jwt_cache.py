@@ -0,0 +1,86 @@
+# jwt_cache.py
+"""JWTManager that remembers verified tokens instead of re-verifying each call.
+
+Admin dashboards poll with the same bearer token every few seconds; the
+verified claims are cached under a hash of the token until the token's
+own ``exp``, so a cached token can never outlive its validity.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask_jwt_extended import JWTManager
+
+from config import Config
+
+
+class VerifiedTokenCache:
+    """LRU of ``token hash -> (claims, exp)`` that never returns expired claims."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(encoded_token):
+        return hashlib.blake2b(encoded_token.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def set(self, key, claims):
+        exp = claims.get('exp')
+        if exp is None:
+            # Non-expiring tokens are not cached; revoking them needs a restart otherwise.
+            return
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (claims, exp)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                # Expired tokens go first, then the least recently used.
+                for stale in [k for k, (_, e) in self._entries.items() if e <= now]:
+                    del self._entries[stale]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+
+class CachingJWTManager(JWTManager):
+    def __init__(self, app=None, add_context_processor=False):
+        self.token_cache = VerifiedTokenCache(Config.JWT_CACHE_MAX_ENTRIES)
+        super().__init__(app, add_context_processor)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # CSRF-checked and allow_expired decodes depend on more than the token.
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = self.token_cache.key(encoded_token)
+        claims = self.token_cache.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            self.token_cache.set(key, claims)
+        # Callers may annotate the dict; never hand out the cached one.
+        return dict(claims)
@@ -0,0 +1,137 @@
+# logging_setup.py
+"""Application logging: leveled, JSON-formatted, PII-redacted and non-blocking.
+
+Request threads only enqueue records (QueueHandler); a single listener
+thread formats and writes them, so stdout I/O never sits on the request
+path. Levels come from ``Config.LOG_LEVEL`` plus per-module overrides in
+``Config.LOG_LEVELS`` (e.g. ``"routes.players=DEBUG,db=WARNING"``).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+
+from config import Config
+
+# Player fields that must never reach the logs in clear text.
+REDACTED_FIELDS = frozenset({
+    'whatsapp', 'whatsapp_number', 'date_of_birth', 'medical_conditions',
+    'emergency_contact', 'address', 'password',
+})
+REDACTED = '[REDACTED]'
+
+_phone_pattern = re.compile(r'(?<!\d)(?:\+?91[\s-]?)?[6-9]\d{4}[\s-]?\d{5}(?!\d)')
+
+# Attributes every LogRecord has; anything else came in through ``extra``.
+_RESERVED = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime'}
+
+_listener = None
+_queue = None
+
+
+def redact(value):
+    """Return a copy of ``value`` with PII fields and phone numbers masked."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in REDACTED_FIELDS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    if isinstance(value, str):
+        return _phone_pattern.sub(REDACTED, value)
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    def filter(self, record):
+        if isinstance(record.msg, str):
+            record.msg = _phone_pattern.sub(REDACTED, record.msg)
+        if record.args:
+            if isinstance(record.args, dict):
+                record.args = redact(record.args)
+            else:
+                record.args = tuple(redact(arg) for arg in record.args)
+        for key in record.__dict__.keys() - _RESERVED:
+            if key.lower() in REDACTED_FIELDS:
+                record.__dict__[key] = REDACTED
+            else:
+                record.__dict__[key] = redact(record.__dict__[key])
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key in record.__dict__.keys() - _RESERVED:
+            payload[key] = record.__dict__[key]
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _output_handler():
+    handler = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    return handler
+
+
+def start_listener():
+    """(Re)start the writer thread, e.g. in a freshly forked worker."""
+    global _listener
+    if _queue is None:
+        return
+    if _listener is not None and _listener._thread is not None and _listener._thread.is_alive():
+        return
+    _listener = logging.handlers.QueueListener(_queue, _output_handler(), respect_handler_level=False)
+    _listener.start()
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging():
+    """Route all logging through the redacting, queue-backed handler. Idempotent."""
+    global _queue
+    if _queue is not None:
+        return
+
+    _queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(_queue)
+    queue_handler.addFilter(RedactingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
+    for name, level in _parse_levels(Config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    start_listener()
+    atexit.register(stop_listener)
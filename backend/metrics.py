@@ -0,0 +1,174 @@
+# metrics.py
+"""Per-endpoint request and database instrumentation in Prometheus text format.
+
+``init_app`` installs before/after-request hooks that time every request
+and count the statements it ran (via db.add_query_listener), and serves
+the collected series at ``/api/metrics``. Metrics are per process; scrape
+each worker, or aggregate them, when running several.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_request_context, request
+
+from db import add_query_listener
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_seconds = {}
+        self.request_db_seconds = {}
+        self.request_db_queries = {}
+        self.responses = {}
+        self.errors = {}
+        self.db_queries = 0
+        self.db_errors = 0
+        self.db_seconds = 0.0
+
+    def _histogram(self, series, labels, buckets):
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(buckets)
+        return histogram
+
+    def observe_request(self, endpoint, method, status, seconds, db_queries, db_seconds):
+        labels = (endpoint, method)
+        with self._lock:
+            self._histogram(self.request_seconds, labels, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.request_db_seconds, labels, LATENCY_BUCKETS).observe(db_seconds)
+            self._histogram(self.request_db_queries, labels, QUERY_COUNT_BUCKETS).observe(db_queries)
+            key = labels + (str(status),)
+            self.responses[key] = self.responses.get(key, 0) + 1
+            if status >= 500:
+                self.errors[labels] = self.errors.get(labels, 0) + 1
+
+    def observe_query(self, seconds, failed):
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+            if failed:
+                self.db_errors += 1
+
+    def render(self):
+        """Render every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            _render_histograms(lines, 'uta_http_request_duration_seconds',
+                               'Request latency by endpoint.', self.request_seconds)
+            _render_histograms(lines, 'uta_http_request_db_seconds',
+                               'Database time spent per request.', self.request_db_seconds)
+            _render_histograms(lines, 'uta_http_request_db_queries',
+                               'Database statements executed per request.', self.request_db_queries)
+            _render_counter(lines, 'uta_http_responses_total', 'Responses by status.',
+                            ('endpoint', 'method', 'status'), self.responses)
+            _render_counter(lines, 'uta_http_errors_total', 'Responses with a 5xx status.',
+                            ('endpoint', 'method'), self.errors)
+            _render_counter(lines, 'uta_db_queries_total', 'Database statements executed.',
+                            (), {(): self.db_queries})
+            _render_counter(lines, 'uta_db_query_errors_total', 'Database statements that failed.',
+                            (), {(): self.db_errors})
+            _render_counter(lines, 'uta_db_query_seconds_total', 'Total database statement time.',
+                            (), {(): self.db_seconds})
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _render_histograms(lines, name, help_text, series):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    names = ('endpoint', 'method')
+    for labels, histogram in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f'{name}_bucket{_labels(names, labels, le)} {cumulative}')
+        le = 'le="+Inf"'
+        lines.append(f'{name}_bucket{_labels(names, labels, le)} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(names, labels)} {_format_number(histogram.sum)}')
+        lines.append(f'{name}_count{_labels(names, labels)} {histogram.count}')
+
+
+def _render_counter(lines, name, help_text, names, series):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for labels, value in sorted(series.items()):
+        lines.append(f'{name}{_labels(names, labels)} {_format_number(value)}')
+
+
+registry = MetricsRegistry()
+
+
+def _on_query(sql, seconds, error):
+    registry.observe_query(seconds, error is not None)
+    if has_request_context() and 'metrics_started' in g:
+        g.metrics_db_queries += 1
+        g.metrics_db_seconds += seconds
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+    g.metrics_db_queries = 0
+    g.metrics_db_seconds = 0.0
+
+
+def _record(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        # Unmatched URLs share one label so 404 scans cannot blow up cardinality.
+        registry.observe_request(
+            request.endpoint or 'unmatched',
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            g.metrics_db_queries,
+            g.metrics_db_seconds,
+        )
+    return response
+
+
+def metrics_view():
+    return current_app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    # Registered ahead of the app's own before_request hooks, so even
+    # short-circuited requests (e.g. CORS preflights) are timed.
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_timer)
+    app.after_request(_record)
+    app.add_url_rule('/api/metrics', 'metrics', metrics_view, methods=['GET'])
+    add_query_listener(_on_query)
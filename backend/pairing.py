@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Automatic partners for unpaired doubles entrants.
+
+    python pairing.py "Mixed Doubles"            # preview
+    python pairing.py "Mixed Doubles" --apply
+
+All unpaired entrants of an event are loaded with one query. Candidate
+pairs must satisfy the event's gender rule (one man and one woman for
+Mixed Doubles, the same gender otherwise). Each candidate pair gets a
+cost: a penalty when the two players are from different cities, plus how
+far the pair's combined ranking is from an average team, so strong
+players are paired with weaker ones. Pairs are picked greedily by
+cost and then improved with 2-opt partner swaps. The result is
+written with a single UPDATE in one transaction.
+"""
+import argparse
+import sys
+from itertools import combinations
+
+from db import get_db_connection
+from draws import is_doubles
+from versions import bump_table_versions
+
+DEFAULT_CITY_WEIGHT = 10.0
+DEFAULT_RANKING_WEIGHT = 1.0
+MAX_SWAP_PASSES = 5
+
+UNPAIRED_QUERY = """
+    SELECT pt.user_id, p.name, p.gender, p.city, pt.ranking
+    FROM tbl_partners pt
+    JOIN tbl_players p ON p.id = pt.user_id
+    WHERE pt.event_name = %s AND pt.partner_id IS NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM tbl_partners other
+          WHERE other.event_name = pt.event_name AND other.partner_id = pt.user_id
+      )
+    ORDER BY pt.user_id
+"""
+
+
+class PairingError(Exception):
+    """Raised when an event cannot be auto-paired."""
+
+
+def is_mixed(event_name):
+    return 'mixed' in event_name.lower()
+
+
+class Pairer:
+    """Computes a low-cost pairing of ``players`` (``(user_id, name, gender, city, ranking)`` rows)."""
+
+    def __init__(self, players, mixed, city_weight=DEFAULT_CITY_WEIGHT, ranking_weight=DEFAULT_RANKING_WEIGHT):
+        self.players = {row[0]: row for row in players}
+        self.mixed = mixed
+        self.city_weight = city_weight
+        self.ranking_weight = ranking_weight
+        rankings = [row[4] for row in players if row[4] is not None]
+        # Unranked players count as average, and an average team has twice that.
+        self.neutral_ranking = sum(rankings) / len(rankings) if rankings else 0
+        self.target = 2 * self.neutral_ranking
+
+    def allowed(self, a, b):
+        gender_a = (self.players[a][2] or '').lower()
+        gender_b = (self.players[b][2] or '').lower()
+        if self.mixed:
+            return bool(gender_a and gender_b) and gender_a != gender_b
+        return gender_a == gender_b
+
+    def cost(self, a, b):
+        _, _, _, city_a, ranking_a = self.players[a]
+        _, _, _, city_b, ranking_b = self.players[b]
+        cost = 0.0
+        if (city_a or '').strip().lower() != (city_b or '').strip().lower():
+            cost += self.city_weight
+        ranking_a = self.neutral_ranking if ranking_a is None else ranking_a
+        ranking_b = self.neutral_ranking if ranking_b is None else ranking_b
+        return cost + self.ranking_weight * abs(ranking_a + ranking_b - self.target)
+
+    def _candidates(self):
+        if self.mixed:
+            groups = {}
+            for user_id, _, gender, _, _ in self.players.values():
+                groups.setdefault((gender or '').lower(), []).append(user_id)
+            women = groups.pop('female', [])
+            men = groups.pop('male', [])
+            return [(a, b) for a in men for b in women]
+        return [(a, b) for a, b in combinations(sorted(self.players), 2) if self.allowed(a, b)]
+
+    def pair(self):
+        """Returns ``(pairs, unmatched_ids)``; each pair is ``(user_id, partner_id)``."""
+        edges = sorted(self._candidates(), key=lambda edge: (self.cost(*edge), edge))
+        partner = {}
+        pairs = []
+        for a, b in edges:
+            if a not in partner and b not in partner:
+                partner[a] = b
+                partner[b] = a
+                pairs.append((a, b))
+        pairs = self._improve(pairs)
+        matched = {player for pair in pairs for player in pair}
+        return pairs, [user_id for user_id in sorted(self.players) if user_id not in matched]
+
+    def _improve(self, pairs):
+        # 2-opt: for two pairs (a, b) and (c, d) try (a, d) + (c, b) and (a, c) + (b, d).
+        for _ in range(MAX_SWAP_PASSES):
+            improved = False
+            for i in range(len(pairs)):
+                for j in range(i + 1, len(pairs)):
+                    a, b = pairs[i]
+                    c, d = pairs[j]
+                    current = self.cost(a, b) + self.cost(c, d)
+                    for first, second in (((a, d), (c, b)), ((a, c), (b, d))):
+                        if not (self.allowed(*first) and self.allowed(*second)):
+                            continue
+                        if self.cost(*first) + self.cost(*second) < current - 1e-9:
+                            pairs[i], pairs[j] = first, second
+                            improved = True
+                            break
+            if not improved:
+                break
+        return pairs
+
+    def describe(self, pairs, unmatched):
+        def player(user_id):
+            user_id, name, gender, city, ranking = self.players[user_id]
+            return {'user_id': user_id, 'name': name, 'gender': gender, 'city': city, 'ranking': ranking}
+
+        return {
+            'pairs': [
+                {'players': [player(a), player(b)], 'cost': round(self.cost(a, b), 2)}
+                for a, b in pairs
+            ],
+            'unmatched': [player(user_id) for user_id in unmatched],
+            'total_cost': round(sum(self.cost(a, b) for a, b in pairs), 2),
+        }
+
+
+def load_unpaired(cursor, event_name, for_update=False):
+    cursor.execute(UNPAIRED_QUERY + (" FOR UPDATE" if for_update else ""), (event_name,))
+    return cursor.fetchall()
+
+
+def plan_pairs(cursor, event_name, city_weight=None, ranking_weight=None, for_update=False):
+    if not is_doubles(event_name):
+        raise PairingError(f'{event_name} is not a doubles event')
+    players = load_unpaired(cursor, event_name, for_update)
+    pairer = Pairer(
+        players,
+        is_mixed(event_name),
+        DEFAULT_CITY_WEIGHT if city_weight is None else city_weight,
+        DEFAULT_RANKING_WEIGHT if ranking_weight is None else ranking_weight,
+    )
+    return pairer, *pairer.pair()
+
+
+def apply_pairs(cursor, event_name, pairs):
+    """Point both players of every pair at each other with one UPDATE; the caller commits.
+
+    Returns False if some entry was paired meanwhile, so nothing should be committed.
+    """
+    if not pairs:
+        return True
+    cases = []
+    params = []
+    for a, b in pairs:
+        cases.append('WHEN %s THEN %s WHEN %s THEN %s')
+        params.extend([a, b, b, a])
+    user_ids = [user_id for pair in pairs for user_id in pair]
+    cursor.execute(
+        f"UPDATE tbl_partners SET partner_id = CASE user_id {' '.join(cases)} END "
+        f"WHERE event_name = %s AND partner_id IS NULL AND user_id IN ({', '.join(['%s'] * len(user_ids))})",
+        params + [event_name] + user_ids,
+    )
+    return cursor.rowcount == len(user_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pair unpaired doubles entrants')
+    parser.add_argument('event_name')
+    parser.add_argument('--apply', action='store_true', help='store the pairs (default is a preview)')
+    parser.add_argument('--city-weight', type=float)
+    parser.add_argument('--ranking-weight', type=float)
+    args = parser.parse_args()
+
+    connection = get_db_connection()
+    if not connection:
+        print("Database connection failed")
+        sys.exit(1)
+    try:
+        with connection.cursor() as cursor:
+            if args.apply:
+                connection.begin()
+            pairer, pairs, unmatched = plan_pairs(
+                cursor, args.event_name, args.city_weight, args.ranking_weight, for_update=args.apply,
+            )
+            if args.apply:
+                if not apply_pairs(cursor, args.event_name, pairs):
+                    connection.rollback()
+                    print("Entries changed while pairing; nothing was stored")
+                    sys.exit(1)
+                bump_table_versions(cursor, 'tbl_partners')
+                connection.commit()
+    except PairingError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    summary = pairer.describe(pairs, unmatched)
+    for pair in summary['pairs']:
+        first, second = pair['players']
+        print(f"  {first['name']} ({first['city']}) + {second['name']} ({second['city']})  cost {pair['cost']}")
+    for player in summary['unmatched']:
+        print(f"  unmatched: {player['name']} ({player['gender']})")
+    print(f"{len(pairs)} pairs, {len(unmatched)} unmatched, total cost {summary['total_cost']}"
+          + ("" if args.apply else " (preview, use --apply to store)"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Bulk import of offline player registrations from CSV (or XLSX) files.
+
+    python player_import.py players.csv --dry-run
+    python player_import.py players.xlsx
+
+Rows are streamed, WhatsApp numbers normalised, duplicates detected
+against a set of existing numbers loaded in one query, and new players
+inserted with chunked multi-row INSERTs in a single transaction.
+"""
+import argparse
+import codecs
+import csv
+import re
+import sys
+from datetime import date, datetime
+
+from db import get_db_connection
+from versions import bump_table_versions
+
+try:
+    import openpyxl
+except ImportError:  # XLSX support is optional
+    openpyxl = None
+
+INSERT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+PLAYER_COLUMNS = (
+    'name', 'whatsapp_number', 'date_of_birth', 'email', 'city',
+    'shirt_size', 'short_size', 'food_pref', 'stay_y_or_n', 'fee_paid',
+    'address', 'emergency_contact', 'playing_experience', 'medical_conditions', 'gender',
+)
+REQUIRED_COLUMNS = ('name', 'whatsapp_number', 'date_of_birth', 'city', 'gender')
+BOOLEAN_COLUMNS = ('stay_y_or_n', 'fee_paid')
+
+HEADER_ALIASES = {
+    'whatsapp': 'whatsapp_number',
+    'phone': 'whatsapp_number',
+    'dob': 'date_of_birth',
+    'stay': 'stay_y_or_n',
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+
+INSERT_QUERY = (
+    "INSERT INTO tbl_players (" + ', '.join(PLAYER_COLUMNS) + ") "
+    "VALUES (" + ', '.join(['%s'] * len(PLAYER_COLUMNS)) + ")"
+)
+
+_non_digits = re.compile(r'\D')
+_indian_mobile = re.compile(r'^[6-9]\d{9}$')
+
+
+class PlayerImportError(Exception):
+    """Raised for problems with the file as a whole (not a single row)."""
+
+
+def normalize_whatsapp(value):
+    """Reduce a number to its 10-digit Indian mobile form, or None if invalid."""
+    digits = _non_digits.sub('', str(value or ''))
+    if len(digits) == 12 and digits.startswith('91'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    return digits if _indian_mobile.match(digits) else None
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'y', 'yes', 'true')
+
+
+def _canonical_header(header):
+    key = str(header or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def iter_csv_rows(stream):
+    """Yield ``(line, row)`` pairs from a binary CSV stream without reading it all."""
+    reader = csv.reader(codecs.iterdecode(stream, 'utf-8-sig'))
+    headers = next(reader, None)
+    if not headers:
+        raise PlayerImportError('File is empty')
+    headers = [_canonical_header(header) for header in headers]
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield reader.line_num, dict(zip(headers, row))
+
+
+def iter_xlsx_rows(stream):
+    if openpyxl is None:
+        raise PlayerImportError('XLSX import requires openpyxl; upload a CSV file instead')
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if not headers:
+            raise PlayerImportError('File is empty')
+        headers = [_canonical_header(header) for header in headers]
+        for line, row in enumerate(rows, start=2):
+            if any(cell not in (None, '') for cell in row):
+                yield line, dict(zip(headers, row))
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename):
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(stream)
+    return iter_csv_rows(stream)
+
+
+def _prepare(raw):
+    """Turn one raw row into INSERT values, or return an error message."""
+    row = {column: raw.get(column) for column in PLAYER_COLUMNS}
+    for column, value in row.items():
+        if isinstance(value, str):
+            row[column] = value.strip() or None
+
+    missing = [column for column in REQUIRED_COLUMNS if not row[column]]
+    if missing:
+        return None, 'Missing ' + ', '.join(missing)
+
+    whatsapp = normalize_whatsapp(row['whatsapp_number'])
+    if not whatsapp:
+        return None, f"Invalid WhatsApp number: {row['whatsapp_number']}"
+    row['whatsapp_number'] = whatsapp
+
+    date_of_birth = _parse_date(row['date_of_birth'])
+    if not date_of_birth:
+        return None, f"Invalid date of birth: {row['date_of_birth']}"
+    row['date_of_birth'] = date_of_birth
+
+    for column in BOOLEAN_COLUMNS:
+        row[column] = _parse_bool(row[column])
+    row['gender'] = str(row['gender']).lower()
+
+    return tuple(row[column] for column in PLAYER_COLUMNS), None
+
+
+def load_existing_whatsapp(cursor):
+    """All registered numbers, normalised, from a single query."""
+    cursor.execute("SELECT whatsapp_number FROM tbl_players")
+    existing = set()
+    for (number,) in cursor.fetchall():
+        existing.add(normalize_whatsapp(number) or number)
+    return existing
+
+
+def import_players(connection, rows, dry_run=False):
+    """Validate and insert ``(line, row)`` pairs; returns a report dict."""
+    report = {
+        'dry_run': dry_run,
+        'rows': 0,
+        'valid': 0,
+        'inserted': 0,
+        'duplicates': 0,
+        'invalid': 0,
+        'errors': [],
+    }
+
+    def reject(line, message):
+        report['invalid'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': line, 'error': message})
+
+    with connection.cursor() as cursor:
+        seen = load_existing_whatsapp(cursor)
+        chunk = []
+        if not dry_run:
+            connection.begin()
+        try:
+            for line, raw in rows:
+                report['rows'] += 1
+                values, error = _prepare(raw)
+                if error:
+                    reject(line, error)
+                    continue
+                if values[1] in seen:
+                    report['duplicates'] += 1
+                    if len(report['errors']) < MAX_REPORTED_ERRORS:
+                        report['errors'].append({'row': line, 'error': f'Duplicate WhatsApp number: {values[1]}'})
+                    continue
+                seen.add(values[1])
+                report['valid'] += 1
+                if dry_run:
+                    continue
+                chunk.append(values)
+                if len(chunk) >= INSERT_CHUNK_SIZE:
+                    # pymysql folds executemany INSERT ... VALUES into multi-row statements.
+                    cursor.executemany(INSERT_QUERY, chunk)
+                    report['inserted'] += len(chunk)
+                    chunk = []
+            if chunk:
+                cursor.executemany(INSERT_QUERY, chunk)
+                report['inserted'] += len(chunk)
+            if report['inserted']:
+                bump_table_versions(cursor, 'tbl_players')
+            if not dry_run:
+                connection.commit()
+        except Exception:
+            if not dry_run:
+                connection.rollback()
+            raise
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import players from a CSV or XLSX file')
+    parser.add_argument('path')
+    parser.add_argument('--dry-run', action='store_true', help='validate only, insert nothing')
+    args = parser.parse_args()
+
+    connection = get_db_connection()
+    if not connection:
+        print("Database connection failed")
+        sys.exit(1)
+
+    try:
+        with open(args.path, 'rb') as stream:
+            report = import_players(connection, iter_rows(stream, args.path), dry_run=args.dry_run)
+    except PlayerImportError as e:
+        print(f"Import failed: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+
+    print(f"Rows: {report['rows']}, valid: {report['valid']}, inserted: {report['inserted']}, "
+          f"duplicates: {report['duplicates']}, invalid: {report['invalid']}")
+    for error in report['errors']:
+        print(f"  row {error['row']}: {error['error']}")
+
+
+if __name__ == '__main__':
+    main()
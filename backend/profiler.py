@@ -0,0 +1,200 @@
+# profiler.py
+"""Opt-in statement profiler and slow-query log (``DB_PROFILE=1``).
+
+Every statement the app runs is reduced to a fingerprint (literals
+replaced with ``?``, IN lists and multi-row VALUES collapsed) and
+aggregated per fingerprint. Statements slower than ``DB_SLOW_QUERY_MS``
+are logged by fingerprint, so parameters never reach the log, and slow
+SELECTs get an ``EXPLAIN`` captured once on a separate pooled connection
+by a background thread. ``report()`` backs ``GET /api/admin/query-profile``.
+"""
+import logging
+import queue
+import re
+import threading
+
+from flask import has_request_context, request
+
+from config import Config
+from db import add_query_listener, db_connection
+
+logger = logging.getLogger(__name__)
+
+MAX_FINGERPRINTS = 2000
+MAX_ENDPOINTS_PER_STATEMENT = 10
+EXPLAIN_QUEUE_SIZE = 100
+
+_string_literal = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_number_literal = re.compile(r'(?<![\w@$.])-?(?:0x[0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\b')
+_in_list = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_values_rows = re.compile(r'\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+', re.IGNORECASE)
+_whitespace = re.compile(r'\s+')
+_explainable = re.compile(r'^\s*(?:\(\s*)?(?:SELECT|WITH)\b', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """Normalise ``sql`` so statements differing only in literals compare equal."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _string_literal.sub('?', sql)
+    sql = _number_literal.sub('?', sql)
+    sql = _in_list.sub('IN (?+)', sql)
+    sql = _values_rows.sub(r'VALUES \1, ...', sql)
+    return _whitespace.sub(' ', sql).strip()
+
+
+class StatementStats:
+    __slots__ = ('count', 'errors', 'total', 'max', 'slow', 'endpoints', 'explain')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.endpoints = {}
+        self.explain = None
+
+    def as_dict(self, statement):
+        return {
+            'statement': statement,
+            'count': self.count,
+            'errors': self.errors,
+            'slow': self.slow,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'endpoints': dict(sorted(self.endpoints.items(), key=lambda item: -item[1])),
+            'explain': self.explain,
+        }
+
+
+class QueryProfiler:
+    def __init__(self, slow_threshold_ms, explain_slow=True):
+        self.slow_threshold = slow_threshold_ms / 1000.0
+        self.explain_slow = explain_slow
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._dropped = 0
+        self._explain_queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._explain_pending = set()
+        self._worker = None
+
+    def start(self):
+        # Also called in forked workers, where the parent's thread no longer runs.
+        if self.explain_slow and (self._worker is None or not self._worker.is_alive()):
+            self._worker = threading.Thread(target=self._explain_loop, name='query-explain', daemon=True)
+            self._worker.start()
+
+    def on_query(self, sql, seconds, error):
+        # EXPLAINs issued by our own worker are not application statements.
+        if threading.current_thread() is self._worker:
+            return
+        statement = fingerprint(sql)
+        endpoint = (request.endpoint or 'unmatched') if has_request_context() else None
+        slow = seconds >= self.slow_threshold
+        explain = False
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                if len(self._statements) >= MAX_FINGERPRINTS:
+                    self._dropped += 1
+                    stats = None
+                else:
+                    stats = self._statements[statement] = StatementStats()
+            if stats is not None:
+                stats.count += 1
+                stats.total += seconds
+                if seconds > stats.max:
+                    stats.max = seconds
+                if error is not None:
+                    stats.errors += 1
+                if slow:
+                    stats.slow += 1
+                if endpoint and (endpoint in stats.endpoints or len(stats.endpoints) < MAX_ENDPOINTS_PER_STATEMENT):
+                    stats.endpoints[endpoint] = stats.endpoints.get(endpoint, 0) + 1
+                explain = (
+                    slow and error is None and self.explain_slow and stats.explain is None
+                    and statement not in self._explain_pending and _explainable.match(statement) is not None
+                )
+                if explain:
+                    self._explain_pending.add(statement)
+
+        if slow:
+            logger.warning(
+                "Slow query (%.1f ms): %s", seconds * 1000, statement,
+                extra={'duration_ms': round(seconds * 1000, 3), 'endpoint': endpoint},
+            )
+        if explain:
+            try:
+                # The literal statement is needed for a faithful plan; it never leaves this process.
+                self._explain_queue.put_nowait((statement, sql))
+            except queue.Full:
+                with self._lock:
+                    self._explain_pending.discard(statement)
+
+    def _explain_loop(self):
+        while True:
+            statement, sql = self._explain_queue.get()
+            plan = None
+            try:
+                if isinstance(sql, bytes):
+                    sql = sql.decode('utf-8', 'replace')
+                with db_connection() as connection, connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN ' + sql)
+                    columns = [column[0] for column in cursor.description]
+                    plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except Exception as e:
+                logger.warning("EXPLAIN failed for %s: %s", statement, e)
+                plan = {'error': str(e)}
+            with self._lock:
+                self._explain_pending.discard(statement)
+                stats = self._statements.get(statement)
+                if stats is not None:
+                    stats.explain = plan
+
+    def report(self, limit=20, order_by='total'):
+        key = {
+            'total': lambda item: item[1].total,
+            'mean': lambda item: item[1].total / item[1].count if item[1].count else 0.0,
+            'max': lambda item: item[1].max,
+            'count': lambda item: item[1].count,
+            'slow': lambda item: item[1].slow,
+        }[order_by]
+        with self._lock:
+            ranked = sorted(self._statements.items(), key=key, reverse=True)[:limit]
+            statements = [stats.as_dict(statement) for statement, stats in ranked]
+            total = sum(stats.total for stats in self._statements.values())
+            return {
+                'enabled': True,
+                'slow_query_ms': self.slow_threshold * 1000,
+                'fingerprints': len(self._statements),
+                'dropped': self._dropped,
+                'total_ms': round(total * 1000, 3),
+                'statements': statements,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._dropped = 0
+
+
+REPORT_ORDERS = ('total', 'mean', 'max', 'count', 'slow')
+
+_profiler = None
+
+
+def enable():
+    """Start profiling every statement this process runs. Idempotent."""
+    global _profiler
+    if _profiler is None:
+        _profiler = QueryProfiler(Config.DB_SLOW_QUERY_MS, explain_slow=Config.DB_PROFILE_EXPLAIN)
+        _profiler.start()
+        add_query_listener(_profiler.on_query)
+    return _profiler
+
+
+def get_profiler():
+    """The active profiler, or None when profiling is off."""
+    return _profiler
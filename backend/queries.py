@@ -0,0 +1,194 @@
+# queries.py
+"""Shared query helpers and row mapping for the route handlers.
+
+Column plans are built once per SQL statement and reused, so handlers no
+longer rebuild ``cursor.description`` lists and ``dict(zip())`` per call.
+``fetch_json`` writes rows straight to JSON text (same output as
+``jsonify``) without materialising an intermediate dict per row.
+"""
+import threading
+from functools import lru_cache
+from datetime import date, datetime
+from decimal import Decimal
+from json import JSONEncoder
+from json.encoder import encode_basestring_ascii
+from operator import itemgetter
+
+import pymysql.cursors
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+CURSOR_CLASSES = {
+    'tuple': pymysql.cursors.Cursor,
+    'dict': pymysql.cursors.DictCursor,
+    'stream': pymysql.cursors.SSCursor,
+    'stream_dict': pymysql.cursors.SSDictCursor,
+}
+
+# Matches Flask's default provider so direct output is identical to jsonify().
+_fallback_encoder = JSONEncoder(default=DefaultJSONProvider.default, ensure_ascii=True,
+                                separators=(',', ':'), sort_keys=True)
+
+
+@lru_cache(maxsize=4096)
+def _encode_date(value):
+    # http_date() dominates row encoding; birth dates and timestamps repeat a lot.
+    return '"' + http_date(value) + '"'
+
+
+_VALUE_ENCODERS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+    date: _encode_date,
+    datetime: _encode_date,
+    Decimal: lambda value: encode_basestring_ascii(str(value)),
+}
+
+
+def encode_value(value):
+    encoder = _VALUE_ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    return _fallback_encoder.encode(value)
+
+
+class RowPlan:
+    """Column layout of one statement's result set."""
+
+    __slots__ = ('columns', 'keyed', '_values', '_template')
+
+    def __init__(self, columns, keyed=False):
+        self.columns = tuple(columns)
+        self.keyed = keyed
+        # jsonify sorts keys, so the JSON field order is fixed up front.
+        order = sorted(range(len(self.columns)), key=lambda i: self.columns[i])
+        keys = [self.columns[i] if keyed else i for i in order]
+        if len(keys) == 1:
+            only = itemgetter(keys[0])
+            self._values = lambda row: (only(row),)
+        else:
+            self._values = itemgetter(*keys)
+        self._template = '{' + ','.join(
+            encode_basestring_ascii(self.columns[i]).replace('%', '%%') + ':%s' for i in order
+        ) + '}'
+
+    def matches(self, description):
+        return len(description) == len(self.columns) and all(
+            desc[0] == column for desc, column in zip(description, self.columns)
+        )
+
+    def to_dict(self, row):
+        if self.keyed:
+            return row
+        return dict(zip(self.columns, row))
+
+    def to_json(self, row):
+        if not self.columns:
+            return '{}'
+        return self._template % tuple(map(encode_value, self._values(row)))
+
+    def dumps(self, rows):
+        to_json = self.to_json
+        return '[' + ','.join([to_json(row) for row in rows]) + ']'
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def row_plan(cursor, sql):
+    """Return the cached plan for ``sql`` as just executed on ``cursor``."""
+    keyed = isinstance(cursor, pymysql.cursors.DictCursorMixin)
+    key = (sql, keyed)
+    description = cursor.description or ()
+    plan = _plans.get(key)
+    if plan is None or not plan.matches(description):
+        plan = RowPlan([desc[0] for desc in description], keyed=keyed)
+        with _plans_lock:
+            _plans[key] = plan
+    return plan
+
+
+def cursor_for(connection, kind='tuple'):
+    return connection.cursor(CURSOR_CLASSES[kind])
+
+
+def fetch_one(cursor, sql, params=None):
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row_plan(cursor, sql).to_dict(row)
+
+
+def fetch_all(cursor, sql, params=None):
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    plan = row_plan(cursor, sql)
+    if plan.keyed:
+        return list(rows)
+    columns = plan.columns
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def fetch_json(cursor, sql, params=None):
+    """Run ``sql`` and return the result set as a JSON array string."""
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    return row_plan(cursor, sql).dumps(rows)
+
+
+def iter_rows(cursor, sql, params=None, batch_size=500):
+    """Yield ``(plan, row)`` pairs in batches; use a stream cursor for big results."""
+    cursor.execute(sql, params)
+    plan = row_plan(cursor, sql)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield plan, row
+
+
+# compression.py tags encoded bodies "<etag>-gzip" / "<etag>-br"; any of
+# them revalidates the same content.
+ETAG_ENCODING_SUFFIXES = {'gzip': '-gzip', 'br': '-br'}
+
+
+def etag_matches(etag):
+    """True if the request's If-None-Match names ``etag`` in any encoding."""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return if_none_match.contains(etag) or any(
+        if_none_match.contains(etag + suffix) for suffix in ETAG_ENCODING_SUFFIXES.values()
+    )
+
+
+def not_modified(etag):
+    """A 304 for ``etag`` if the client already has it, else None."""
+    if not etag_matches(etag):
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def json_response(body, status=200, etag=None):
+    """Wrap pre-serialised JSON text in a response, like jsonify() would.
+
+    With an ``etag`` the response is revalidatable: a matching
+    ``If-None-Match`` gets an empty 304 instead of the body.
+    """
+    if etag is not None and etag_matches(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body + '\n', status=status, mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
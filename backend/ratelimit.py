@@ -0,0 +1,55 @@
+# ratelimit.py
+"""In-process sliding-window rate limiting for hot unauthenticated endpoints."""
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """Allow at most ``limit`` hits per key in any ``window``-second span.
+
+    Timestamps are kept per key, so the window slides exactly rather than
+    resetting on fixed boundaries. Only the ``max_keys`` most recently
+    seen keys are tracked; the rest are forgotten LRU-first, which bounds
+    memory under a flood of distinct keys.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._hits = OrderedDict()
+        self._rejected = 0
+
+    def hit(self, key):
+        """Record a hit for ``key``; return 0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+                while len(self._hits) > self.max_keys:
+                    self._hits.popitem(last=False)
+            else:
+                self._hits.move_to_end(key)
+            cutoff = now - self.window
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                self._rejected += 1
+                return max(1, math.ceil(hits[0] + self.window - now))
+            hits.append(now)
+            return 0
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._hits.clear()
+            else:
+                self._hits.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._hits), 'rejected': self._rejected}
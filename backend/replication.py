@@ -0,0 +1,65 @@
+# replication.py
+"""Read-your-writes pinning for replica reads.
+
+A request that changes data reads from the primary throughout, and a
+successful one sets a short-lived cookie; while it is valid, that
+client's read-only requests go to the primary too, so nobody sees a
+replica that has not caught up with their own write yet. Everyone else
+reads from the replicas (see ``db.db_connection(readonly=True)``).
+Handlers behind the in-process caches keep loading from the primary: the
+cache is shared by every client, so a lagging replica read would be
+served to the writer too.
+"""
+import math
+import time
+
+from flask import g, request
+
+import db
+from config import Config
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def pinned_until(value):
+    """Expiry timestamp carried by the read-your-writes cookie (0 when absent or invalid)."""
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+
+def _route_reads():
+    primary = (
+        request.method not in SAFE_METHODS
+        or pinned_until(request.cookies.get(Config.READ_YOUR_WRITES_COOKIE)) > time.time()
+    )
+    g.read_routing_token = db.read_from_primary(primary)
+
+
+def _pin_after_write(response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        response.set_cookie(
+            Config.READ_YOUR_WRITES_COOKIE,
+            '%.3f' % (time.time() + Config.READ_YOUR_WRITES_SECONDS),
+            max_age=math.ceil(Config.READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+            secure=request.is_secure,
+            # The frontends are cross-site; browsers only send those cookies with SameSite=None over HTTPS.
+            samesite='None' if request.is_secure else 'Lax',
+        )
+    return response
+
+
+def _reset_routing(exc=None):
+    token = g.pop('read_routing_token', None)
+    if token is not None:
+        db.reset_read_routing(token)
+
+
+def init_app(app):
+    if not Config.DB_REPLICAS:
+        return
+    app.before_request(_route_reads)
+    app.after_request(_pin_after_write)
+    app.teardown_request(_reset_routing)
@@ -1,119 +1,291 @@
-from flask import Blueprint, jsonify
+import base64
+import csv
+import io
+import json
+import logging
+from datetime import date
+
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from db import get_db_connection  # Adjust import if needed
+from db import db_connection
+from event_stats import SUMMARY_QUERY
+from profiler import REPORT_ORDERS, get_profiler
+from queries import cursor_for, encode_value, fetch_json, iter_rows, json_response, not_modified, row_plan
+from versions import versioned_etag
 
 admin_bp = Blueprint('admin', __name__)
+logger = logging.getLogger(__name__)
+
+REGISTRATION_COLUMNS = """
+    p.id as player_id,
+    p.name as player_name,
+    p.whatsapp_number,
+    p.email,
+    p.city,
+    pt.event_name,
+    pt.partner_id,
+    partner.name as partner_name,
+    pt.ranking
+"""
+
+REGISTRATION_PAGE_MAX = 500
+REGISTRATION_TABLES = ('tbl_players', 'tbl_partners')
+# tbl_event_stats is derived from tbl_partners by triggers.
+STATISTICS_TABLES = ('tbl_eventname', 'tbl_partners')
+
+
+def _parse_bool_arg(args, name):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'{name} must be true or false')
+
+
+def _registration_filters(args):
+    """Translate query-string filters into WHERE clauses over ``p`` and ``pt``.
+
+    Returns ``(clauses, params, uses_player)``; ``uses_player`` tells the
+    count query whether it needs to join tbl_players at all.
+    """
+    clauses = []
+    params = []
+    uses_player = False
+
+    event_name = args.get('event_name')
+    if event_name:
+        clauses.append('pt.event_name = %s')
+        params.append(event_name)
+
+    city = args.get('city')
+    if city:
+        clauses.append('p.city = %s')
+        params.append(city)
+        uses_player = True
+
+    paired = _parse_bool_arg(args, 'paired')
+    if paired is not None:
+        clauses.append('pt.partner_id IS NOT NULL' if paired else 'pt.partner_id IS NULL')
+
+    ranked = _parse_bool_arg(args, 'ranked')
+    if ranked is not None:
+        clauses.append('pt.ranking IS NOT NULL' if ranked else 'pt.ranking IS NULL')
+
+    return clauses, params, uses_player
+
+
+def _encode_cursor(row):
+    # row is (player_id, player_name, ..., event_name, ...) as selected above
+    raw = json.dumps([row[1], row[5], row[0]], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(value):
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        player_name, event_name, player_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(player_name, str) or not isinstance(event_name, str) or not isinstance(player_id, int):
+        raise ValueError('Invalid cursor')
+    return player_name, event_name, player_id
+
 
 @admin_bp.route('/registrations', methods=['GET'])
 @jwt_required()
 def get_all_registrations():
-    connection = None
-    cursor = None
+    """List registrations, optionally filtered and keyset-paginated.
 
+    Without ``limit``/``cursor`` the full (filtered) list is returned as a
+    JSON array, as before. With them the response is
+    ``{"registrations": [...], "next_cursor": ..., "total": ...}``.
+    """
     try:
         # Get the current user identity for logging
         current_user = get_jwt_identity()
-        print(f"Admin request from user: {current_user}")
-
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'error': 'Database connection failed'}), 500
-
-        cursor = connection.cursor()
-
-        query = """
-        SELECT 
-            p.id as player_id,
-            p.name as player_name,
-            p.whatsapp_number,
-            p.email,
-            p.city,
-            pt.event_name,
-            pt.partner_id,
-            partner.name as partner_name,
-            pt.ranking
+        logger.debug("Admin request from user: %s", current_user)
+
+        try:
+            clauses, params, uses_player = _registration_filters(request.args)
+            paginate = 'limit' in request.args or 'cursor' in request.args
+            limit = min(int(request.args.get('limit', 100)), REGISTRATION_PAGE_MAX)
+            if limit < 1:
+                raise ValueError('limit must be positive')
+            after = _decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        where = list(clauses)
+        page_params = list(params)
+        if after:
+            # Row-wise (name, event, id) > cursor, spelled out so MySQL can
+            # range-scan idx_players_name_id on the leading column.
+            where.append(
+                '(p.name >= %s AND (p.name > %s OR pt.event_name > %s'
+                ' OR (pt.event_name = %s AND p.id > %s)))'
+            )
+            name, event, player_id = after
+            page_params.extend([name, name, event, event, player_id])
+
+        query = f"""
+        SELECT {REGISTRATION_COLUMNS}
         FROM tbl_players p
         INNER JOIN tbl_partners pt ON p.id = pt.user_id
         LEFT JOIN tbl_players partner ON pt.partner_id = partner.id
-        ORDER BY p.name, pt.event_name
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY p.name, pt.event_name, p.id
         """
 
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        with db_connection(readonly=True) as connection, connection.cursor() as cursor:
+            # Unchanged tables -> 304 before the listing query runs.
+            etag = versioned_etag(cursor, REGISTRATION_TABLES, request.path, request.query_string.decode('latin-1'))
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
+            if not paginate:
+                registrations = fetch_json(cursor, query, page_params)
+                logger.debug("Retrieved %d registrations", cursor.rowcount)
+                return json_response(registrations, etag=etag)
 
-        if not rows:
-            return jsonify([])
+            # One extra row tells us whether another page exists.
+            cursor.execute(query + ' LIMIT %s', page_params + [limit + 1])
+            rows = cursor.fetchall()
+            plan = row_plan(cursor, query)
 
-        # Convert to list of dictionaries
-        columns = [desc[0] for desc in cursor.description]
-        registrations = [dict(zip(columns, row)) for row in rows]
+            count_query = 'SELECT COUNT(*) FROM tbl_partners pt'
+            if uses_player:
+                count_query += ' INNER JOIN tbl_players p ON p.id = pt.user_id'
+            if clauses:
+                count_query += ' WHERE ' + ' AND '.join(clauses)
+            cursor.execute(count_query, params)
+            total = cursor.fetchone()[0]
 
-        print(f"Successfully retrieved {len(registrations)} registrations")
-        return jsonify(registrations)
+        next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        body = '{"next_cursor":%s,"registrations":%s,"total":%d}' % (
+            encode_value(next_cursor), plan.dumps(rows[:limit]), total
+        )
+        logger.debug("Retrieved %d of %d registrations", min(len(rows), limit), total)
+        return json_response(body, etag=etag)
 
     except Exception as e:
-        print(f"Database error in get_all_registrations: {e}")
+        logger.exception("Database error in get_all_registrations")
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+
+EXPORT_BATCH_SIZE = 500
+
+
+def _stream_registrations(query, params, fmt):
+    """Yield an export chunk per batch of rows read from an unbuffered cursor."""
+    with db_connection(readonly=True) as connection, cursor_for(connection, 'stream') as cursor:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header_written = False
+        pending = 0
+
+        for plan, row in iter_rows(cursor, query, params, batch_size=EXPORT_BATCH_SIZE):
+            if fmt == 'csv':
+                if not header_written:
+                    writer.writerow(plan.columns)
+                    header_written = True
+                writer.writerow(['' if value is None else value for value in row])
+            else:
+                buffer.write(plan.to_json(row))
+                buffer.write('\n')
+            pending += 1
+            if pending >= EXPORT_BATCH_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        if fmt == 'csv' and not header_written:
+            writer.writerow([desc[0] for desc in cursor.description or ()])
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+@admin_bp.route('/registrations/export', methods=['GET'])
+@jwt_required()
+def export_registrations():
+    """Stream every (filtered) registration as CSV or NDJSON."""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+    try:
+        clauses, params, _ = _registration_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    logger.info("Registration export (%s) requested by admin: %s", fmt, get_jwt_identity())
+
+    query = f"""
+    SELECT {REGISTRATION_COLUMNS}
+    FROM tbl_players p
+    INNER JOIN tbl_partners pt ON p.id = pt.user_id
+    LEFT JOIN tbl_players partner ON pt.partner_id = partner.id
+    {'WHERE ' + ' AND '.join(clauses) if clauses else ''}
+    ORDER BY p.name, pt.event_name, p.id
+    """
+    filename = f"registrations-{date.today().isoformat()}.{fmt}"
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        _stream_registrations(query, params, fmt),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
 
 
 @admin_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def get_event_statistics():
-    connection = None
-    cursor = None
-
     try:
         # Get the current user identity for logging
         current_user = get_jwt_identity()
-        print(f"Statistics request from admin: {current_user}")
+        logger.debug("Statistics request from admin: %s", current_user)
 
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'error': 'Database connection failed'}), 500
+        # tbl_event_stats is maintained by triggers on tbl_partners, so this
+        # reads one row per event regardless of registration volume.
+        with db_connection(readonly=True) as connection, connection.cursor() as cursor:
+            etag = versioned_etag(cursor, STATISTICS_TABLES, request.path)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+            statistics = fetch_json(cursor, SUMMARY_QUERY)
 
-        cursor = connection.cursor()
-        
-        # Check if the view exists, if not create it dynamically
-        try:
-            cursor.execute("SELECT * FROM event_statistics")
-        except Exception as e:
-            print(f"Event statistics view not found, creating dynamic query: {e}")
-            query = """
-            SELECT 
-                e.event_name,
-                COUNT(DISTINCT pt.user_id) as total_players,
-                COUNT(CASE WHEN pt.partner_id IS NOT NULL THEN 1 END) as paired_players,
-                COUNT(CASE WHEN pt.partner_id IS NULL THEN 1 END) as unpaired_players
-            FROM tbl_eventname e
-            LEFT JOIN tbl_partners pt ON e.event_name = pt.event_name
-            GROUP BY e.event_name
-            ORDER BY e.event_name
-            """
-            cursor.execute(query)
-        
-        rows = cursor.fetchall()
-
-        if not rows:
-            return jsonify([])
-
-        columns = [desc[0] for desc in cursor.description]
-        statistics = [dict(zip(columns, row)) for row in rows]
-
-        print(f"Successfully retrieved statistics for {len(statistics)} events")
-        return jsonify(statistics)
+        logger.debug("Retrieved statistics for %d events", cursor.rowcount)
+        return json_response(statistics, etag=etag)
 
     except Exception as e:
-        print(f"Statistics error: {e}")
+        logger.exception("Statistics error")
         return jsonify({'error': f'Statistics error: {str(e)}'}), 500
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+
+@admin_bp.route('/query-profile', methods=['GET'])
+@jwt_required()
+def get_query_profile():
+    """Top statements by ``order`` (total, mean, max, count or slow); needs DB_PROFILE=1."""
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({'enabled': False, 'statements': []})
+
+    order = request.args.get('order', 'total')
+    if order not in REPORT_ORDERS:
+        return jsonify({'error': 'order must be one of: ' + ', '.join(REPORT_ORDERS)}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    return jsonify(profiler.report(limit=limit, order_by=order))
+
+
+@admin_bp.route('/query-profile', methods=['DELETE'])
+@jwt_required()
+def reset_query_profile():
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.reset()
+    return jsonify({'message': 'Query profile reset'})
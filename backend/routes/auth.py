@@ -1,8 +1,44 @@
+import logging
+
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
-from db import get_db_connection  
+from admin_users import authenticate
+from cache import TTLCache
+from config import Config
+from db import db_connection
+from dashboard import load_dashboard
+from player_import import normalize_whatsapp
+from queries import json_response
+from ratelimit import SlidingWindowLimiter
 
 auth_bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
+
+# Checked before any DB work, so retry storms and brute force stay in memory.
+# Client addresses are keyed per login kind (see _client_key).
+login_ip_limiter = SlidingWindowLimiter(Config.LOGIN_RATE_LIMIT_IP, Config.LOGIN_RATE_WINDOW)
+login_whatsapp_limiter = SlidingWindowLimiter(Config.LOGIN_RATE_LIMIT_WHATSAPP, Config.LOGIN_RATE_WINDOW)
+
+# Recently failed (whatsapp, date_of_birth) pairs; cleared by player writes.
+failed_login_cache = TTLCache(
+    'failed_logins', ttl=Config.LOGIN_FAILURE_CACHE_TTL, max_entries=10000, tables=('tbl_players',),
+)
+
+
+def invalidate_failed_logins():
+    """Forget cached login failures after a player is created or changed."""
+    failed_login_cache.invalidate()
+
+
+def _client_key(kind):
+    # remote_addr is the real client once ProxyFix (TRUSTED_PROXY_HOPS) has resolved it.
+    return (kind, request.remote_addr)
+
+
+def _too_many_attempts(retry_after):
+    response = jsonify({'error': 'Too many login attempts, please try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -17,8 +53,12 @@ def login():
         if not username or not password:
             return jsonify({'error': 'Username and password are required'}), 400
         
-        # Simple admin login
-        if username == 'admin' and password == 'uta2025':
+        retry_after = login_ip_limiter.hit(_client_key('admin'))
+        if retry_after:
+            return _too_many_attempts(retry_after)
+
+        username = authenticate(username, password)
+        if username:
             access_token = create_access_token(identity=username)
             return jsonify({
                 'access_token': access_token,
@@ -27,15 +67,12 @@ def login():
         
         return jsonify({'error': 'Invalid credentials'}), 401
     except Exception as e:
-        print(f"Login error: {e}")
+        logger.exception("Login error")
         return jsonify({'error': 'Internal server error'}), 500
 
 
 @auth_bp.route('/user-login', methods=['POST'])
 def user_login():
-    connection = None
-    cursor = None
-    
     try:
         data = request.get_json()
         if not data:
@@ -45,52 +82,39 @@ def user_login():
         
         if not whatsapp or not date_of_birth:
             return jsonify({'error': 'WhatsApp number and date of birth are required'}), 400
-        
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            "SELECT * FROM tbl_players WHERE whatsapp_number = %s AND date_of_birth = %s", 
-            (whatsapp, date_of_birth)
+
+        retry_after = (
+            login_ip_limiter.hit(_client_key('player'))
+            or login_whatsapp_limiter.hit(normalize_whatsapp(whatsapp) or str(whatsapp))
         )
-        result = cursor.fetchone()
-        
-        if result:
-            columns = [desc[0] for desc in cursor.description]
-            user = dict(zip(columns, result))
-
-            cursor.close()
-            cursor = connection.cursor()
-
-            cursor.execute("""
-                SELECT 
-                    pt.event_name,
-                    pt.partner_id,
-                    IFNULL(partner.name, 'No partner assigned') as partner_name,
-                    pt.ranking
-                FROM tbl_partners pt
-                LEFT JOIN tbl_players partner ON pt.partner_id = partner.id
-                WHERE pt.user_id = %s
-                ORDER BY pt.event_name
-            """, (user['id'],))
-
-            events_result = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            events = [dict(zip(columns, row)) for row in events_result]
+        if retry_after:
+            return _too_many_attempts(retry_after)
 
-            return jsonify({
-                'success': True,
-                'user': {
-                    'player': user,
-                    'events': events
-                }
-            })
-        else:
+        credentials = (str(whatsapp), str(date_of_birth))
+        if failed_login_cache.get(credentials) is not None:
+            return jsonify({'error': 'Invalid WhatsApp number or date of birth'}), 401
+
+        generation = failed_login_cache.generation
+        with db_connection() as connection:
+            with connection.cursor() as cursor:
+                # Covered by idx_players_login; no table row is read.
+                cursor.execute(
+                    "SELECT id FROM tbl_players WHERE whatsapp_number = %s AND date_of_birth = %s",
+                    (whatsapp, date_of_birth)
+                )
+                result = cursor.fetchone()
+
+            if not result:
+                failed_login_cache.set(credentials, True, generation=generation)
+                return jsonify({'error': 'Invalid WhatsApp number or date of birth'}), 401
+
+            dashboard = load_dashboard(result[0], connection=connection)
+
+        if dashboard is None:
             return jsonify({'error': 'Invalid WhatsApp number or date of birth'}), 401
+
+        # The cached dashboard payload is {"events": [...], "player": {...}}.
+        return json_response('{"success":true,"user":%s}' % dashboard.value)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
@@ -0,0 +1,101 @@
+import json
+import logging
+import threading
+import time
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from changes import TooManySubscribers, bus
+from config import Config
+
+changes_bp = Blueprint('changes', __name__)
+logger = logging.getLogger(__name__)
+
+# Each stream served here occupies a request thread until it ends.
+_thread_streams = threading.BoundedSemaphore(Config.CHANGES_THREAD_STREAMS)
+
+
+def format_change(change):
+    payload = {
+        'kind': change.kind,
+        'events': sorted(change.events),
+        'players': sorted(change.players),
+        'at': change.at,
+        **change.data,
+    }
+    return (
+        f'id: {bus.event_id(change)}\n'
+        f'event: {change.kind}\n'
+        f'data: {json.dumps(payload, default=str)}\n\n'
+    )
+
+
+def stream_unavailable():
+    response = jsonify({'error': 'Too many open change streams'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '30'
+    return response
+
+
+@changes_bp.route('/stream', methods=['GET'])
+def stream_changes():
+    """Server-Sent Events feed of registration, partner, ranking and draw changes.
+
+    Filter with repeated ``event`` (event name) and ``player`` (player id)
+    query params. A ``resync`` event means deltas were lost (slow client,
+    reconnect or a write handled by another worker) and the client should
+    re-fetch what it shows. Streams end after CHANGES_STREAM_MAX_SECONDS;
+    EventSource reconnects with Last-Event-ID and resumes.
+
+    asgi.py serves this path itself without tying up a thread; here at
+    most CHANGES_THREAD_STREAMS streams run at once.
+    """
+    events = [name for name in request.args.getlist('event') if name]
+    try:
+        players = [int(player) for player in request.args.getlist('player') if player]
+    except ValueError:
+        return jsonify({'error': 'player must be a player id'}), 400
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    if not _thread_streams.acquire(blocking=False):
+        return stream_unavailable()
+    try:
+        subscription, backlog = bus.subscribe(events, players, last_event_id)
+    except TooManySubscribers:
+        _thread_streams.release()
+        return stream_unavailable()
+
+    released = False
+
+    def close():
+        # The server closes the response even if the generator never started.
+        nonlocal released
+        subscription.close()
+        if not released:
+            released = True
+            _thread_streams.release()
+
+    def generate():
+        deadline = time.monotonic() + Config.CHANGES_STREAM_MAX_SECONDS
+        try:
+            yield 'retry: 3000\n\n'
+            for change in backlog:
+                yield format_change(change)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                change = subscription.get(min(Config.CHANGES_HEARTBEAT_SECONDS, remaining))
+                if change is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_change(change)
+        finally:
+            close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    response.call_on_close(close)
+    return response
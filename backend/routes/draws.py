@@ -0,0 +1,153 @@
+import logging
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from changes import publish
+from db import db_connection
+from draws import DrawError, generate_draw, load_entries, save_draw, slot_to_dict
+from queries import not_modified
+from versions import bump_table_versions, versioned_etag
+
+draws_bp = Blueprint('draws', __name__)
+logger = logging.getLogger(__name__)
+
+DRAW_TABLES = ('tbl_draws', 'tbl_players')
+
+DRAW_QUERY = """
+    SELECT d.id, d.draw_size, d.seeds, d.entries, d.random_seed, d.created_by, d.created_at
+    FROM tbl_draws d
+    WHERE d.event_name = %s
+"""
+
+SLOTS_QUERY = """
+    SELECT s.position, s.seed, s.user_id, p.name, s.partner_id, partner.name
+    FROM tbl_draw_slots s
+    LEFT JOIN tbl_players p ON p.id = s.user_id
+    LEFT JOIN tbl_players partner ON partner.id = s.partner_id
+    WHERE s.draw_id = %s
+    ORDER BY s.position
+"""
+
+
+def _optional_int(data, name):
+    value = data.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+
+
+@draws_bp.route('/<path:event_name>', methods=['GET'])
+@jwt_required()
+def get_draw(event_name):
+    try:
+        with db_connection(readonly=True) as connection, connection.cursor() as cursor:
+            etag = versioned_etag(cursor, DRAW_TABLES, request.path)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+
+            cursor.execute(DRAW_QUERY, (event_name,))
+            draw = cursor.fetchone()
+            if not draw:
+                return jsonify({'error': 'No draw generated for this event'}), 404
+            draw_id, draw_size, seeds, entries, random_seed, created_by, created_at = draw
+            cursor.execute(SLOTS_QUERY, (draw_id,))
+            slots = [
+                {
+                    'position': position + 1,
+                    'seed': seed,
+                    'bye': user_id is None,
+                    'user_id': user_id,
+                    'name': name,
+                    'partner_id': partner_id,
+                    'partner_name': partner_name,
+                }
+                for position, seed, user_id, name, partner_id, partner_name in cursor.fetchall()
+            ]
+
+        response = jsonify({
+            'event_name': event_name,
+            'draw_size': draw_size,
+            'seeds': seeds,
+            'entries': entries,
+            'random_seed': random_seed,
+            'created_by': created_by,
+            'created_at': created_at.isoformat() if created_at else None,
+            'slots': slots,
+        })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    except Exception as e:
+        logger.exception("Draw lookup failed")
+        return jsonify({'error': str(e)}), 500
+
+
+@draws_bp.route('/<path:event_name>', methods=['POST'])
+@jwt_required()
+def create_draw(event_name):
+    """(Re)generate the event's draw from current entries and rankings.
+
+    Body (all optional): ``seeds``, ``random_seed`` (reuse one to reproduce
+    a draw), ``draw_size`` (must be the smallest power of two that holds
+    every entry) and ``dry_run`` to preview without storing.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        seeds = _optional_int(data, 'seeds')
+        random_seed = _optional_int(data, 'random_seed')
+        draw_size = _optional_int(data, 'draw_size')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    dry_run = bool(data.get('dry_run'))
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM tbl_eventname WHERE event_name = %s", (event_name,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Event not found'}), 404
+
+            entries, unpaired = load_entries(cursor, event_name)
+            try:
+                slots, random_seed = generate_draw(entries, seeds, random_seed, draw_size)
+            except DrawError as e:
+                return jsonify({'error': str(e)}), 400
+            seed_count = sum(1 for slot in slots if slot.seed)
+
+            draw_id = None
+            if not dry_run:
+                connection.begin()
+                try:
+                    draw_id = save_draw(cursor, event_name, slots, seed_count, random_seed,
+                                        created_by=get_jwt_identity())
+                    bump_table_versions(cursor, 'tbl_draws', 'tbl_schedule')
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+
+        if not dry_run:
+            publish('draw.generated', events=[event_name], draw_id=draw_id, random_seed=random_seed)
+        return jsonify({
+            'draw_id': draw_id,
+            'event_name': event_name,
+            'draw_size': len(slots),
+            'seeds': seed_count,
+            'entries': len(entries),
+            'random_seed': random_seed,
+            'dry_run': dry_run,
+            # A partner_id here points at someone who is paired with another player.
+            'unpaired': [
+                {'user_id': entry.user_id, 'name': entry.name, 'partner_id': entry.partner_id}
+                for entry in unpaired
+            ],
+            'slots': [slot_to_dict(slot) for slot in slots],
+        }), 200 if dry_run else 201
+
+    except Exception as e:
+        logger.exception("Draw generation failed")
+        return jsonify({'error': str(e)}), 500
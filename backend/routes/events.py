@@ -1,33 +1,56 @@
-from flask import Blueprint, jsonify
-from db import get_db_connection  
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from cache import TTLCache
+from config import Config
+from db import db_connection
+from queries import fetch_json, json_response
+from versions import bump_table_versions
 
 events_bp = Blueprint('events', __name__)
 
+# The event catalog only changes when an admin adds an event.
+event_cache = TTLCache('events', ttl=Config.EVENT_CACHE_TTL, max_entries=1, tables=('tbl_eventname',))
+
+EVENTS_QUERY = "SELECT * FROM tbl_eventname ORDER BY event_name"
+
+
+def _load_events():
+    with db_connection() as connection, connection.cursor() as cursor:
+        return fetch_json(cursor, EVENTS_QUERY)
+
+
 @events_bp.route('', methods=['GET'])
 def get_events():
-    connection = None
-    cursor = None
-    
     try:
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'error': 'Database connection failed'}), 500
+        entry = event_cache.get_or_load(None, _load_events)
+        return json_response(entry.value, etag=entry.etag)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM tbl_eventname ORDER BY event_name")
-        rows = cursor.fetchall()
+@events_bp.route('', methods=['POST'])
+@jwt_required()
+def create_event():
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
 
-        # Convert result to list of dicts
-        columns = [desc[0] for desc in cursor.description]
-        events = [dict(zip(columns, row)) for row in rows]
+    event_name = data.get('event_name')
+    if not event_name or not isinstance(event_name, str) or not event_name.strip():
+        return jsonify({'error': 'Valid event name is required'}), 400
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM tbl_eventname WHERE event_name = %s", (event_name.strip(),))
+            if cursor.fetchone():
+                return jsonify({'error': f'Event "{event_name.strip()}" already exists'}), 400
+            cursor.execute("INSERT INTO tbl_eventname (event_name) VALUES (%s)", (event_name.strip(),))
+            event_id = cursor.lastrowid
+            bump_table_versions(cursor, 'tbl_eventname')
+            connection.commit()
+        event_cache.invalidate()
+        return jsonify({'message': 'Event created successfully', 'id': event_id}), 201
 
-        return jsonify(events)
-    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
@@ -1,17 +1,25 @@
+import logging
+from bisect import bisect_left
+
 from flask import Blueprint, request, jsonify
-from db import get_db_connection  
+from flask_jwt_extended import jwt_required
+from cache import TTLCache
+from changes import publish
+from config import Config
+from dashboard import invalidate_dashboards
+from db import db_connection
+from pairing import PairingError, apply_pairs, plan_pairs
+from queries import RowPlan, json_response
+from versions import bump_table_versions
 
 partners_bp = Blueprint('partners', __name__)
+logger = logging.getLogger(__name__)
 
 @partners_bp.route('', methods=['POST'])
 def create_partner():
     data = request.get_json()
-    connection = None
-    cursor = None
 
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
         query = """
         INSERT INTO tbl_partners (event_name, user_id, partner_id)
         VALUES (%s, %s, %s)
@@ -21,63 +29,113 @@ def create_partner():
             data.get('user_id'),
             data.get('partner_id')
         )
-        cursor.execute(query, values)
-        connection.commit()
-        return jsonify({'message': 'Partner entry created successfully', 'id': cursor.lastrowid})
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, values)
+            partner_entry_id = cursor.lastrowid
+            bump_table_versions(cursor, 'tbl_partners')
+            connection.commit()
+        invalidate_available_partners(data.get('event_name'))
+        invalidate_dashboards(data.get('user_id'), data.get('partner_id'))
+        publish('registration.created', events=[data.get('event_name')],
+                players=[data.get('user_id'), data.get('partner_id')],
+                user_id=data.get('user_id'), partner_id=data.get('partner_id'))
+        return jsonify({'message': 'Partner entry created successfully', 'id': partner_entry_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
+
+
+# Entrants per event, sorted by lower-cased name so prefix search is a bisect.
+available_partners_cache = TTLCache(
+    'available_partners', ttl=Config.PARTNER_CACHE_TTL, max_entries=64, tables=('tbl_players', 'tbl_partners'),
+)
+
+AVAILABLE_PARTNER_PLAN = RowPlan(('user_id', 'player_name', 'gender', 'has_partner'))
+AVAILABLE_PARTNERS_MAX_LIMIT = 500
+
+
+ENTRANTS_QUERY = """
+    SELECT tp.user_id, p.name, p.gender, tp.partner_id
+    FROM tbl_partners tp
+    JOIN tbl_players p ON p.id = tp.user_id
+    WHERE tp.event_name = %s
+"""
+
+
+def sort_entrants(rows):
+    """Return ``(lowered_names, entrants)`` ordered for prefix bisection."""
+    entrants = sorted(rows, key=lambda row: ((row[1] or '').lower(), row[0]))
+    return [(row[1] or '').lower() for row in entrants], entrants
+
+
+def _load_event_entrants(event_name):
+    # Served from idx_partners_event_user_partner plus tbl_players primary key lookups.
+    with db_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(ENTRANTS_QUERY, (event_name,))
+        rows = cursor.fetchall()
+    return sort_entrants(rows)
+
+
+def invalidate_available_partners(*event_names):
+    """Drop cached entrant lists after a partner write (all events if none given)."""
+    available_partners_cache.invalidate(*event_names)
+
+
+def parse_partner_filters(args):
+    """Read ``gender``, ``q``, ``only_unpaired`` and ``limit`` from query args.
+
+    Raises ValueError for a non-numeric ``limit``.
+    """
+    # MySQL compared these case-insensitively, so the in-memory filters do too.
+    gender = (args.get('gender') or '').lower()
+    prefix = (args.get('q') or '').strip().lower()
+    only_unpaired = (args.get('only_unpaired') or '').lower() in ('1', 'true', 'yes')
+    limit = args.get('limit')
+    if limit is not None:
+        limit = max(1, min(int(limit), AVAILABLE_PARTNERS_MAX_LIMIT))
+    return gender, prefix, only_unpaired, limit
+
+
+def select_partners(names, entrants, current_user_id, gender, prefix, only_unpaired, limit):
+    """Filter a cached entrant list down to ``current_user_id``'s candidates, as JSON."""
+    start = bisect_left(names, prefix) if prefix else 0
+    partners = []
+    for index in range(start, len(entrants)):
+        if prefix and not names[index].startswith(prefix):
+            break
+        user_id, player_name, player_gender, partner_id = entrants[index]
+        if user_id == current_user_id or partner_id == current_user_id:
+            continue
+        if gender and (player_gender or '').lower() != gender:
+            continue
+        if only_unpaired and partner_id is not None:
+            continue
+        partners.append((user_id, player_name, player_gender, 1 if partner_id is not None else 0))
+        if limit and len(partners) >= limit:
+            break
+    return AVAILABLE_PARTNER_PLAN.dumps(partners)
 
 
 @partners_bp.route('/available/<event_name>/<int:current_user_id>', methods=['GET'])
 def get_available_partners(event_name, current_user_id):
-    connection = None
-    cursor = None
+    """Entrants of ``event_name`` that ``current_user_id`` could partner with.
 
-    # Get gender filter from query params
-    gender = request.args.get('gender')
+    Optional query params: ``gender``, ``q`` (name prefix), ``only_unpaired``
+    and ``limit``.
+    """
+    try:
+        filters = parse_partner_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
 
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-
-        # Build query with gender filter if provided
-        base_query = '''
-            SELECT 
-                p.id AS user_id,
-                p.name AS player_name,
-                p.gender AS gender,
-                CASE 
-                    WHEN tp.partner_id IS NOT NULL THEN TRUE
-                    ELSE FALSE
-                END AS has_partner
-            FROM tbl_players p
-            JOIN tbl_partners tp ON p.id = tp.user_id
-            WHERE tp.event_name = %s
-              AND tp.user_id != %s
-              AND (tp.partner_id IS NULL OR tp.partner_id != %s)
-        '''
-        params = [event_name, current_user_id, current_user_id]
-        if gender:
-            base_query += ' AND p.gender = %s'
-            params.append(gender)
-        cursor.execute(base_query, params)
-        result = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        partners = [dict(zip(columns, row)) for row in result]
-        return jsonify(partners)
+        names, entrants = available_partners_cache.get_or_load(
+            event_name, lambda: _load_event_entrants(event_name)
+        ).value
+        return json_response(select_partners(names, entrants, current_user_id, *filters))
 
     except Exception as e:
-        print("Error in get_available_partners:", str(e))
+        logger.exception("Error in get_available_partners")
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
-
-
-
 
 
 @partners_bp.route('/update-relationship', methods=['POST'])
@@ -87,20 +145,17 @@ def update_partner_relationship():
     user1_id = data.get('user1_id')
     user2_id = data.get('user2_id')
 
-    connection = None
-    cursor = None
-
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.callproc('UpdatePartnerRelationship', [event_name, user1_id, user2_id])
-        connection.commit()
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.callproc('UpdatePartnerRelationship', [event_name, user1_id, user2_id])
+            bump_table_versions(cursor, 'tbl_partners')
+            connection.commit()
+        invalidate_available_partners(event_name)
+        invalidate_dashboards(user1_id, user2_id)
+        publish('partner.linked', events=[event_name], players=[user1_id, user2_id], pairs=[[user1_id, user2_id]])
         return jsonify({'message': 'Partner relationship updated successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
 
 
 @partners_bp.route('/register-events', methods=['POST'])
@@ -112,31 +167,29 @@ def register_player_for_events():
     event2_name = data.get('event2_name')
     partner2_id = data.get('partner2_id')
 
-    connection = None
-    cursor = None
-
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.callproc('RegisterPlayerForEvents', [
-            player_id, event1_name, partner1_id, event2_name, partner2_id
-        ])
-        connection.commit()
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.callproc('RegisterPlayerForEvents', [
+                player_id, event1_name, partner1_id, event2_name, partner2_id
+            ])
+            bump_table_versions(cursor, 'tbl_partners')
+            connection.commit()
+        invalidate_available_partners(*[name for name in (event1_name, event2_name) if name])
+        invalidate_dashboards(player_id, partner1_id, partner2_id)
+        publish('registration.created', events=[event1_name, event2_name],
+                players=[player_id, partner1_id, partner2_id], user_id=player_id)
         return jsonify({'message': 'Player registered for events successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
 
 
 @partners_bp.route('/update-ranking', methods=['POST'])
 def update_ranking():
     data = request.get_json()
-    
+
     if not data:
         return jsonify({'error': 'No data provided'}), 400
-    
+
     player_id = data.get('player_id')
     event_name = data.get('event_name')
     ranking = data.get('ranking')
@@ -144,88 +197,264 @@ def update_ranking():
     # Validate input data
     if not player_id or not isinstance(player_id, int) or player_id <= 0:
         return jsonify({'error': 'Valid player ID is required'}), 400
-    
+
     if not event_name or not isinstance(event_name, str) or not event_name.strip():
         return jsonify({'error': 'Valid event name is required'}), 400
-    
+
     if not ranking or not isinstance(ranking, int) or ranking <= 0 or ranking > 1000:
         return jsonify({'error': 'Ranking must be a positive number between 1 and 1000'}), 400
 
-    connection = None
-    cursor = None
-
     try:
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'error': 'Database connection failed'}), 500
-
-        cursor = connection.cursor()
-        
-        cursor.execute("SELECT id, name FROM tbl_players WHERE id = %s", (player_id,))
-        player = cursor.fetchone()
-        if not player:
-            return jsonify({'error': f'Player with ID {player_id} not found'}), 404
-        
-        cursor.execute("SELECT event_name FROM tbl_eventname WHERE event_name = %s", (event_name,))
-        event = cursor.fetchone()
-        if not event:
-            return jsonify({'error': f'Event "{event_name}" not found'}), 404
-        
-        # Check if the registration exists
-        check_query = """
-        SELECT id FROM tbl_partners 
-        WHERE user_id = %s AND event_name = %s
-        """
-        cursor.execute(check_query, (player_id, event_name))
-        existing = cursor.fetchone()
-        
-        if not existing:
-            return jsonify({'error': f'Player {player[1]} (ID: {player_id}) is not registered for event "{event_name}"'}), 404
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT id, name FROM tbl_players WHERE id = %s", (player_id,))
+            player = cursor.fetchone()
+            if not player:
+                return jsonify({'error': f'Player with ID {player_id} not found'}), 404
 
-        # Update the ranking
-        query = """
-        UPDATE tbl_partners 
-        SET ranking = %s 
-        WHERE user_id = %s AND event_name = %s
-        """
-        cursor.execute(query, (ranking, player_id, event_name))
-        connection.commit()
+            cursor.execute("SELECT event_name FROM tbl_eventname WHERE event_name = %s", (event_name,))
+            event = cursor.fetchone()
+            if not event:
+                return jsonify({'error': f'Event "{event_name}" not found'}), 404
+
+            # Check if the registration exists
+            check_query = """
+            SELECT id FROM tbl_partners
+            WHERE user_id = %s AND event_name = %s
+            """
+            cursor.execute(check_query, (player_id, event_name))
+            existing = cursor.fetchone()
 
-        if cursor.rowcount == 0:
-            return jsonify({'error': 'No matching registration found to update'}), 404
+            if not existing:
+                return jsonify({'error': f'Player {player[1]} (ID: {player_id}) is not registered for event "{event_name}"'}), 404
 
-        print(f"Successfully updated ranking for player {player[1]} (ID: {player_id}) in event {event_name} to {ranking}")
+            # Update the ranking
+            query = """
+            UPDATE tbl_partners
+            SET ranking = %s
+            WHERE user_id = %s AND event_name = %s
+            """
+            cursor.execute(query, (ranking, player_id, event_name))
+            updated = cursor.rowcount
+            if updated:
+                bump_table_versions(cursor, 'tbl_partners')
+            connection.commit()
+
+            if updated == 0:
+                return jsonify({'error': 'No matching registration found to update'}), 404
+        invalidate_dashboards(player_id)
+        publish('ranking.changed', events=[event_name], players=[player_id], ranking=ranking)
+
+        logger.info("Updated ranking for player %s in event %s to %s", player_id, event_name, ranking)
         return jsonify({'message': 'Ranking updated successfully'})
-        
+
+    except Exception as e:
+        # The pooled connection is rolled back before it is returned.
+        logger.exception("Error updating ranking")
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
+
+BULK_RANKING_MAX_ITEMS = 1000
+
+
+def _ranking_item_error(item):
+    """Validate one bulk ranking item the same way update_ranking does."""
+    if not isinstance(item, dict):
+        return 'Each item must be an object'
+    player_id = item.get('player_id')
+    event_name = item.get('event_name')
+    ranking = item.get('ranking')
+    if not player_id or not isinstance(player_id, int) or player_id <= 0:
+        return 'Valid player ID is required'
+    if not event_name or not isinstance(event_name, str) or not event_name.strip():
+        return 'Valid event name is required'
+    if not ranking or not isinstance(ranking, int) or ranking <= 0 or ranking > 1000:
+        return 'Ranking must be a positive number between 1 and 1000'
+    return None
+
+
+@partners_bp.route('/update-rankings', methods=['POST'])
+def update_rankings_bulk():
+    """Apply many ranking updates with set-based validation and one UPDATE.
+
+    Body: ``{"rankings": [{"player_id", "event_name", "ranking"}, ...],
+    "atomic": false}``. Invalid items are reported per index; with
+    ``atomic`` set, any invalid item aborts the whole batch.
+    """
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    items = data.get('rankings')
+    atomic = bool(data.get('atomic', False))
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'rankings must be a non-empty list'}), 400
+    if len(items) > BULK_RANKING_MAX_ITEMS:
+        return jsonify({'error': f'At most {BULK_RANKING_MAX_ITEMS} rankings per request'}), 400
+
+    results = []
+    seen = set()
+    for index, item in enumerate(items):
+        error = _ranking_item_error(item)
+        key = None
+        if not error:
+            key = (item['player_id'], item['event_name'])
+            if key in seen:
+                error = 'Duplicate player/event pair in batch'
+            seen.add(key)
+        results.append({
+            'index': index,
+            'player_id': item.get('player_id') if isinstance(item, dict) else None,
+            'event_name': item.get('event_name') if isinstance(item, dict) else None,
+            'status': 'error' if error else 'pending',
+            'error': error,
+        })
+
+    pending = [result for result in results if result['status'] == 'pending']
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            if pending:
+                player_ids = sorted({result['player_id'] for result in pending})
+                event_names = sorted({result['event_name'] for result in pending})
+                player_marks = ', '.join(['%s'] * len(player_ids))
+                event_marks = ', '.join(['%s'] * len(event_names))
+
+                cursor.execute(f"SELECT id FROM tbl_players WHERE id IN ({player_marks})", player_ids)
+                known_players = {row[0] for row in cursor.fetchall()}
+                cursor.execute(f"SELECT event_name FROM tbl_eventname WHERE event_name IN ({event_marks})", event_names)
+                known_events = {row[0] for row in cursor.fetchall()}
+                cursor.execute(
+                    f"SELECT id, user_id, event_name FROM tbl_partners "
+                    f"WHERE user_id IN ({player_marks}) AND event_name IN ({event_marks})",
+                    player_ids + event_names
+                )
+                registrations = {(row[1], row[2]): row[0] for row in cursor.fetchall()}
+
+                for result in pending:
+                    player_id, event_name = result['player_id'], result['event_name']
+                    if player_id not in known_players:
+                        result['error'] = f'Player with ID {player_id} not found'
+                    elif event_name not in known_events:
+                        result['error'] = f'Event "{event_name}" not found'
+                    elif (player_id, event_name) not in registrations:
+                        result['error'] = f'Player {player_id} is not registered for event "{event_name}"'
+                    if result['error']:
+                        result['status'] = 'error'
+
+            failed = [result for result in results if result['status'] == 'error']
+            if atomic and failed:
+                for result in results:
+                    if result['status'] == 'pending':
+                        result['status'] = 'skipped'
+                return jsonify({'updated': 0, 'failed': len(failed), 'results': results}), 422
+
+            to_update = [result for result in results if result['status'] == 'pending']
+            if to_update:
+                # A single CASE UPDATE keyed by tbl_partners.id: one statement,
+                # one round trip, one transaction for the whole draw.
+                cases = []
+                params = []
+                row_ids = []
+                for result in to_update:
+                    row_id = registrations[(result['player_id'], result['event_name'])]
+                    cases.append('WHEN %s THEN %s')
+                    params.extend([row_id, items[result['index']]['ranking']])
+                    row_ids.append(row_id)
+                params.extend(row_ids)
+                connection.begin()
+                cursor.execute(
+                    f"UPDATE tbl_partners SET ranking = CASE id {' '.join(cases)} END "
+                    f"WHERE id IN ({', '.join(['%s'] * len(row_ids))})",
+                    params
+                )
+                bump_table_versions(cursor, 'tbl_partners')
+                connection.commit()
+                for result in to_update:
+                    result['status'] = 'updated'
+                invalidate_dashboards(*[result['player_id'] for result in to_update])
+                publish(
+                    'ranking.changed',
+                    events=[result['event_name'] for result in to_update],
+                    players=[result['player_id'] for result in to_update],
+                    rankings=[
+                        {'player_id': result['player_id'], 'event_name': result['event_name'],
+                         'ranking': items[result['index']]['ranking']}
+                        for result in to_update
+                    ],
+                )
+
+        logger.info("Bulk ranking update: %d updated, %d failed", len(to_update), len(failed))
+        return jsonify({'updated': len(to_update), 'failed': len(failed), 'results': results})
+
     except Exception as e:
-        print(f"Error updating ranking: {e}")
-        if connection:
-            connection.rollback()
+        logger.exception("Error in bulk ranking update")
         return jsonify({'error': f'Database error: {str(e)}'}), 500
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
 
 
 @partners_bp.route('/delete-all/<int:player_id>', methods=['DELETE'])
 def delete_all_partners_for_player(player_id):
-    connection = None
-    cursor = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute("DELETE FROM tbl_partners WHERE user_id = %s", (player_id,))
-        connection.commit()
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("DELETE FROM tbl_partners WHERE user_id = %s", (player_id,))
+            bump_table_versions(cursor, 'tbl_partners')
+            connection.commit()
+        invalidate_available_partners()
+        invalidate_dashboards(player_id)
+        publish('registration.deleted', players=[player_id], user_id=player_id)
         return jsonify({'message': 'All event registrations deleted for player', 'player_id': player_id})
     except Exception as e:
-        if connection:
-            connection.rollback()
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+
+
+@partners_bp.route('/auto-pair', methods=['POST'])
+@jwt_required()
+def auto_pair():
+    """Pair all unpaired entrants of a doubles event in one transaction.
+
+    Body: ``{"event_name", "preview": true, "city_weight", "ranking_weight"}``.
+    A preview (the default) only returns the proposed pairs; send
+    ``"preview": false`` to store them.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('event_name'):
+        return jsonify({'error': 'event_name is required'}), 400
+    event_name = data['event_name']
+    preview = data.get('preview', True) is not False
+    try:
+        weights = [None if data.get(name) is None else float(data[name])
+                   for name in ('city_weight', 'ranking_weight')]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'city_weight and ranking_weight must be numbers'}), 400
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            if preview:
+                pairer, pairs, unmatched = plan_pairs(cursor, event_name, *weights)
+            else:
+                connection.begin()
+                try:
+                    pairer, pairs, unmatched = plan_pairs(cursor, event_name, *weights, for_update=True)
+                    if not apply_pairs(cursor, event_name, pairs):
+                        connection.rollback()
+                        return jsonify({'error': 'Entries changed while pairing; try again'}), 409
+                    if pairs:
+                        bump_table_versions(cursor, 'tbl_partners')
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+    except PairingError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("Error in auto_pair")
+        return jsonify({'error': str(e)}), 500
+
+    if not preview and pairs:
+        invalidate_available_partners(event_name)
+        invalidate_dashboards(*[user_id for pair in pairs for user_id in pair])
+        publish('partner.linked', events=[event_name], players=[user_id for pair in pairs for user_id in pair],
+                pairs=[list(pair) for pair in pairs])
+        logger.info("Auto-paired %d pairs in %s", len(pairs), event_name)
+
+    return jsonify({'event_name': event_name, 'preview': preview, **pairer.describe(pairs, unmatched)})
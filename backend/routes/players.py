@@ -1,179 +1,170 @@
+import logging
+
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from db import get_db_connection  
+from changes import publish
+from dashboard import invalidate_dashboards, load_dashboard
+from db import db_connection
+from player_import import PlayerImportError, import_players, iter_rows
+from queries import fetch_json, json_response, not_modified
+from routes.auth import invalidate_failed_logins
+from routes.partners import invalidate_available_partners
+from versions import bump_table_versions, versioned_etag
 
 players_bp = Blueprint('players', __name__)
+logger = logging.getLogger(__name__)
 
 @players_bp.route('', methods=['POST'])
 def create_or_update_player():
-    data = request.get_json()   
-    print('[DEBUG] Received player update:', data)
-    connection = None
-    cursor = None
+    data = request.get_json()
+    logger.debug("Received player update: %s", data)
 
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-
         player_id = data.get('id')  # Only present if editing
         whatsapp = (data.get('whatsapp_number') or '').strip()
-        print(f'[DEBUG] Checking for duplicate WhatsApp: {whatsapp}, player_id: {player_id}')
-
-        if player_id:
-            cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s AND id != %s", (whatsapp, player_id))
-        else:
-            cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s", (whatsapp,))
-        if cursor.fetchone():
-            return jsonify({'error': 'WhatsApp number already registered'}), 400
-
-        if player_id:
-            # UPDATE existing player
-            print('[DEBUG] About to update player:')
-            print('  address:', data.get('address'))
-            print('  emergency_contact:', data.get('emergency_contact'))
-            print('  playing_experience:', data.get('playing_experience'))
-            query = """
-                UPDATE tbl_players SET
-                    name = %s, whatsapp_number = %s, date_of_birth = %s, email = %s, city = %s,
-                    shirt_size = %s, short_size = %s, food_pref = %s, stay_y_or_n = %s, fee_paid = %s,
-                    address = %s, emergency_contact = %s, playing_experience = %s, medical_conditions = %s,
-                    gender = %s
-                WHERE id = %s
-            """
-            values = (
-                data.get('name'),
-                whatsapp,
-                data.get('date_of_birth'),
-                data.get('email'),
-                data.get('city'),
-                data.get('shirt_size'),
-                data.get('short_size'),
-                data.get('food_pref'),
-                data.get('stay_y_or_n', False),
-                data.get('fee_paid', False),
-                data.get('address'),
-                data.get('emergency_contact'),
-                data.get('playing_experience'),
-                data.get('medical_conditions'),
-                data.get('gender'),
-                player_id
-            )
-            cursor.execute(query, values)
-            connection.commit()
-            return jsonify({'message': 'Player updated successfully', 'id': player_id})
-        else:
-            # INSERT new player
-            print('[DEBUG] About to insert player:')
-            print('  address:', data.get('address'))
-            print('  emergency_contact:', data.get('emergency_contact'))
-            print('  playing_experience:', data.get('playing_experience'))
-            query = """
-                INSERT INTO tbl_players (
-                    name, whatsapp_number, date_of_birth, email, city, 
-                    shirt_size, short_size, food_pref, stay_y_or_n, fee_paid,
-                    address, emergency_contact, playing_experience, medical_conditions, gender
+        logger.debug("Checking for duplicate WhatsApp number, player_id: %s", player_id)
+
+        with db_connection() as connection, connection.cursor() as cursor:
+            if player_id:
+                cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s AND id != %s", (whatsapp, player_id))
+            else:
+                cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s", (whatsapp,))
+            if cursor.fetchone():
+                return jsonify({'error': 'WhatsApp number already registered'}), 400
+
+            if player_id:
+                # UPDATE existing player
+                logger.debug("Updating player %s", player_id)
+                query = """
+                    UPDATE tbl_players SET
+                        name = %s, whatsapp_number = %s, date_of_birth = %s, email = %s, city = %s,
+                        shirt_size = %s, short_size = %s, food_pref = %s, stay_y_or_n = %s, fee_paid = %s,
+                        address = %s, emergency_contact = %s, playing_experience = %s, medical_conditions = %s,
+                        gender = %s
+                    WHERE id = %s
+                """
+                values = (
+                    data.get('name'),
+                    whatsapp,
+                    data.get('date_of_birth'),
+                    data.get('email'),
+                    data.get('city'),
+                    data.get('shirt_size'),
+                    data.get('short_size'),
+                    data.get('food_pref'),
+                    data.get('stay_y_or_n', False),
+                    data.get('fee_paid', False),
+                    data.get('address'),
+                    data.get('emergency_contact'),
+                    data.get('playing_experience'),
+                    data.get('medical_conditions'),
+                    data.get('gender'),
+                    player_id
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            values = (
-                data.get('name'),
-                whatsapp,
-                data.get('date_of_birth'),
-                data.get('email'),
-                data.get('city'),
-                data.get('shirt_size'),
-                data.get('short_size'),
-                data.get('food_pref'),
-                data.get('stay_y_or_n', False),
-                data.get('fee_paid', False),
-                data.get('address'),
-                data.get('emergency_contact'),
-                data.get('playing_experience'),
-                data.get('medical_conditions'),
-                data.get('gender')
-            )
-            cursor.execute(query, values)
-            connection.commit()
-            return jsonify({'message': 'Player created successfully', 'id': cursor.lastrowid})
+                cursor.execute(query, values)
+                bump_table_versions(cursor, 'tbl_players')
+                connection.commit()
+                # Names and genders are embedded in cached partner lists and
+                # in the dashboards of everyone partnered with this player.
+                invalidate_available_partners()
+                invalidate_dashboards()
+                invalidate_failed_logins()
+                publish('player.updated', players=[player_id])
+                return jsonify({'message': 'Player updated successfully', 'id': player_id})
+            else:
+                # INSERT new player
+                logger.debug("Inserting new player")
+                query = """
+                    INSERT INTO tbl_players (
+                        name, whatsapp_number, date_of_birth, email, city,
+                        shirt_size, short_size, food_pref, stay_y_or_n, fee_paid,
+                        address, emergency_contact, playing_experience, medical_conditions, gender
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """
+                values = (
+                    data.get('name'),
+                    whatsapp,
+                    data.get('date_of_birth'),
+                    data.get('email'),
+                    data.get('city'),
+                    data.get('shirt_size'),
+                    data.get('short_size'),
+                    data.get('food_pref'),
+                    data.get('stay_y_or_n', False),
+                    data.get('fee_paid', False),
+                    data.get('address'),
+                    data.get('emergency_contact'),
+                    data.get('playing_experience'),
+                    data.get('medical_conditions'),
+                    data.get('gender')
+                )
+                cursor.execute(query, values)
+                new_player_id = cursor.lastrowid
+                bump_table_versions(cursor, 'tbl_players')
+                connection.commit()
+                invalidate_failed_logins()
+                publish('player.created', players=[new_player_id])
+                return jsonify({'message': 'Player created successfully', 'id': new_player_id})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
 
 
 
 @players_bp.route('', methods=['GET'])
 @jwt_required()
 def get_players():
-    connection = None
-    cursor = None
-
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM tbl_players ORDER BY created_at DESC")
-        rows = cursor.fetchall()
+        with db_connection(readonly=True) as connection, connection.cursor() as cursor:
+            etag = versioned_etag(cursor, ('tbl_players',), request.path)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+            players = fetch_json(cursor, "SELECT * FROM tbl_players ORDER BY created_at DESC")
+
+        return json_response(players, etag=etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@players_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_players_file():
+    """Import offline registrations from an uploaded CSV/XLSX ``file``.
+
+    Pass ``dry_run=true`` (form field or query string) to get the
+    validation report without inserting anything.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'A CSV or XLSX file is required'}), 400
 
-        columns = [desc[0] for desc in cursor.description]
-        players = [dict(zip(columns, row)) for row in rows]
+    dry_run = (request.values.get('dry_run') or '').lower() in ('1', 'true', 'yes')
 
-        return jsonify(players)
+    try:
+        with db_connection() as connection:
+            report = import_players(connection, iter_rows(upload.stream, upload.filename), dry_run=dry_run)
+        if report['inserted'] and not dry_run:
+            invalidate_failed_logins()
+            publish('player.imported', inserted=report['inserted'])
+        return jsonify(report)
+    except PlayerImportError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
 
 
 @players_bp.route('/dashboard/<int:player_id>', methods=['GET'])
 def get_player_dashboard(player_id):
-    connection = None
-    cursor = None
-
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-
-        # Get player info
-        cursor.execute("SELECT * FROM tbl_players WHERE id = %s", (player_id,))
-        player_row = cursor.fetchone()
-        if not player_row:
+        entry = load_dashboard(player_id)
+        if entry is None:
             return jsonify({'error': 'Player not found'}), 404
-
-        columns = [desc[0] for desc in cursor.description]
-        player = dict(zip(columns, player_row))
-
-        # Get player's events and partners
-        cursor.execute("""
-            SELECT 
-                pt.event_name,
-                pt.partner_id,
-                CASE 
-                    WHEN pt.partner_id IS NOT NULL THEN partner.name
-                    ELSE 'No partner assigned'
-                END as partner_name,
-                pt.ranking
-            FROM tbl_partners pt
-            LEFT JOIN tbl_players partner ON pt.partner_id = partner.id
-            WHERE pt.user_id = %s
-            ORDER BY pt.event_name
-        """, (player_id,))
-        event_rows = cursor.fetchall()
-        event_columns = [desc[0] for desc in cursor.description]
-        events = [dict(zip(event_columns, row)) for row in event_rows]
-
-        return jsonify({
-            'player': player,
-            'events': events
-        })
+        return json_response(entry.value, etag=entry.etag)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
 @players_bp.route('/ranking', methods=['PUT'])
 def update_ranking():
     data = request.get_json()
@@ -185,67 +176,62 @@ def update_ranking():
     if not all([user_id, event_name, ranking is not None]):
         return jsonify({'error': 'Missing user_id, event_name, or ranking'}), 400
 
-    connection = None
-    cursor = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        cursor.callproc('UpdatePlayerRanking', (user_id, event_name, ranking))
-        connection.commit()
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.callproc('UpdatePlayerRanking', (user_id, event_name, ranking))
+            bump_table_versions(cursor, 'tbl_partners')
+            connection.commit()
+        invalidate_dashboards(user_id)
+        publish('ranking.changed', events=[event_name], players=[user_id], ranking=ranking)
         return jsonify({'message': 'Ranking updated successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
 
 @players_bp.route('/<int:player_id>', methods=['PUT'])
 def update_player(player_id):
     data = request.get_json()
-    print('[DEBUG] PUT update_player:', data)
-    connection = None
-    cursor = None
+    logger.debug("PUT update_player %s: %s", player_id, data)
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor()
         whatsapp = (data.get('whatsapp_number') or '').strip()
-        print(f'[DEBUG] PUT Checking for duplicate WhatsApp: {whatsapp}, player_id: {player_id}')
-        # Check for duplicate WhatsApp number (exclude current user)
-        cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s AND id != %s", (whatsapp, player_id))
-        if cursor.fetchone():
-            return jsonify({'error': 'WhatsApp number already registered'}), 400
-        # UPDATE existing player
-        query = """
-            UPDATE tbl_players SET
-                name = %s, whatsapp_number = %s, date_of_birth = %s, email = %s, city = %s,
-                shirt_size = %s, short_size = %s, food_pref = %s, stay_y_or_n = %s, fee_paid = %s,
-                address = %s, emergency_contact = %s, playing_experience = %s, medical_conditions = %s,
-                gender = %s
-            WHERE id = %s
-        """
-        values = (
-            data.get('name'),
-            whatsapp,
-            data.get('date_of_birth'),
-            data.get('email'),
-            data.get('city'),
-            data.get('shirt_size'),
-            data.get('short_size'),
-            data.get('food_pref'),
-            data.get('stay_y_or_n', False),
-            data.get('fee_paid', False),
-            data.get('address'),
-            data.get('emergency_contact'),
-            data.get('playing_experience'),
-            data.get('medical_conditions'),
-            data.get('gender'),
-            player_id
-        )
-        cursor.execute(query, values)
-        connection.commit()
+        with db_connection() as connection, connection.cursor() as cursor:
+            # Check for duplicate WhatsApp number (exclude current user)
+            cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s AND id != %s", (whatsapp, player_id))
+            if cursor.fetchone():
+                return jsonify({'error': 'WhatsApp number already registered'}), 400
+            # UPDATE existing player
+            query = """
+                UPDATE tbl_players SET
+                    name = %s, whatsapp_number = %s, date_of_birth = %s, email = %s, city = %s,
+                    shirt_size = %s, short_size = %s, food_pref = %s, stay_y_or_n = %s, fee_paid = %s,
+                    address = %s, emergency_contact = %s, playing_experience = %s, medical_conditions = %s,
+                    gender = %s
+                WHERE id = %s
+            """
+            values = (
+                data.get('name'),
+                whatsapp,
+                data.get('date_of_birth'),
+                data.get('email'),
+                data.get('city'),
+                data.get('shirt_size'),
+                data.get('short_size'),
+                data.get('food_pref'),
+                data.get('stay_y_or_n', False),
+                data.get('fee_paid', False),
+                data.get('address'),
+                data.get('emergency_contact'),
+                data.get('playing_experience'),
+                data.get('medical_conditions'),
+                data.get('gender'),
+                player_id
+            )
+            cursor.execute(query, values)
+            bump_table_versions(cursor, 'tbl_players')
+            connection.commit()
+        invalidate_available_partners()
+        invalidate_dashboards()
+        invalidate_failed_logins()
+        publish('player.updated', players=[player_id])
         return jsonify({'message': 'Player updated successfully', 'id': player_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if connection: connection.close()
@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import time
+
+import pymysql
+from flask import Blueprint, request, jsonify
+from config import Config
+from changes import publish
+from dashboard import invalidate_dashboards
+from db import db_connection
+from player_import import PLAYER_COLUMNS, REQUIRED_COLUMNS
+from routes.auth import invalidate_failed_logins
+from routes.partners import invalidate_available_partners
+from versions import bump_table_versions
+
+registrations_bp = Blueprint('registrations', __name__)
+logger = logging.getLogger(__name__)
+
+MAX_EVENTS_PER_REGISTRATION = 5
+
+PLAYER_INSERT = (
+    "INSERT INTO tbl_players (" + ', '.join(PLAYER_COLUMNS) + ") "
+    "VALUES (" + ', '.join(['%s'] * len(PLAYER_COLUMNS)) + ")"
+)
+PLAYER_UPDATE = (
+    "UPDATE tbl_players SET " + ', '.join(column + ' = %s' for column in PLAYER_COLUMNS) + " WHERE id = %s"
+)
+
+
+class RegistrationError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ServerTiming:
+    """Collects ``Server-Timing`` phases for the response header."""
+
+    def __init__(self):
+        self.started = self._mark = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._mark) * 1000))
+        self._mark = now
+
+    def header(self):
+        phases = self.phases + [('total', (time.perf_counter() - self.started) * 1000)]
+        return ', '.join(f'{name};dur={duration:.1f}' for name, duration in phases)
+
+
+def _validate(data):
+    player = data.get('player')
+    events = data.get('events') or []
+    if not isinstance(player, dict):
+        raise RegistrationError('player is required')
+    missing = [column for column in REQUIRED_COLUMNS if not player.get(column)]
+    if missing:
+        raise RegistrationError('Missing ' + ', '.join(missing))
+    if not isinstance(events, list) or len(events) > MAX_EVENTS_PER_REGISTRATION:
+        raise RegistrationError(f'events must be a list of at most {MAX_EVENTS_PER_REGISTRATION} entries')
+    for event in events:
+        if not isinstance(event, dict) or not event.get('event_name'):
+            raise RegistrationError('Every event needs an event_name')
+        try:
+            event['partner_id'] = int(event['partner_id']) if event.get('partner_id') else None
+        except (TypeError, ValueError):
+            raise RegistrationError('partner_id must be a player id')
+    try:
+        player['id'] = int(player['id']) if player.get('id') else None
+    except (TypeError, ValueError):
+        raise RegistrationError('player.id must be a player id')
+    if len({event['event_name'] for event in events}) != len(events):
+        raise RegistrationError('Each event may only be listed once')
+    return player, events
+
+
+def _claim_idempotency_key(cursor, key, request_hash):
+    """Claim ``key`` inside the open transaction, or return the stored response.
+
+    A concurrent request with the same key blocks on the primary key until
+    this transaction ends, then sees either our committed response or, if
+    we rolled back, a free key.
+    """
+    cursor.execute(
+        "DELETE FROM tbl_idempotency_keys WHERE idempotency_key = %s "
+        "AND created_at < NOW() - INTERVAL %s HOUR",
+        (key, Config.IDEMPOTENCY_KEY_TTL_HOURS),
+    )
+    try:
+        cursor.execute(
+            "INSERT INTO tbl_idempotency_keys (idempotency_key, request_hash) VALUES (%s, %s)",
+            (key, request_hash),
+        )
+        return None
+    except pymysql.IntegrityError:
+        cursor.execute(
+            "SELECT request_hash, status_code, response_body FROM tbl_idempotency_keys "
+            "WHERE idempotency_key = %s",
+            (key,),
+        )
+        return cursor.fetchone()
+
+
+def _upsert_player(cursor, player):
+    player_id = player.get('id')
+    whatsapp = str(player.get('whatsapp_number') or '').strip()
+    values = [whatsapp if column == 'whatsapp_number' else player.get(column) for column in PLAYER_COLUMNS]
+
+    cursor.execute("SELECT id FROM tbl_players WHERE whatsapp_number = %s FOR UPDATE", (whatsapp,))
+    existing = cursor.fetchone()
+    if existing and existing[0] != player_id:
+        raise RegistrationError('WhatsApp number already registered')
+
+    if player_id:
+        cursor.execute(PLAYER_UPDATE, values + [player_id])
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM tbl_players WHERE id = %s", (player_id,))
+            if not cursor.fetchone():
+                raise RegistrationError('Player not found', status=404)
+        return player_id, False
+
+    cursor.execute(PLAYER_INSERT, values)
+    return cursor.lastrowid, True
+
+
+def _pair(cursor, event_name, user_id, partner_id):
+    """Make ``partner_id`` point back at ``user_id`` (UpdatePartnerRelationship, inline)."""
+    cursor.execute(
+        "UPDATE tbl_partners SET partner_id = %s WHERE event_name = %s AND user_id = %s",
+        (user_id, event_name, partner_id),
+    )
+    if cursor.rowcount == 0:
+        cursor.execute("SELECT 1 FROM tbl_partners WHERE event_name = %s AND user_id = %s", (event_name, partner_id))
+        if not cursor.fetchone():
+            cursor.execute(
+                "INSERT INTO tbl_partners (event_name, user_id, partner_id) VALUES (%s, %s, %s)",
+                (event_name, partner_id, user_id),
+            )
+
+
+def _register_events(cursor, player_id, events):
+    cursor.execute(
+        "SELECT event_name FROM tbl_partners WHERE user_id = %s FOR UPDATE",
+        (player_id,),
+    )
+    registered = {row[0] for row in cursor.fetchall()}
+
+    results = []
+    for event in events:
+        event_name = event['event_name']
+        partner_id = event['partner_id']
+        if partner_id == player_id:
+            raise RegistrationError(f'A player cannot partner themselves in {event_name}')
+        if event_name in registered:
+            # Same as RegisterPlayerForEvents: existing entries are left as they are.
+            results.append({'event_name': event_name, 'partner_id': partner_id, 'status': 'already_registered'})
+            continue
+        cursor.execute(
+            "INSERT INTO tbl_partners (event_name, user_id, partner_id) VALUES (%s, %s, %s)",
+            (event_name, player_id, partner_id),
+        )
+        if partner_id:
+            _pair(cursor, event_name, player_id, partner_id)
+        results.append({'event_name': event_name, 'partner_id': partner_id, 'status': 'registered'})
+    return results
+
+
+@registrations_bp.route('', methods=['POST'])
+def register():
+    """Create or update a player and register them for events in one transaction.
+
+    Body: ``{"player": {...player form...}, "events": [{"event_name", "partner_id"}]}``.
+    Send an ``Idempotency-Key`` header to make client retries safe: a
+    repeated key replays the first response instead of registering again.
+    """
+    timing = ServerTiming()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+
+    idempotency_key = (request.headers.get('Idempotency-Key') or '').strip() or None
+    if idempotency_key and len(idempotency_key) > 64:
+        return jsonify({'error': 'Idempotency-Key must be at most 64 characters'}), 400
+
+    try:
+        player, events = _validate(data)
+    except RegistrationError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    request_hash = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            connection.begin()
+            try:
+                if idempotency_key:
+                    stored = _claim_idempotency_key(cursor, idempotency_key, request_hash)
+                    timing.mark('idempotency')
+                    if stored is not None:
+                        connection.rollback()
+                        stored_hash, status_code, body = stored
+                        if stored_hash != request_hash:
+                            return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+                        response = jsonify(json.loads(body))
+                        response.status_code = status_code
+                        response.headers['Idempotent-Replayed'] = 'true'
+                        response.headers['Server-Timing'] = timing.header()
+                        return response
+
+                player_id, created = _upsert_player(cursor, player)
+                timing.mark('player')
+                results = _register_events(cursor, player_id, events)
+                timing.mark('events')
+
+                bump_table_versions(cursor, 'tbl_players', 'tbl_partners')
+                status_code = 201 if created else 200
+                body = {'player_id': player_id, 'created': created, 'events': results}
+                if idempotency_key:
+                    cursor.execute(
+                        "UPDATE tbl_idempotency_keys SET status_code = %s, response_body = %s "
+                        "WHERE idempotency_key = %s",
+                        (status_code, json.dumps(body), idempotency_key),
+                    )
+                connection.commit()
+                timing.mark('commit')
+            except Exception:
+                connection.rollback()
+                raise
+    except RegistrationError as e:
+        return jsonify({'error': str(e)}), e.status
+    except pymysql.IntegrityError as e:
+        # Unknown event or partner (foreign keys), or a duplicate entry.
+        return jsonify({'error': str(e)}), 400
+    except pymysql.OperationalError as e:
+        # SIGNALs from the registration triggers arrive as OperationalError 1644.
+        if e.args and e.args[0] == 1644:
+            return jsonify({'error': e.args[1]}), 400
+        logger.exception("Registration failed")
+        return jsonify({'error': str(e)}), 500
+    except Exception as e:
+        logger.exception("Registration failed")
+        return jsonify({'error': str(e)}), 500
+
+    invalidate_available_partners(*[event['event_name'] for event in events])
+    invalidate_dashboards(player_id, *[event.get('partner_id') for event in events if event.get('partner_id')])
+    invalidate_failed_logins()
+    publish(
+        'registration.created',
+        events=[event['event_name'] for event in events],
+        players=[player_id, *[event['partner_id'] for event in events]],
+        tables=['tbl_players', 'tbl_partners'],
+        user_id=player_id,
+        player_created=created,
+    )
+
+    response = jsonify(body)
+    response.status_code = status_code
+    response.headers['Server-Timing'] = timing.header()
+    return response
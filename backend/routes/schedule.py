@@ -0,0 +1,172 @@
+import logging
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from db import db_connection
+from queries import fetch_json, json_response, not_modified
+from scheduler import (
+    ScheduleError, build_schedule, load_schedule, match_to_dict, normalize_settings,
+    save_match, save_schedule, save_settings, to_minute,
+)
+from versions import bump_table_versions, versioned_etag
+
+schedule_bp = Blueprint('schedule', __name__)
+logger = logging.getLogger(__name__)
+
+SCHEDULE_TABLES = ('tbl_schedule', 'tbl_players')
+
+# Round-one matches show their entries; later rounds depend on results.
+SCHEDULE_QUERY = """
+    SELECT sc.event_name, sc.round, sc.match_number, sc.court, sc.start_at, sc.end_at,
+           p1.name as player1_name, pp1.name as player1_partner_name,
+           p2.name as player2_name, pp2.name as player2_partner_name
+    FROM tbl_schedule sc
+    LEFT JOIN tbl_draws d ON d.event_name = sc.event_name AND sc.round = 1
+    LEFT JOIN tbl_draw_slots s1 ON s1.draw_id = d.id AND s1.position = sc.match_number * 2 - 2
+    LEFT JOIN tbl_draw_slots s2 ON s2.draw_id = d.id AND s2.position = sc.match_number * 2 - 1
+    LEFT JOIN tbl_players p1 ON p1.id = s1.user_id
+    LEFT JOIN tbl_players pp1 ON pp1.id = s1.partner_id
+    LEFT JOIN tbl_players p2 ON p2.id = s2.user_id
+    LEFT JOIN tbl_players pp2 ON pp2.id = s2.partner_id
+"""
+
+
+def _parse_time(data, name):
+    value = data.get(name)
+    if not value:
+        return None
+    try:
+        return to_minute(datetime.fromisoformat(value).replace(tzinfo=None))
+    except (TypeError, ValueError):
+        raise ScheduleError(f'{name} must be an ISO date-time')
+
+
+@schedule_bp.route('', methods=['GET'])
+@jwt_required()
+def get_schedule():
+    """Order of play, optionally for one ``event_name`` or ``court``."""
+    clauses = []
+    params = []
+    for column in ('event_name', 'court'):
+        value = request.args.get(column)
+        if value:
+            clauses.append(f'sc.{column} = %s')
+            params.append(value)
+    query = SCHEDULE_QUERY
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += ' ORDER BY sc.start_at, sc.court'
+
+    try:
+        with db_connection(readonly=True) as connection, connection.cursor() as cursor:
+            etag = versioned_etag(cursor, SCHEDULE_TABLES, request.full_path)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+            body = fetch_json(cursor, query, params)
+        return json_response(body, etag=etag)
+
+    except Exception as e:
+        logger.exception("Schedule lookup failed")
+        return jsonify({'error': str(e)}), 500
+
+
+@schedule_bp.route('', methods=['POST'])
+@jwt_required()
+def create_schedule():
+    """Schedule every drawn match.
+
+    Body: ``courts`` (a count or names), ``windows`` (``[{"start", "end"}]``
+    or ``"start/end"`` strings), optional ``match_minutes``,
+    ``rest_minutes``, ``events`` (reschedule only these; the others keep
+    their slots) and ``dry_run``.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+
+    try:
+        settings = normalize_settings(
+            data.get('courts'), data.get('windows'), data.get('match_minutes'), data.get('rest_minutes'),
+        )
+        events = data.get('events') or None
+        if events is not None and not isinstance(events, list):
+            raise ScheduleError('events must be a list of event names')
+    except (ScheduleError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    dry_run = bool(data.get('dry_run'))
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            try:
+                schedule = build_schedule(cursor, settings, events)
+            except ScheduleError as e:
+                return jsonify({'error': str(e)}), 400
+
+            if not dry_run:
+                connection.begin()
+                try:
+                    save_settings(cursor, settings)
+                    save_schedule(cursor, schedule)
+                    bump_table_versions(cursor, 'tbl_schedule')
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+
+        return jsonify({
+            'dry_run': dry_run,
+            'settings': settings,
+            'scheduled': [match_to_dict(schedule, match) for match in schedule.scheduled()],
+            'unscheduled': [match_to_dict(schedule, match) for match in schedule.unscheduled],
+        }), 200 if dry_run else 201
+
+    except Exception as e:
+        logger.exception("Schedule build failed")
+        return jsonify({'error': str(e)}), 500
+
+
+@schedule_bp.route('/matches', methods=['PUT'])
+@jwt_required()
+def move_match():
+    """Reschedule one match without rebuilding the rest.
+
+    Body: ``event_name``, ``round``, ``match_number`` and either
+    ``start_at`` (optionally with ``court``) or ``not_before`` to take the
+    earliest conflict-free slot from then on.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'No data provided'}), 400
+
+    try:
+        key = (data.get('event_name'), int(data.get('round')), int(data.get('match_number')))
+        minute = _parse_time(data, 'start_at')
+        not_before = _parse_time(data, 'not_before')
+    except (ScheduleError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e) if isinstance(e, ScheduleError)
+                        else 'event_name, round and match_number are required'}), 400
+
+    try:
+        with db_connection() as connection, connection.cursor() as cursor:
+            connection.begin()
+            try:
+                # Serialises concurrent moves; the schedule is rebuilt from rows read after the lock.
+                cursor.execute("SELECT id FROM tbl_schedule_settings WHERE id = 1 FOR UPDATE")
+                schedule = load_schedule(cursor)
+                match = schedule.move(key, minute, data.get('court'), not_before)
+                save_match(cursor, schedule, match)
+                bump_table_versions(cursor, 'tbl_schedule')
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+        return jsonify(match_to_dict(schedule, match))
+
+    except ScheduleError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.exception("Match reschedule failed")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Order of play: courts and start times for every match of the stored draws.
+
+    python scheduler.py build --courts 6 \\
+        --window 2026-11-01T09:00/2026-11-01T19:00 --window 2026-11-02T09:00/2026-11-02T19:00
+    python scheduler.py move "Men's Singles" 1 3 --not-before 2026-11-01T14:00
+    python scheduler.py benchmark
+
+Time windows are cut into slots of one match length; every placement is a
+(court, slot) pair. A player entered in several events (event1/event2 of
+RegisterPlayerForEvents) may not have two matches starting closer than
+match length + rest. Later-round participants are not known before
+results exist, so a round-r match conservatively involves every player of
+its part of the draw, and it starts only after both feeding matches
+(plus rest).
+
+``Schedule`` keeps a player -> sorted start minutes index, so checking or
+moving one match costs a few bisects rather than a full recompute. The
+initial build is greedy (round by round, earliest feasible slot) with a
+repair pass that tries to free a slot for each leftover match by moving
+one blocking match elsewhere.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from config import Config
+from db import get_db_connection
+from versions import bump_table_versions
+
+EPOCH = datetime(2000, 1, 1)
+
+
+class ScheduleError(Exception):
+    """Raised for invalid schedule settings or an infeasible placement."""
+
+
+class Match:
+    __slots__ = ('key', 'players', 'feeders', 'dependents', 'minute', 'court', 'fixed')
+
+    def __init__(self, key, players, feeders):
+        self.key = key  # (event_name, round, match_number)
+        self.players = players
+        self.feeders = feeders
+        self.dependents = []
+        self.minute = None
+        self.court = None
+        self.fixed = False
+
+
+def to_minute(value):
+    return int((value - EPOCH).total_seconds() // 60)
+
+
+def from_minute(minute):
+    return EPOCH + timedelta(minutes=minute)
+
+
+def parse_window(value):
+    """``"start/end"`` or ``{"start": ..., "end": ...}`` in ISO format."""
+    if isinstance(value, dict):
+        start, end = value.get('start'), value.get('end')
+    else:
+        start, _, end = str(value).partition('/')
+    try:
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    except (TypeError, ValueError):
+        raise ScheduleError(f'Invalid time window: {value!r}')
+    if end <= start:
+        raise ScheduleError(f'Time window ends before it starts: {value!r}')
+    return start.replace(tzinfo=None), end.replace(tzinfo=None)
+
+
+def build_matches(event_name, slots):
+    """Every match of a draw; ``slots`` holds ``(user_id, partner_id)`` or None (bye) per position."""
+    matches = {}
+    size = len(slots)
+    for rnd in range(1, size.bit_length()):
+        width = 2 ** rnd
+        for number in range(1, size // width + 1):
+            block = slots[(number - 1) * width:number * width]
+            if rnd == 1 and (block[0] is None or block[1] is None):
+                continue  # a bye: the entry walks through to round 2
+            players = frozenset(player for entry in block if entry for player in entry if player is not None)
+            feeders = [key for key in ((event_name, rnd - 1, 2 * number - 1), (event_name, rnd - 1, 2 * number))
+                       if key in matches]
+            match = matches[(event_name, rnd, number)] = Match((event_name, rnd, number), players, feeders)
+            for key in feeders:
+                matches[key].dependents.append(match.key)
+    return matches
+
+
+class Schedule:
+    def __init__(self, matches, courts, windows, match_minutes, rest_minutes):
+        if not courts:
+            raise ScheduleError('At least one court is required')
+        if match_minutes <= 0 or rest_minutes < 0:
+            raise ScheduleError('match_minutes must be positive and rest_minutes not negative')
+        self.matches = matches
+        self.courts = list(courts)
+        self.match_minutes = match_minutes
+        self.rest_minutes = rest_minutes
+        # Two matches of one player must start at least this far apart.
+        self.gap = match_minutes + rest_minutes
+
+        slot_minutes = set()
+        for start, end in windows:
+            minute, last = to_minute(start), to_minute(end) - match_minutes
+            while minute <= last:
+                slot_minutes.add(minute)
+                minute += match_minutes
+        if not slot_minutes:
+            raise ScheduleError('The time windows are too short for a single match')
+        self.slots = sorted(slot_minutes)
+        self.slot_set = slot_minutes
+
+        self.court_use = defaultdict(dict)  # minute -> {court: match key}
+        self.player_starts = defaultdict(list)  # player -> sorted start minutes
+        self.bookings = {}  # (player, minute) -> match key
+        self.unscheduled = []
+
+    # -- indexes ---------------------------------------------------------
+
+    def place(self, match, minute, court):
+        match.minute, match.court = minute, court
+        self.court_use[minute][court] = match.key
+        for player in match.players:
+            insort(self.player_starts[player], minute)
+            self.bookings[(player, minute)] = match.key
+
+    def unplace(self, match):
+        minute = match.minute
+        if minute is None:
+            return
+        used = self.court_use[minute]
+        del used[match.court]
+        if not used:
+            del self.court_use[minute]
+        for player in match.players:
+            starts = self.player_starts[player]
+            del starts[bisect_left(starts, minute)]
+            del self.bookings[(player, minute)]
+        match.minute = match.court = None
+
+    def player_blockers(self, match, minute):
+        """Keys of scheduled matches sharing a player with ``match`` too close to ``minute``."""
+        blockers = set()
+        for player in match.players:
+            starts = self.player_starts.get(player)
+            if not starts:
+                continue
+            index = bisect_right(starts, minute - self.gap)
+            while index < len(starts) and starts[index] < minute + self.gap:
+                key = self.bookings[(player, starts[index])]
+                if key != match.key:
+                    blockers.add(key)
+                index += 1
+        return blockers
+
+    def free_court(self, minute, preferred=None):
+        used = self.court_use.get(minute, {})
+        if preferred is not None:
+            return preferred if preferred not in used else None
+        for court in self.courts:
+            if court not in used:
+                return court
+        return None
+
+    def bounds(self, match):
+        """Earliest and latest start minute allowed by feeders and dependents, or None if a feeder is unscheduled."""
+        earliest = self.slots[0]
+        for key in match.feeders:
+            feeder = self.matches[key]
+            if feeder.minute is None:
+                return None
+            earliest = max(earliest, feeder.minute + self.gap)
+        latest = self.slots[-1]
+        for key in match.dependents:
+            dependent = self.matches[key]
+            if dependent.minute is not None:
+                latest = min(latest, dependent.minute - self.gap)
+        return earliest, latest
+
+    # -- placement -------------------------------------------------------
+
+    def check(self, match, minute, court=None):
+        """Why ``match`` cannot start at ``minute`` (on ``court``), or None if it can."""
+        if minute not in self.slot_set:
+            return 'not a start time inside the time windows'
+        bounds = self.bounds(match)
+        if bounds is None:
+            return 'an earlier-round match is not scheduled'
+        if not bounds[0] <= minute <= bounds[1]:
+            return 'too close to an earlier- or later-round match'
+        if court is not None and court not in self.courts:
+            return f'unknown court {court}'
+        if self.free_court(minute, court) is None:
+            return 'no free court'
+        blockers = self.player_blockers(match, minute)
+        if blockers:
+            return 'player conflict with ' + ', '.join(format_key(key) for key in sorted(blockers))
+        return None
+
+    def find_slot(self, match, not_before=None):
+        """Earliest feasible ``(minute, court)`` for ``match``, or None."""
+        bounds = self.bounds(match)
+        if bounds is None:
+            return None
+        earliest, latest = bounds
+        if not_before is not None:
+            earliest = max(earliest, not_before)
+        for index in range(bisect_left(self.slots, earliest), len(self.slots)):
+            minute = self.slots[index]
+            if minute > latest:
+                break
+            court = self.free_court(minute)
+            if court is not None and not self.player_blockers(match, minute):
+                return minute, court
+        return None
+
+    def build(self, max_repairs=None):
+        pending = sorted((match for match in self.matches.values() if match.minute is None),
+                         key=lambda match: (match.key[1], match.key[0], match.key[2]))
+        leftovers = []
+        for match in pending:
+            slot = self.find_slot(match)
+            if slot is None:
+                leftovers.append(match)
+            else:
+                self.place(match, *slot)
+
+        # Earlier repairs may have opened a slot, so look again before repairing.
+        repairs = 0
+        self.unscheduled = []
+        for match in leftovers:
+            slot = self.find_slot(match)
+            if slot is not None:
+                self.place(match, *slot)
+            elif (max_repairs is None or repairs < max_repairs) and self.repair(match):
+                repairs += 1
+            else:
+                self.unscheduled.append(match)
+        return self
+
+    def repair(self, match):
+        """Place ``match`` by moving one blocking match to another slot."""
+        bounds = self.bounds(match)
+        if bounds is None:
+            return False
+        earliest, latest = bounds
+        for index in range(bisect_left(self.slots, earliest), len(self.slots)):
+            minute = self.slots[index]
+            if minute > latest:
+                break
+            blockers = self.player_blockers(match, minute)
+            court = self.free_court(minute)
+            if len(blockers) == 1 and court is not None:
+                candidates = blockers
+            elif not blockers and court is None:
+                candidates = set(self.court_use[minute].values())
+            else:
+                continue
+            for key in sorted(candidates):
+                if self._swap_out(match, minute, court, self.matches[key]):
+                    return True
+        return False
+
+    def _swap_out(self, match, minute, court, blocker):
+        if blocker.fixed:
+            return False
+        old_minute, old_court = blocker.minute, blocker.court
+        self.unplace(blocker)
+        target_court = court if court is not None else old_court
+        if self.check(match, minute, target_court) is None:
+            self.place(match, minute, target_court)
+            slot = self.find_slot(blocker)
+            if slot is not None:
+                self.place(blocker, *slot)
+                return True
+            self.unplace(match)
+        self.place(blocker, old_minute, old_court)
+        return False
+
+    def move(self, key, minute=None, court=None, not_before=None):
+        """Reschedule one match, either to ``minute`` (and ``court``) or to the earliest slot after ``not_before``."""
+        match = self.matches.get(key)
+        if match is None:
+            raise ScheduleError(f'No match {format_key(key)}')
+        old = (match.minute, match.court)
+        self.unplace(match)
+        if minute is not None:
+            problem = self.check(match, minute, court)
+            if problem is None:
+                self.place(match, minute, court or self.free_court(minute))
+                return match
+        else:
+            slot = self.find_slot(match, not_before)
+            if slot is not None:
+                self.place(match, *slot)
+                return match
+            problem = 'no feasible slot left in the time windows'
+        if old[0] is not None:
+            self.place(match, *old)
+        raise ScheduleError(f'Cannot move {format_key(key)}: {problem}')
+
+    def scheduled(self):
+        return sorted((match for match in self.matches.values() if match.minute is not None),
+                      key=lambda match: (match.minute, self.courts.index(match.court)
+                                         if match.court in self.courts else len(self.courts)))
+
+
+def format_key(key):
+    event_name, rnd, number = key
+    return f'{event_name} R{rnd} M{number}'
+
+
+def match_to_dict(schedule, match):
+    start = from_minute(match.minute) if match.minute is not None else None
+    return {
+        'event_name': match.key[0],
+        'round': match.key[1],
+        'match_number': match.key[2],
+        'court': match.court,
+        'start_at': start.isoformat() if start else None,
+        'end_at': (start + timedelta(minutes=schedule.match_minutes)).isoformat() if start else None,
+    }
+
+
+# -- persistence -------------------------------------------------------------
+
+DRAW_SLOTS_QUERY = """
+    SELECT d.event_name, d.draw_size, s.position, s.user_id, s.partner_id
+    FROM tbl_draws d
+    JOIN tbl_draw_slots s ON s.draw_id = d.id
+    ORDER BY d.event_name, s.position
+"""
+
+
+def load_matches(cursor):
+    cursor.execute(DRAW_SLOTS_QUERY)
+    draws = {}
+    for event_name, draw_size, position, user_id, partner_id in cursor.fetchall():
+        slots = draws.setdefault(event_name, [None] * draw_size)
+        if user_id is not None:
+            slots[position] = (user_id, partner_id)
+    matches = {}
+    for event_name, slots in draws.items():
+        matches.update(build_matches(event_name, slots))
+    return matches
+
+
+def load_settings(cursor):
+    cursor.execute(
+        "SELECT courts, windows, match_minutes, rest_minutes FROM tbl_schedule_settings WHERE id = 1"
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    courts, windows, match_minutes, rest_minutes = row
+    return {
+        'courts': json.loads(courts),
+        'windows': json.loads(windows),
+        'match_minutes': match_minutes,
+        'rest_minutes': rest_minutes,
+    }
+
+
+def new_schedule(matches, settings):
+    return Schedule(
+        matches,
+        settings['courts'],
+        [parse_window(window) for window in settings['windows']],
+        settings['match_minutes'],
+        settings['rest_minutes'],
+    )
+
+
+def load_schedule(cursor, settings=None, keep=None):
+    """Schedule with the stored placements applied.
+
+    ``keep(key)`` decides which stored placements are kept (default all);
+    placements no longer on the slot grid or clashing are left unscheduled.
+    """
+    settings = settings or load_settings(cursor)
+    if settings is None:
+        raise ScheduleError('No schedule has been built yet')
+    schedule = new_schedule(load_matches(cursor), settings)
+    cursor.execute("SELECT event_name, round, match_number, court, start_at FROM tbl_schedule ORDER BY start_at")
+    for event_name, rnd, number, court, start_at in cursor.fetchall():
+        match = schedule.matches.get((event_name, rnd, number))
+        if match is None or (keep is not None and not keep(match.key)):
+            continue
+        minute = to_minute(start_at)
+        if schedule.check(match, minute, court) is None:
+            schedule.place(match, minute, court)
+            match.fixed = keep is not None
+    return schedule
+
+
+def save_settings(cursor, settings):
+    cursor.execute(
+        "INSERT INTO tbl_schedule_settings (id, courts, windows, match_minutes, rest_minutes) "
+        "VALUES (1, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE courts = VALUES(courts), "
+        "windows = VALUES(windows), match_minutes = VALUES(match_minutes), rest_minutes = VALUES(rest_minutes)",
+        (json.dumps(settings['courts']), json.dumps(settings['windows']),
+         settings['match_minutes'], settings['rest_minutes']),
+    )
+
+
+def save_schedule(cursor, schedule):
+    """Replace all stored placements; the caller commits."""
+    cursor.execute("DELETE FROM tbl_schedule")
+    rows = [
+        (match.key[0], match.key[1], match.key[2], match.court,
+         from_minute(match.minute), from_minute(match.minute + schedule.match_minutes))
+        for match in schedule.scheduled()
+    ]
+    if rows:
+        cursor.executemany(
+            "INSERT INTO tbl_schedule (event_name, round, match_number, court, start_at, end_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def save_match(cursor, schedule, match):
+    cursor.execute(
+        "UPDATE tbl_schedule SET court = %s, start_at = %s, end_at = %s "
+        "WHERE event_name = %s AND round = %s AND match_number = %s",
+        (match.court, from_minute(match.minute), from_minute(match.minute + schedule.match_minutes), *match.key),
+    )
+    if cursor.rowcount == 0:
+        cursor.execute(
+            "INSERT INTO tbl_schedule (event_name, round, match_number, court, start_at, end_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (*match.key, match.court, from_minute(match.minute),
+             from_minute(match.minute + schedule.match_minutes)),
+        )
+
+
+def normalize_settings(courts, windows, match_minutes=None, rest_minutes=None):
+    """Validated settings dict; ``courts`` is a count or a list of names."""
+    if isinstance(courts, int) and not isinstance(courts, bool):
+        courts = [f'Court {number}' for number in range(1, courts + 1)]
+    if not isinstance(courts, list) or not courts or len(set(map(str, courts))) != len(courts):
+        raise ScheduleError('courts must be a positive count or a list of distinct names')
+    if not isinstance(windows, list) or not windows:
+        raise ScheduleError('windows must be a non-empty list')
+    parsed = [parse_window(window) for window in windows]
+    return {
+        'courts': [str(court) for court in courts],
+        'windows': [{'start': start.isoformat(), 'end': end.isoformat()} for start, end in parsed],
+        'match_minutes': int(match_minutes or Config.SCHEDULE_MATCH_MINUTES),
+        'rest_minutes': int(Config.SCHEDULE_REST_MINUTES if rest_minutes is None else rest_minutes),
+    }
+
+
+def build_schedule(cursor, settings, events=None):
+    """Greedy + repair schedule; with ``events`` only those are rescheduled and the rest keep their slots."""
+    if events:
+        events = set(events)
+        schedule = load_schedule(cursor, settings, keep=lambda key: key[0] not in events)
+    else:
+        schedule = new_schedule(load_matches(cursor), settings)
+    return schedule.build()
+
+
+# -- CLI ---------------------------------------------------------------------
+
+def _synthetic_schedule(events, entries, courts, days):
+    rng = random.Random(7)
+    matches = {}
+    pool = list(range(1, entries * 2 + 1))
+    for event in range(events):
+        players = rng.sample(pool, entries)
+        slots = [(player, None) for player in players]
+        matches.update(build_matches(f'Event {event + 1}', slots))
+    start = datetime(2026, 11, 1, 8)
+    windows = [(start + timedelta(days=day), start + timedelta(days=day, hours=12)) for day in range(days)]
+    return Schedule(matches, [f'Court {n}' for n in range(1, courts + 1)], windows, 60, 30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and adjust the order of play')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='schedule every drawn match')
+    build.add_argument('--courts', required=True, help='a count or comma-separated court names')
+    build.add_argument('--window', action='append', required=True, help='START/END in ISO format')
+    build.add_argument('--match-minutes', type=int)
+    build.add_argument('--rest-minutes', type=int)
+    build.add_argument('--event', action='append', help='reschedule only these events')
+    build.add_argument('--dry-run', action='store_true')
+    move = commands.add_parser('move', help='reschedule one match')
+    move.add_argument('event_name')
+    move.add_argument('round', type=int)
+    move.add_argument('match_number', type=int)
+    move.add_argument('--start', help='exact start time (ISO)')
+    move.add_argument('--court')
+    move.add_argument('--not-before', help='earliest acceptable start when --start is omitted')
+    bench = commands.add_parser('benchmark', help='schedule synthetic events')
+    bench.add_argument('--events', type=int, default=4)
+    bench.add_argument('--entries', type=int, default=128)
+    bench.add_argument('--courts', type=int, default=12)
+    bench.add_argument('--days', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        schedule = _synthetic_schedule(args.events, args.entries, args.courts, args.days)
+        started = time.perf_counter()
+        schedule.build()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{len(schedule.matches)} matches, {len(schedule.unscheduled)} unscheduled, build {elapsed:.1f} ms")
+        movable = [match for match in schedule.scheduled() if not match.dependents]
+        started = time.perf_counter()
+        moved = 0
+        for match in movable[:200]:
+            try:
+                schedule.move(match.key, not_before=match.minute + 1)
+                moved += 1
+            except ScheduleError:
+                pass
+        if moved:
+            print(f"{moved} single-match reschedules, {(time.perf_counter() - started) * 1000 / moved:.3f} ms each")
+        return
+
+    connection = get_db_connection()
+    if not connection:
+        print("Database connection failed")
+        sys.exit(1)
+    try:
+        with connection.cursor() as cursor:
+            if args.command == 'build':
+                courts = args.courts.split(',') if not args.courts.isdigit() else int(args.courts)
+                settings = normalize_settings(courts, args.window, args.match_minutes, args.rest_minutes)
+                schedule = build_schedule(cursor, settings, args.event)
+                if not args.dry_run:
+                    connection.begin()
+                    save_settings(cursor, settings)
+                    save_schedule(cursor, schedule)
+                    bump_table_versions(cursor, 'tbl_schedule')
+                    connection.commit()
+                for match in schedule.scheduled():
+                    print(f"  {from_minute(match.minute):%a %d %b %H:%M}  {match.court:<10} {format_key(match.key)}")
+                for match in schedule.unscheduled:
+                    print(f"  UNSCHEDULED  {format_key(match.key)}")
+            else:
+                schedule = load_schedule(cursor)
+                key = (args.event_name, args.round, args.match_number)
+                minute = to_minute(datetime.fromisoformat(args.start)) if args.start else None
+                not_before = to_minute(datetime.fromisoformat(args.not_before)) if args.not_before else None
+                match = schedule.move(key, minute, args.court, not_before)
+                connection.begin()
+                save_match(cursor, schedule, match)
+                bump_table_versions(cursor, 'tbl_schedule')
+                connection.commit()
+                print(f"{format_key(key)} -> {from_minute(match.minute):%a %d %b %H:%M} on {match.court}")
+    except ScheduleError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
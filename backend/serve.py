@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Production entry point: the Flask app under gunicorn.
+
+    python serve.py                       # settings from the environment / .env
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+
+Every option falls back to a ``SERVE_*`` setting on Config. Workers are
+forked from a master that has already imported the app when ``preload``
+is on. Each worker then drops the pool and logging thread it inherited,
+warms its own connections and restarts its background threads.
+``kill -HUP <master pid>`` reloads workers gracefully.
+"""
+import argparse
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+from config import Config
+
+
+def default_workers():
+    return Config.SERVE_WORKERS or multiprocessing.cpu_count() * 2 + 1
+
+
+def post_fork(server, worker):
+    import cache_sync
+    import changes
+    import db
+    import logging_setup
+    import profiler
+
+    db.reset_pool()
+    changes.bus.reset()
+    cache_sync.sync.reset()
+    logging_setup.start_listener()
+    active_profiler = profiler.get_profiler()
+    if active_profiler is not None:
+        active_profiler.start()
+
+
+def post_worker_init(worker):
+    import db
+
+    try:
+        db.warm_pool()
+    except Exception as e:
+        # The pool opens connections on demand anyway; do not kill the worker.
+        worker.log.warning("Could not warm database pool: %s", e)
+
+
+class Server(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the API with gunicorn')
+    parser.add_argument('--bind', default=Config.SERVE_BIND)
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--threads', type=int, default=Config.SERVE_THREADS)
+    parser.add_argument('--timeout', type=int, default=Config.SERVE_TIMEOUT,
+                        help='seconds before a silent worker is killed and restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=Config.SERVE_GRACEFUL_TIMEOUT,
+                        help='seconds in-flight requests get on reload/shutdown')
+    parser.add_argument('--keepalive', type=int, default=Config.SERVE_KEEPALIVE)
+    parser.add_argument('--max-requests', type=int, default=Config.SERVE_MAX_REQUESTS,
+                        help='recycle a worker after this many requests (0 disables)')
+    parser.add_argument('--no-preload', dest='preload', action='store_false', default=Config.SERVE_PRELOAD)
+    args = parser.parse_args()
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        # gthread keeps a pool of request threads per worker; pool size
+        # DB_POOL_MAX_SIZE should be at least --threads.
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': args.preload,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'accesslog': None,
+        'errorlog': '-',
+    }
+    Server(options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# versions.py
+"""Per-table change counters for cheap, strong ETags on list endpoints.
+
+Every application write path calls ``bump_table_versions`` after changing
+a table. A read handler first reads the counters of the tables it depends
+on (one primary-key lookup) and derives its ETag from them, so a client
+whose copy is current gets a 304 before the real query runs. The counters
+live in MySQL, so every worker process agrees on them.
+
+Bump *after* the data change: a reader that sees the new counter is then
+guaranteed to see the new rows too.
+"""
+from cache import make_etag
+
+
+def bump_table_versions(cursor, *tables):
+    if not tables:
+        return
+    cursor.execute(
+        "INSERT INTO tbl_table_versions (table_name, version) VALUES "
+        + ', '.join(['(%s, 1)'] * len(tables))
+        + " ON DUPLICATE KEY UPDATE version = version + 1",
+        tables,
+    )
+
+
+def table_versions_query(tables):
+    """``(sql, params)`` reading the counters of ``tables``; asgi.py runs it on aiomysql."""
+    return (
+        "SELECT table_name, version FROM tbl_table_versions WHERE table_name IN ("
+        + ', '.join(['%s'] * len(tables)) + ")",
+        tables,
+    )
+
+
+def get_table_versions(cursor, tables):
+    cursor.execute(*table_versions_query(tables))
+    return dict(cursor.fetchall())
+
+
+def versions_etag(versions, tables, *parts):
+    """ETag for ``versions`` as returned by get_table_versions."""
+    tag = '|'.join([*map(str, parts), *(f'{table}={versions.get(table, 0)}' for table in tables)])
+    return make_etag(tag)
+
+
+def versioned_etag(cursor, tables, *parts):
+    """Strong ETag for a response built from ``tables``, varied by ``parts``."""
+    return versions_etag(get_table_versions(cursor, tables), tables, *parts)
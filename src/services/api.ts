@@ -35,6 +35,8 @@ class ApiService {
       const response = await fetch(url, {
         ...options,
         headers,
+        // Send/store the API's read-your-writes cookie across origins
+        credentials: 'include',
         signal: controller.signal,
       });
 
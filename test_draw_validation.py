@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for draw parameter validation (no database or server needed)
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from draws import DrawError, Entry, collapse_entries, generate_draw  # noqa: E402
+
+
+def make_entries(count, ranked=0):
+    return [
+        Entry(user_id, f'Player {user_id}', None, None, user_id if user_id <= ranked else None)
+        for user_id in range(1, count + 1)
+    ]
+
+
+def test_negative_seeds_rejected():
+    with pytest.raises(DrawError):
+        generate_draw(make_entries(6, ranked=4), seeds=-2, random_seed=1)
+
+
+@pytest.mark.parametrize('draw_size', [0, 1, -8, 4, 12, 16, 1024])
+def test_invalid_draw_size_rejected(draw_size):
+    with pytest.raises(DrawError):
+        generate_draw(make_entries(6), draw_size=draw_size, random_seed=1)
+
+
+def test_no_bye_meets_a_bye():
+    slots, _ = generate_draw(make_entries(5), random_seed=1)
+    assert len(slots) == 8
+    for first, second in zip(slots[::2], slots[1::2]):
+        assert first.entry is not None or second.entry is not None
+
+
+def test_one_way_partner_pointers_not_paired():
+    # 1 -> 2 is stale: 2 and 3 point at each other.
+    rows = [
+        (1, 'A', 2, 'B', None),
+        (2, 'B', 3, 'C', 4),
+        (3, 'C', 2, 'B', None),
+        (4, 'D', None, None, None),
+    ]
+    entries, unpaired = collapse_entries(rows, doubles=True)
+    assert [(entry.user_id, entry.partner_id, entry.ranking) for entry in entries] == [(2, 3, 4)]
+    assert [(entry.user_id, entry.partner_id) for entry in unpaired] == [(1, 2), (4, None)]
+
+
+def test_every_entry_placed():
+    entries = make_entries(6, ranked=4)
+    slots, _ = generate_draw(entries, seeds=0, random_seed=1)
+    placed = sorted(slot.entry.user_id for slot in slots if slot.entry is not None)
+    assert len(slots) == 8
+    assert placed == [entry.user_id for entry in entries]
+    assert not any(slot.seed for slot in slots)
+
+
+def test_route_returns_400_for_negative_seeds(monkeypatch):
+    from flask_jwt_extended import create_access_token
+
+    import app as app_module
+    from routes import draws as draws_routes
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            pass
+
+        def fetchone(self):
+            return (1,)
+
+    class Connection:
+        @contextmanager
+        def cursor(self):
+            yield Cursor()
+
+    @contextmanager
+    def fake_connection(readonly=False):
+        yield Connection()
+
+    monkeypatch.setattr(draws_routes, 'db_connection', fake_connection)
+    monkeypatch.setattr(draws_routes, 'load_entries', lambda cursor, event_name: (make_entries(6, ranked=4), []))
+
+    with app_module.app.app_context():
+        token = create_access_token(identity='admin')
+    response = app_module.app.test_client().post(
+        '/api/draws/Men Singles',
+        json={'seeds': -2, 'dry_run': True},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == 400
+    assert 'seeds' in response.get_json()['error']
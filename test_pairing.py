@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for automatic doubles pairing (no database or server needed)
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from pairing import Pairer, PairingError, apply_pairs, plan_pairs  # noqa: E402
+
+PLAYERS = [
+    (1, 'Arjun', 'Male', 'Dehradun', 3),
+    (2, 'Bhavna', 'Female', 'Dehradun', 8),
+    (3, 'Chetan', 'male', 'Haridwar', 6),
+    (4, 'Divya', 'female', 'Haridwar', 1),
+    (5, 'Eshan', 'Male', 'Dehradun', None),
+    (6, 'Farah', None, 'Dehradun', 2),
+    (7, 'Gita', '', 'Haridwar', 5),
+]
+
+
+class Cursor:
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def genders(pairer, pair):
+    return sorted((pairer.players[user_id][2] or '').lower() for user_id in pair)
+
+
+def test_mixed_pairs_one_man_and_one_woman():
+    pairer = Pairer(PLAYERS, mixed=True)
+    pairs, unmatched = pairer.pair()
+    assert len(pairs) == 2
+    for pair in pairs:
+        assert genders(pairer, pair) == ['female', 'male']
+    assert 5 in unmatched
+
+
+def test_players_without_gender_stay_unmatched():
+    _, unmatched = Pairer(PLAYERS, mixed=True).pair()
+    assert {6, 7} <= set(unmatched)
+
+
+def test_same_gender_pairs_outside_mixed():
+    men = [row for row in PLAYERS if (row[2] or '').lower() == 'male']
+    women = [row for row in PLAYERS if (row[2] or '').lower() == 'female']
+    pairer = Pairer(men + women, mixed=False)
+    pairs, unmatched = pairer.pair()
+    for pair in pairs:
+        assert len(set(genders(pairer, pair))) == 1
+    assert len(unmatched) == 1
+
+
+def test_swaps_keep_gender_rule():
+    # Pairing the two men and the two women would save both city penalties.
+    players = [
+        (1, 'A', 'male', 'Dehradun', None),
+        (2, 'B', 'female', 'Haridwar', None),
+        (3, 'C', 'male', 'Dehradun', None),
+        (4, 'D', 'female', 'Haridwar', None),
+    ]
+    pairer = Pairer(players, mixed=True)
+    pairs = pairer._improve([(1, 2), (3, 4)])
+    for pair in pairs:
+        assert pairer.allowed(*pair)
+        assert genders(pairer, pair) == ['female', 'male']
+
+
+def test_swaps_lower_cost():
+    players = [
+        (1, 'A', 'male', 'Dehradun', None),
+        (2, 'B', 'male', 'Haridwar', None),
+        (3, 'C', 'male', 'Dehradun', None),
+        (4, 'D', 'male', 'Haridwar', None),
+    ]
+    pairer = Pairer(players, mixed=False)
+    pairs = pairer._improve([(1, 2), (3, 4)])
+    assert sorted(tuple(sorted(pair)) for pair in pairs) == [(1, 3), (2, 4)]
+    assert sum(pairer.cost(*pair) for pair in pairs) == 0
+
+
+def test_singles_event_rejected():
+    with pytest.raises(PairingError):
+        plan_pairs(Cursor(PLAYERS), "Men's Singles")
+
+
+def test_apply_pairs_detects_entries_paired_meanwhile():
+    assert apply_pairs(Cursor(rowcount=4), 'Mixed Doubles', [(1, 2), (3, 4)])
+    # One of the four rows already had a partner, so the UPDATE skipped it.
+    assert not apply_pairs(Cursor(rowcount=3), 'Mixed Doubles', [(1, 2), (3, 4)])
+
+
+def test_apply_pairs_without_pairs_runs_no_update():
+    cursor = Cursor()
+    assert apply_pairs(cursor, 'Mixed Doubles', [])
+    assert cursor.executed == []
+
+
+def test_route_returns_409_when_entries_change(monkeypatch):
+    from flask_jwt_extended import create_access_token
+
+    import app as app_module
+    from routes import partners as partners_routes
+
+    cursor = Cursor(PLAYERS, rowcount=3)
+    state = {'committed': False, 'rolled_back': False}
+
+    class Connection:
+        @contextmanager
+        def cursor(self):
+            yield cursor
+
+        def begin(self):
+            pass
+
+        def commit(self):
+            state['committed'] = True
+
+        def rollback(self):
+            state['rolled_back'] = True
+
+    @contextmanager
+    def fake_connection(readonly=False):
+        yield Connection()
+
+    monkeypatch.setattr(partners_routes, 'db_connection', fake_connection)
+
+    with app_module.app.app_context():
+        token = create_access_token(identity='admin')
+    response = app_module.app.test_client().post(
+        '/api/partners/auto-pair',
+        json={'event_name': 'Mixed Doubles', 'preview': False},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+    assert response.status_code == 409
+    assert state == {'committed': False, 'rolled_back': True}